@@ -2,13 +2,16 @@
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_mail import Mail
 from flask_wtf.csrf import CSRFProtect
 
 from app.config import config
+from app.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
 login_manager = LoginManager()
 mail = Mail()
 csrf = CSRFProtect()
@@ -26,15 +29,35 @@ def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    # Stream multipart file uploads straight to disk
+    from app.services.storage_service import UploadRequest
+    app.request_class = UploadRequest
+
     # Ensure instance folder exists
     instance_path = os.path.join(os.path.dirname(app.root_path), 'instance')
     os.makedirs(instance_path, exist_ok=True)
 
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['UPLOAD_TEMP_FOLDER'], exist_ok=True)
 
     # Initialize extensions
+    from app.database import configure_engine, engine_options
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     db.init_app(app)
+    configure_engine(app, db)
+    from app.services.query_stats_service import init_query_stats
+    init_query_stats(app, db)
+    from app.services.slow_query_service import init_slow_query_log
+    init_slow_query_log(app, db)
+    from app.services.metrics_service import init_metrics
+    init_metrics(app)
+    from app.services.profiler_service import init_profiler
+    init_profiler(app)
+    from app.services.memory_service import init_memory_profiling
+    init_memory_profiling(app)
+    # Batch mode lets SQLite migrations alter tables by copying them
+    migrate.init_app(app, db, render_as_batch=True)
     login_manager.init_app(app)
     mail.init_app(app)
     csrf.init_app(app)
@@ -51,6 +74,7 @@ def create_app(config_name=None):
     from app.routes.notifications import notifications_bp
     from app.routes.groups import groups_bp
     from app.routes.attachments import attachments_bp
+    from app.routes.metrics import metrics_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(dashboard_bp)
@@ -63,6 +87,12 @@ def create_app(config_name=None):
     app.register_blueprint(notifications_bp)
     app.register_blueprint(groups_bp)
     app.register_blueprint(attachments_bp)
+    if app.config['METRICS_ENABLED']:
+        app.register_blueprint(metrics_bp)
+
+    # Register CLI commands
+    from app.commands import register_commands
+    register_commands(app)
 
     # User loader for Flask-Login
     from app.models import User
@@ -0,0 +1,163 @@
+"""Scale benchmarks of the hot routes and the notification checks.
+
+run_benchmarks() grows a scratch database with synthetic data to each
+scale in turn and times the same user's pages and a full
+NotificationService.run_all_checks() at every step. Results are JSON in
+the shape of pytest-benchmark's (name plus min/max/mean/median/stddev in
+seconds), so two runs can be compared with compare().
+"""
+import logging
+import platform
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import User, Subscription
+from app.synthetic import EMAIL_DOMAIN, generate
+
+# Scale name -> number of subscriptions
+SCALES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+# Routes timed for one user at every scale
+ROUTES = [
+    ('dashboard', '/'),
+    ('subscriptions', '/subscriptions'),
+    ('reports_by_provider', '/reports/by-provider'),
+    ('budget_yearly', '/budget/yearly'),
+    ('api_dashboard_stats', '/api/dashboard/stats'),
+]
+
+
+def _stats(samples):
+    ordered = sorted(samples)
+    return {
+        'min': ordered[0],
+        'max': ordered[-1],
+        'mean': statistics.fmean(ordered),
+        'median': statistics.median(ordered),
+        'stddev': statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+        'p95': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'rounds': len(ordered),
+    }
+
+
+def _time(fn, rounds, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return _stats(samples)
+
+
+def _get(client, path):
+    # A fresh app context per request, as in a server; otherwise g (and the
+    # logged-in user) would carry over from the CLI's context
+    with client.application.app_context():
+        response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'{path} returned {response.status_code}')
+
+
+def run_benchmarks(scales=('1k', '10k', '100k'), rounds=20, check_rounds=3, subscriptions_per_user=10, seed=0):
+    """Benchmark each scale, smallest first, adding synthetic data between them.
+
+    The database must contain no real users: the data added is left in
+    place. Mail is suppressed while timing, and the scheduler is shut
+    down first (after any running job, e.g. the startup notification
+    check) so it cannot compete with the timed code. The response and
+    portfolio caches are turned off, so every round renders the page.
+    """
+    from app.services.notification_service import NotificationService
+    from app.services.portfolio_service import PortfolioService
+    from app.services.response_cache_service import ResponseCacheService
+    from app.services.scheduler_service import scheduler
+
+    app = current_app._get_current_object()
+    if User.query.filter(~User.email.endswith(f'@{EMAIL_DOMAIN}')).count():
+        raise RuntimeError('The database has real users; run benchmarks against a scratch database.')
+
+    results = []
+    mail = app.extensions['mail']
+    suppress, level = mail.suppress, app.logger.level
+    caches = {name: app.config[name] for name in ('RESPONSE_CACHE_ENABLED', 'PORTFOLIO_CACHE_SIZE')}
+    mail.suppress = True
+    app.logger.setLevel(logging.ERROR)  # No per-request N+1 warnings while timing
+    app.config.update(RESPONSE_CACHE_ENABLED=False, PORTFOLIO_CACHE_SIZE=0)
+    ResponseCacheService.clear()
+    PortfolioService.clear()
+    if scheduler.running:
+        scheduler.shutdown(wait=True)
+    try:
+        for scale in sorted(scales, key=SCALES.__getitem__):
+            existing = Subscription.query.count()
+            if existing < SCALES[scale]:
+                generate(users=max(1, round((SCALES[scale] - existing) / subscriptions_per_user)),
+                         subscriptions_per_user=subscriptions_per_user, seed=seed)
+            db.session.remove()
+
+            extra_info = {
+                'users': User.query.count(),
+                'subscriptions': Subscription.query.count(),
+            }
+            user = User.query.filter(User.email.endswith(f'@{EMAIL_DOMAIN}')).order_by(User.id).first()
+            extra_info['user_subscriptions'] = user.subscriptions.count()
+
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user.id)
+                session['_fresh'] = True
+
+            for name, path in ROUTES:
+                results.append({
+                    'name': name, 'group': 'routes', 'scale': scale, 'path': path,
+                    'stats': _time(lambda: _get(client, path), rounds, warmup=2),
+                    'extra_info': extra_info,
+                })
+
+            # The first run creates this scale's notifications; time the steady state after it
+            results.append({
+                'name': 'run_all_checks', 'group': 'notifications', 'scale': scale,
+                'stats': _time(NotificationService.run_all_checks, check_rounds, warmup=1),
+                'extra_info': extra_info,
+            })
+            db.session.remove()
+    finally:
+        mail.suppress = suppress
+        app.logger.setLevel(level)
+        app.config.update(caches)
+
+    return {
+        'datetime': datetime.utcnow().isoformat(),
+        'machine_info': {
+            'python_version': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite_version': sqlite3.sqlite_version,
+            'database': db.engine.dialect.name,
+        },
+        'seed': seed,
+        'benchmarks': results,
+    }
+
+
+def compare(baseline, current, max_regression=10.0):
+    """Compare median times of two runs.
+
+    Returns (name, scale, baseline median, current median, change in %,
+    regressed) for benchmarks present in both; regressed means slower by
+    more than max_regression percent.
+    """
+    before = {(bench['name'], bench['scale']): bench['stats']['median'] for bench in baseline['benchmarks']}
+    rows = []
+    for bench in current['benchmarks']:
+        key = (bench['name'], bench['scale'])
+        if key not in before:
+            continue
+        old, new = before[key], bench['stats']['median']
+        change = (new - old) / old * 100 if old else 0.0
+        rows.append((bench['name'], bench['scale'], old, new, change, change > max_regression))
+    return rows
@@ -0,0 +1,377 @@
+"""CLI commands for maintenance tasks."""
+import click
+from flask.cli import AppGroup
+
+attachments_cli = AppGroup('attachments', help='Attachment storage maintenance.')
+backup_cli = AppGroup('backup', help='Per-user backup and restore.')
+schema_cli = AppGroup('schema', help='Database schema upgrades, checks and benchmarks.')
+replica_cli = AppGroup('replica', help='Read replica maintenance.')
+bench_cli = AppGroup('bench', help='Synthetic data and scale benchmarks.')
+loadtest_cli = AppGroup('loadtest', help='HTTP load tests with synthetic users.')
+portfolio_cli = AppGroup('portfolio', help='Per-user portfolio summary maintenance.')
+
+
+@attachments_cli.command('migrate')
+@click.option('--workers', default=4, show_default=True, help='Parallel hashing threads.')
+@click.option('--batch-size', default=200, show_default=True, help='Attachments per commit.')
+def migrate_attachments(workers, batch_size):
+    """Move legacy attachment files into the blob store."""
+    from app.services.blob_service import BlobService
+    stats = BlobService.migrate_legacy_attachments(workers=workers, batch_size=batch_size)
+    click.echo(
+        f"Migrated {stats['migrated']} files, deduplicated {stats['deduplicated']} "
+        f"({stats['bytes_saved']} bytes saved), {stats['missing']} missing."
+    )
+
+
+@attachments_cli.command('gc')
+@click.option('--grace-hours', default=1, show_default=True,
+              help='Keep unreferenced files younger than this.')
+def collect_garbage(grace_hours):
+    """Fix blob reference counts and delete unreferenced blobs."""
+    from app.services.blob_service import BlobService
+    stats = BlobService.collect_garbage(grace_hours=grace_hours)
+    click.echo(
+        f"Recounted {stats['recounted']} blobs, removed {stats['removed_rows']} "
+        f"unreferenced blobs and {stats['removed_files']} orphan files."
+    )
+
+
+def _get_user(email):
+    from app.models import User
+    user = User.query.filter_by(email=email.strip().lower()).first()
+    if user is None:
+        raise click.ClickException(f'No user with email {email}.')
+    return user
+
+
+@backup_cli.command('create')
+@click.argument('email')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+def create_backup(email, output):
+    """Write a backup archive of a user's data to OUTPUT."""
+    from app.services.backup_service import BackupService
+    user = _get_user(email)
+    size = 0
+    with open(output, 'wb') as f:
+        for chunk in BackupService.stream_backup(user):
+            f.write(chunk)
+            size += len(chunk)
+    click.echo(f'Wrote {size} bytes to {output}.')
+
+
+@backup_cli.command('restore')
+@click.argument('email')
+@click.argument('archive', type=click.Path(exists=True, dir_okay=False))
+def restore_backup(email, archive):
+    """Restore a backup ARCHIVE into an existing user's account."""
+    from app.services.backup_service import BackupService
+    user = _get_user(email)
+    try:
+        counts = BackupService.restore_backup(user, archive)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()) + ' restored.')
+
+
+@schema_cli.command('upgrade')
+def upgrade_schema():
+    """Apply pending migrations, stamping databases created before migrations first."""
+    from app.database import upgrade_database
+    upgrade_database()
+
+
+@schema_cli.command('check-plans')
+@click.option('--verbose', '-v', is_flag=True, help='Print every query plan.')
+def check_plans(verbose):
+    """Fail if a hot query's plan scans a whole table.
+
+    Run against a database upgraded with `flask db upgrade`.
+    """
+    from app.services.query_plan_service import QueryPlanService
+    try:
+        results = QueryPlanService.check_plans()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    failed = 0
+    for name, plan, scans in results:
+        if scans:
+            failed += 1
+            click.echo(f'FAIL {name}: full scan of {", ".join(scans)}')
+        elif verbose:
+            click.echo(f'ok   {name}')
+        if scans or verbose:
+            for line in plan:
+                click.echo(f'       {line}')
+
+    if failed:
+        raise click.ClickException(f'{failed} of {len(results)} queries scan a whole table.')
+    click.echo(f'All {len(results)} query plans use indexes.')
+
+
+@schema_cli.command('bench-sqlite')
+@click.option('--readers', default=4, show_default=True, help='Concurrent reader threads.')
+@click.option('--writers', default=4, show_default=True, help='Concurrent writer threads.')
+@click.option('--seconds', default=5.0, show_default=True, help='Duration of each run.')
+def bench_sqlite(readers, writers, seconds):
+    """Compare SQLite read/write concurrency with and without the production profile.
+
+    Runs on a scratch database file, not the app's database.
+    """
+    from app.config import ProductionConfig
+    from app.database import benchmark_sqlite
+
+    runs = (
+        ('default', {}, False),
+        ('production', ProductionConfig.SQLITE_PRAGMAS, False),
+        ('production+queue', ProductionConfig.SQLITE_PRAGMAS, True),
+    )
+    click.echo(f'{"profile":<18} {"reads/s":>9} {"writes/s":>9} {"locked":>7} {"write p95":>10}')
+    for name, pragmas, write_queue in runs:
+        result = benchmark_sqlite(pragmas, readers, writers, seconds, write_queue)
+        p95 = f'{result["write_p95_ms"]}ms' if result['write_p95_ms'] is not None else '-'
+        click.echo(
+            f'{name:<18} {result["reads_per_second"]:>9} {result["writes_per_second"]:>9} '
+            f'{result["locked_errors"]:>7} {p95:>10}'
+        )
+
+
+@schema_cli.command('check-backend')
+def check_backend():
+    """Check pool, timeouts, upserts, streaming and indexes on the configured database.
+
+    Meant for a scratch database (e.g. a throwaway PostgreSQL container)
+    upgraded with `flask db upgrade`; test writes are rolled back.
+    """
+    from app.database import check_backend as run_checks
+
+    failed = 0
+    results = run_checks()
+    for name, passed, detail in results:
+        failed += not passed
+        click.echo(f'{"ok  " if passed else "FAIL"} {name}: {detail}')
+    if failed:
+        raise click.ClickException(f'{failed} of {len(results)} backend checks failed.')
+
+
+@replica_cli.command('sync')
+def sync_replica():
+    """Copy the SQLite database into the SQLite replica file now."""
+    from flask import current_app
+    from app.database import sync_sqlite_replica
+
+    if not current_app.config['REPLICA_DATABASE_URL']:
+        raise click.ClickException('REPLICA_DATABASE_URL is not set.')
+    try:
+        sync_sqlite_replica(current_app.config['SQLALCHEMY_DATABASE_URI'], current_app.config['REPLICA_DATABASE_URL'])
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo('Replica synced.')
+
+
+@bench_cli.command('seed')
+@click.option('--users', default=100, show_default=True, help='Users to add.')
+@click.option('--subscriptions', default=10, show_default=True, help='Average subscriptions per user.')
+@click.option('--seed', default=0, show_default=True, help='Random seed.')
+def seed_synthetic(users, subscriptions, seed):
+    """Add synthetic users, subscriptions, payment methods and notifications.
+
+    Every generated user can log in as user<id>@synthetic.example with
+    the password synthetic-password.
+    """
+    from app.synthetic import generate
+    counts = generate(users=users, subscriptions_per_user=subscriptions, seed=seed)
+    click.echo(
+        f"Added {counts['users']} users (ids {counts['first_user_id']}-{counts['last_user_id']}), "
+        f"{counts['subscriptions']} subscriptions, {counts['payment_methods']} payment methods, "
+        f"{counts['price_history']} price changes and {counts['notifications']} notifications."
+    )
+
+
+@bench_cli.command('run')
+@click.option('--scale', 'scales', multiple=True, type=click.Choice(['1k', '10k', '100k']),
+              help='Subscriptions to benchmark at (repeatable; default all).')
+@click.option('--rounds', default=20, show_default=True, help='Timed requests per route.')
+@click.option('--check-rounds', default=3, show_default=True, help='Timed notification check runs.')
+@click.option('--seed', default=0, show_default=True, help='Random seed for the data.')
+@click.option('--output', default='benchmark.json', show_default=True, type=click.Path(dir_okay=False),
+              help='JSON results file.')
+def run_benchmarks(scales, rounds, check_rounds, seed, output):
+    """Time the hot routes and notification checks as the data grows.
+
+    Adds synthetic data to the configured database, so point DATABASE_URL
+    at a scratch database upgraded with `flask db upgrade`.
+    """
+    import json
+    from app.benchmarks import run_benchmarks as run
+
+    try:
+        results = run(scales=scales or ('1k', '10k', '100k'), rounds=rounds, check_rounds=check_rounds, seed=seed)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f'{"scale":<6} {"benchmark":<22} {"median":>10} {"p95":>10} {"rounds":>7}')
+    for bench in results['benchmarks']:
+        stats = bench['stats']
+        click.echo(
+            f'{bench["scale"]:<6} {bench["name"]:<22} {stats["median"] * 1000:>8.1f}ms '
+            f'{stats["p95"] * 1000:>8.1f}ms {stats["rounds"]:>7}'
+        )
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    click.echo(f'Wrote {output}.')
+
+
+@bench_cli.command('compare')
+@click.argument('baseline', type=click.Path(exists=True, dir_okay=False))
+@click.argument('current', type=click.Path(exists=True, dir_okay=False))
+@click.option('--max-regression', default=10.0, show_default=True, help='Allowed slowdown of a median, in %.')
+def compare_benchmarks(baseline, current, max_regression):
+    """Fail if any benchmark in CURRENT is slower than in BASELINE."""
+    import json
+    from app.benchmarks import compare
+
+    with open(baseline) as f:
+        before = json.load(f)
+    with open(current) as f:
+        after = json.load(f)
+
+    rows = compare(before, after, max_regression)
+    regressed = 0
+    for name, scale, old, new, change, slower in rows:
+        regressed += slower
+        click.echo(f'{"SLOW" if slower else "ok  "} {scale:<6} {name:<22} '
+                   f'{old * 1000:>8.1f}ms -> {new * 1000:>8.1f}ms {change:+6.1f}%')
+    if regressed:
+        raise click.ClickException(f'{regressed} of {len(rows)} benchmarks regressed by more than {max_regression}%.')
+    click.echo(f'No regressions in {len(rows)} benchmarks.')
+
+
+@loadtest_cli.command('run')
+@click.option('--users', default=10, show_default=True, help='Concurrent virtual users.')
+@click.option('--seconds', default=60.0, show_default=True, help='Test duration.')
+@click.option('--ramp-up', default=5.0, show_default=True, help='Seconds over which users start.')
+@click.option('--think-time', default=1.0, show_default=True, help='Mean pause between journeys (0 = none).')
+@click.option('--seed-users', default=100, show_default=True, help='Synthetic users to have in the database.')
+@click.option('--seed', default=0, show_default=True, help='Random seed for data and journeys.')
+@click.option('--url', help='Test an already running server instead of starting one.')
+@click.option('--max-p99', type=float, help='Fail if any endpoint p99 exceeds this many ms.')
+@click.option('--threshold', 'thresholds', multiple=True, metavar='ENDPOINT=MS',
+              help='p99 limit for one endpoint, e.g. "GET /=300" (repeatable).')
+@click.option('--max-error-rate', default=1.0, show_default=True, help='Fail above this % of failed requests.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Also write the summary as JSON.')
+def run_load_test(users, seconds, ramp_up, think_time, seed_users, seed, url, max_p99, thresholds,
+                  max_error_rate, output):
+    """Replay weighted user journeys and report latency percentiles per endpoint.
+
+    Adds synthetic users to the configured database if needed, so point
+    DATABASE_URL at a scratch database upgraded with `flask db upgrade`.
+    Unless --url is given, a local `flask run` server is started on it.
+    """
+    import json
+    import os
+    from app.loadtest import check_thresholds, run_load, start_server
+    from app.models import User
+    from app.services.scheduler_service import scheduler
+    from app.synthetic import EMAIL_DOMAIN, PASSWORD, generate
+
+    endpoint_p99 = {}
+    for threshold in thresholds:
+        name, _, limit = threshold.rpartition('=')
+        try:
+            endpoint_p99[name.strip()] = float(limit)
+        except ValueError:
+            raise click.BadParameter(f'Expected ENDPOINT=MS, got {threshold!r}.', param_hint='--threshold')
+
+    if User.query.filter(~User.email.endswith(f'@{EMAIL_DOMAIN}')).count():
+        raise click.ClickException('The database has real users; run load tests against a scratch database.')
+    synthetic = User.query.filter(User.email.endswith(f'@{EMAIL_DOMAIN}'))
+    if synthetic.count() < seed_users:
+        generate(users=seed_users - synthetic.count(), seed=seed)
+    accounts = [(user.email, PASSWORD) for user in synthetic.order_by(User.id).limit(max(users, seed_users))]
+
+    if scheduler.running:
+        scheduler.shutdown(wait=True)  # Keep this process's jobs from competing with the server
+
+    process = None
+    if url is None:
+        project = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        os.environ.setdefault('FLASK_APP', 'app')
+        try:
+            process, url = start_server(cwd=project)
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    click.echo(f'{users} users for {seconds:.0f}s against {url} ...')
+    try:
+        stats = run_load(url, accounts, users=users, seconds=seconds, ramp_up=ramp_up,
+                         think_time=think_time, seed=seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(10)
+
+    summary = stats.summary()
+    click.echo(f'{"endpoint":<34} {"count":>7} {"errors":>6} {"rps":>7} {"p50":>8} {"p90":>8} '
+               f'{"p95":>8} {"p99":>8} {"max":>8}')
+    for name, row in summary.items():
+        click.echo(
+            f'{name:<34} {row["count"]:>7} {row["errors"]:>6} {row["rps"]:>7} {row["p50"]:>6.1f}ms '
+            f'{row["p90"]:>6.1f}ms {row["p95"]:>6.1f}ms {row["p99"]:>6.1f}ms {row["max"]:>6.1f}ms'
+        )
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'users': users, 'seconds': seconds, 'think_time': think_time,
+                       'failed_users': stats.failed_users, 'endpoints': summary}, f, indent=2)
+
+    failures = check_thresholds(summary, max_p99, endpoint_p99, max_error_rate, stats.failed_users)
+    for failure in failures:
+        click.echo(f'FAIL {failure}')
+    if failures:
+        raise click.ClickException(f'{len(failures)} load test thresholds exceeded.')
+
+
+@portfolio_cli.command('rebuild')
+@click.option('--email', help='Only rebuild this user.')
+def rebuild_portfolios(email):
+    """Recompute portfolio summaries from the subscriptions."""
+    from app import db
+    from app.models import UserPortfolioSummary
+    user_ids = [_get_user(email).id] if email else None
+    count = UserPortfolioSummary.rebuild(user_ids)
+    db.session.commit()
+    click.echo(f'Rebuilt {count} portfolio summaries.')
+
+
+@portfolio_cli.command('check')
+@click.option('--email', help='Only check this user.')
+@click.option('--fix', is_flag=True, help='Rebuild the summaries found wrong.')
+def check_portfolios(email, fix):
+    """Compare stored portfolio summaries with the subscriptions."""
+    from app import db
+    from app.models import UserPortfolioSummary
+    user_ids = [_get_user(email).id] if email else None
+    mismatches = UserPortfolioSummary.check(user_ids)
+    for user_id, stored, expected in mismatches:
+        differences = ', '.join(key for key in expected if stored[key] != expected[key])
+        click.echo(f'user {user_id}: {differences} differ')
+    if not mismatches:
+        click.echo('All portfolio summaries match.')
+        return
+    if fix:
+        UserPortfolioSummary.rebuild([user_id for user_id, _, _ in mismatches])
+        db.session.commit()
+        click.echo(f'Rebuilt {len(mismatches)} portfolio summaries.')
+    else:
+        raise click.ClickException(f'{len(mismatches)} portfolio summaries are wrong; run with --fix to rebuild them.')
+
+
+def register_commands(app):
+    """Register CLI command groups with the app."""
+    app.cli.add_command(attachments_cli)
+    app.cli.add_command(backup_cli)
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(replica_cli)
+    app.cli.add_command(bench_cli)
+    app.cli.add_command(loadtest_cli)
+    app.cli.add_command(portfolio_cli)
@@ -13,6 +13,70 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(os.path.dirname(basedir), 'instance', 'subscriptions.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_PRAGMAS = {}  # PRAGMA name -> value, applied to every new SQLite connection
+
+    # PostgreSQL profile, used when DATABASE_URL is a postgresql:// URL
+    POSTGRES_POOL_SIZE = int(os.environ.get('POSTGRES_POOL_SIZE', 10))  # Connections kept open per process
+    POSTGRES_MAX_OVERFLOW = int(os.environ.get('POSTGRES_MAX_OVERFLOW', 10))  # Extra connections under load
+    POSTGRES_POOL_TIMEOUT = int(os.environ.get('POSTGRES_POOL_TIMEOUT', 30))  # Seconds to wait for a connection
+    POSTGRES_POOL_RECYCLE = int(os.environ.get('POSTGRES_POOL_RECYCLE', 1800))  # Seconds before reconnecting
+    POSTGRES_STATEMENT_TIMEOUT = int(os.environ.get('POSTGRES_STATEMENT_TIMEOUT', 30000))  # ms per statement
+    POSTGRES_IDLE_TRANSACTION_TIMEOUT = int(os.environ.get('POSTGRES_IDLE_TRANSACTION_TIMEOUT', 60000))  # ms
+    POSTGRES_APPLICATION_NAME = os.environ.get('POSTGRES_APPLICATION_NAME', 'subscription-manager')
+
+    # Read replica: read_only views and reports query it; everything else uses the primary
+    REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))  # Primary reads after a write
+    REPLICA_SYNC_INTERVAL = int(os.environ.get('REPLICA_SYNC_INTERVAL', 5))  # Seconds between SQLite replica copies
+
+    # SQL instrumentation: per-request query count, DB time and N+1 detection
+    SQL_STATS_ENABLED = os.environ.get('SQL_STATS_ENABLED', 'true').lower() in ['true', '1', 'yes']
+    SQL_STATS_HEADERS = os.environ.get('SQL_STATS_HEADERS', 'false').lower() in ['true', '1', 'yes']  # Always in debug
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))  # Same SELECT this often = N+1
+
+    # Slow query log: statements over SLOW_QUERY_MS (0 disables) with their plan, as JSON lines
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 500))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG') or \
+        os.path.join(os.path.dirname(basedir), 'instance', 'slow_queries.jsonl')
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))  # Rotate at
+    SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', 5))  # Rotated files kept
+    SLOW_QUERY_EXPLAIN = os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() in ['true', '1', 'yes']
+
+    # Prometheus metrics at /metrics; scrapes need "Authorization: Bearer <METRICS_TOKEN>" unless METRICS_PUBLIC
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ['true', '1', 'yes']
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', 'false').lower() in ['true', '1', 'yes']  # Serve without a token
+
+    # Sampling profiler: admins add ?_profile=1 (or X-Profile: 1) to a request; a share of all requests can be sampled
+    PROFILE_FOLDER = os.environ.get('PROFILE_FOLDER') or \
+        os.path.join(os.path.dirname(basedir), 'instance', 'profiles')
+    PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))  # Time between stack samples
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))  # Percent of requests profiled
+    PROFILE_SAMPLE_MIN_MS = int(os.environ.get('PROFILE_SAMPLE_MIN_MS', 200))  # Faster sampled requests not kept
+    PROFILE_MAX_FILES = int(os.environ.get('PROFILE_MAX_FILES', 200))  # Oldest profiles removed beyond this
+
+    # Memory profiling with tracemalloc (slows every allocation; enable only while investigating)
+    MEMORY_PROFILING_ENABLED = os.environ.get('MEMORY_PROFILING_ENABLED', 'false').lower() in ['true', '1', 'yes']
+    MEMORY_TRACE_FRAMES = int(os.environ.get('MEMORY_TRACE_FRAMES', 10))  # Stack depth kept per allocation
+    MEMORY_SAMPLE_RATE = float(os.environ.get('MEMORY_SAMPLE_RATE', 100))  # Percent of requests measured
+    MEMORY_ALERT_MB = float(os.environ.get('MEMORY_ALERT_MB', 50))  # Log requests and jobs allocating more
+    MEMORY_SNAPSHOT_FOLDER = os.environ.get('MEMORY_SNAPSHOT_FOLDER') or \
+        os.path.join(os.path.dirname(basedir), 'instance', 'memory')
+    MEMORY_MAX_SNAPSHOTS = int(os.environ.get('MEMORY_MAX_SNAPSHOTS', 20))  # Oldest snapshots removed beyond this
+
+    # Write queue: batch small commits from background jobs on one writer thread
+    WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', 'false').lower() in ['true', '1', 'yes']
+    WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 200))  # Writes per commit
+    WRITE_QUEUE_MAX_DELAY = float(os.environ.get('WRITE_QUEUE_MAX_DELAY', 0.05))  # Seconds to gather a batch
+
+    # Portfolio cache: per-user read-only subscription snapshots for reports and budget pages
+    PORTFOLIO_CACHE_SIZE = int(os.environ.get('PORTFOLIO_CACHE_SIZE', 500))  # Users kept in memory, 0 to disable
+
+    # Response cache: heavy GET pages per user, until the user's data_version changes
+    RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() in ['true', '1', 'yes']
+    RESPONSE_CACHE_MAX_MB = int(os.environ.get('RESPONSE_CACHE_MAX_MB', 64))  # Per process; least recently used pages go first
+    RESPONSE_CACHE_WAIT = float(os.environ.get('RESPONSE_CACHE_WAIT', 10))  # Seconds to wait for a concurrent miss
 
     # Flask-Login
     REMEMBER_COOKIE_DURATION = timedelta(days=30)
@@ -29,12 +93,45 @@ class Config:
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
+    UPLOAD_TEMP_FOLDER = os.path.join(UPLOAD_FOLDER, 'incoming')  # Same filesystem as uploads
+    BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, 'blobs')  # Content-addressed attachment files
+    UPLOAD_READ_SIZE = 64 * 1024  # Bytes read from the request per chunk
+    UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # Client chunk size for resumable uploads
+    ATTACHMENT_MAX_SIZE = 100 * 1024 * 1024  # 100MB max for resumable uploads
+
+    # Downloads: '', 'sendfile', 'x-sendfile' (Apache) or 'x-accel-redirect' (nginx)
+    DOWNLOAD_OFFLOAD = os.environ.get('DOWNLOAD_OFFLOAD', '').lower()
+    DOWNLOAD_ACCEL_PREFIX = os.environ.get('DOWNLOAD_ACCEL_PREFIX', '/protected-uploads/')  # nginx internal location
+
+    # Thumbnails
+    THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbnails')
+    THUMBNAIL_SIZES = (64, 320)  # Longest side in pixels
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'WEBP')  # WEBP or JPEG
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))  # 0 renders inline
 
     # Encryption key for credentials
     ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY') or 'default-encryption-key-change-me'
+    # Previous keys still accepted for decryption (comma-separated, newest first)
+    ENCRYPTION_OLD_KEYS = [
+        key.strip() for key in os.environ.get('ENCRYPTION_OLD_KEYS', '').split(',') if key.strip()
+    ]
+
+    # Credential key rotation
+    KEY_ROTATION_BATCH_SIZE = int(os.environ.get('KEY_ROTATION_BATCH_SIZE', 500))
+    KEY_ROTATION_WORKERS = int(os.environ.get('KEY_ROTATION_WORKERS', 4))
+    KEY_ROTATION_BATCH_PAUSE = float(os.environ.get('KEY_ROTATION_BATCH_PAUSE', 0.05))  # seconds
+
+    # Exports
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))  # Rows fetched and written per chunk
+
+    # Imports
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 2000))  # Rows inserted per statement batch
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 100))  # Row errors listed per import
 
     # Scheduler
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ['true', '1', 'yes']
     SCHEDULER_API_ENABLED = True
+    SCHEDULER_SCAN_BATCH_SIZE = int(os.environ.get('SCHEDULER_SCAN_BATCH_SIZE', 500))  # Rows per cursor fetch
 
     # Default reminder days
     DEFAULT_REMINDER_DAYS = 15
@@ -53,11 +150,24 @@ class ProductionConfig(Config):
     """Production configuration."""
     DEBUG = False
 
+    # WAL lets readers run alongside the writer; NORMAL sync is safe under WAL
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # ms to wait for a lock
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_KB', 64000)),  # negative = KiB
+        'temp_store': 'MEMORY',
+    }
+
 
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    THUMBNAIL_WORKERS = 0
+    SQL_STATS_HEADERS = True
+    SLOW_QUERY_MS = 0
 
 
 config = {
@@ -0,0 +1,435 @@
+"""Database engine configuration and benchmarks."""
+import collections
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import Select, create_engine, event, inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+# Bind key of the read replica engine (SQLALCHEMY_BINDS)
+REPLICA_BIND = 'replica'
+
+# Flask session key: until this time, the user's reads go to the primary
+PRIMARY_UNTIL_KEY = 'db_primary_until'
+
+# Migration whose schema matches databases created before migrations were added
+BASELINE_REVISION = '0001_baseline'
+
+# Dialects with INSERT ... ON CONFLICT
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def engine_options(config):
+    """Get SQLALCHEMY_ENGINE_OPTIONS with the profile for the configured database.
+
+    For PostgreSQL: a sized connection pool that is pinged on checkout and
+    recycled, and server-side statement and idle-transaction timeouts.
+    """
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'postgresql':
+        options.setdefault('pool_size', config['POSTGRES_POOL_SIZE'])
+        options.setdefault('max_overflow', config['POSTGRES_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['POSTGRES_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', config['POSTGRES_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', True)
+        connect_args = dict(options.get('connect_args', {}))
+        connect_args.setdefault('options', (
+            f'-c statement_timeout={config["POSTGRES_STATEMENT_TIMEOUT"]} '
+            f'-c idle_in_transaction_session_timeout={config["POSTGRES_IDLE_TRANSACTION_TIMEOUT"]}'
+        ))
+        connect_args.setdefault('application_name', config['POSTGRES_APPLICATION_NAME'])
+        options['connect_args'] = connect_args
+    return options
+
+
+def sqlite_pragma_listener(pragmas):
+    """Get a connect event listener that applies PRAGMAs to each new connection."""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+    return set_pragmas
+
+
+def _use_replica():
+    """Whether reads in the current context may go to the replica."""
+    if not has_app_context() or not g.get('replica_reads') or g.get('db_wrote'):
+        return False
+    # Read-your-writes: the replica may not have the user's recent changes yet
+    return not (has_request_context() and session.get(PRIMARY_UNTIL_KEY, 0) > time.time())
+
+
+def reads_from_replica():
+    """Whether the session's SELECTs in the current context go to the replica."""
+    from app import db
+    return _use_replica() and REPLICA_BIND in db.engines
+
+
+class RoutingSession(FlaskSession):
+    """Session that sends SELECTs to the replica inside read_only views.
+
+    Writes, flushes and everything outside read_only go to the primary.
+    Without a replica bind configured it behaves like the default session.
+    Sets g.db_read_replica once a read has gone to the replica.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self._flushing and _use_replica():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                g.db_read_replica = True
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """Send the session's reads in this block to the replica, if one is configured."""
+    previous = g.get('replica_reads', False)
+    g.replica_reads = True
+    try:
+        yield
+    finally:
+        g.replica_reads = previous
+
+
+def read_only(f):
+    """Decorator for views that only read: their queries go to the replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
+
+
+def _record_write(conn, cursor, statement, parameters, context, executemany):
+    """Set g.db_wrote; with a replica, also send the user to the primary for READ_YOUR_WRITES_SECONDS."""
+    if not (context.isinsert or context.isupdate or context.isdelete) or not has_request_context():
+        return
+    g.db_wrote = True
+    if REPLICA_BIND in current_app.config['SQLALCHEMY_BINDS']:
+        session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+
+
+def replica_data_version(user_id):
+    """A user's data_version as the replica has it, or None without a replica."""
+    from app import db
+    from app.models import User
+
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        return None
+    with replica.connect() as connection:
+        return connection.scalar(select(User.data_version).where(User.id == user_id))
+
+
+def sync_sqlite_replica(primary_url, replica_url):
+    """Copy a SQLite primary into a SQLite replica file with the online backup API.
+
+    The copy is consistent and readers of the replica only wait while
+    pages are written. Raises ValueError unless both URLs are SQLite files.
+    """
+    primary, replica = make_url(primary_url), make_url(replica_url)
+    for url in (primary, replica):
+        if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+            raise ValueError('Replica sync needs SQLite file URLs for the primary and the replica.')
+
+    source = sqlite3.connect(primary.database)
+    target = sqlite3.connect(replica.database)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def supports_upsert(connection):
+    """Whether the connection's database has INSERT ... ON CONFLICT."""
+    return connection.dialect.name in UPSERT_INSERTS
+
+
+def upsert(connection, table, rows, index_elements, update=None):
+    """Insert rows, resolving conflicts on index_elements in the same statement.
+
+    update(excluded) returns the SET values for rows that already exist,
+    where excluded holds the values that were to be inserted; without it
+    those rows are skipped. Rows must not conflict with each other.
+    Only for databases where supports_upsert() is true.
+    """
+    insert = UPSERT_INSERTS[connection.dialect.name](table)
+    if update is None:
+        statement = insert.on_conflict_do_nothing(index_elements=index_elements)
+    else:
+        statement = insert.on_conflict_do_update(index_elements=index_elements, set_=update(insert.excluded))
+    return connection.execute(statement, rows)
+
+
+def stream(query, batch_size):
+    """Yield the results of an ORM query without loading them all at once.
+
+    On PostgreSQL rows come from a server-side cursor, batch_size at a
+    time, on a connection of their own so the caller can keep committing
+    while iterating. Other databases load the results up front.
+    """
+    from app import db
+
+    if db.engine.dialect.name != 'postgresql':
+        yield from query.all()
+        return
+
+    with db.engine.connect() as connection, Session(bind=connection) as scan_session:
+        result = scan_session.scalars(query.statement.execution_options(yield_per=batch_size))
+        yield from result
+
+
+def configure_engine(app, db):
+    """Apply per-dialect settings to the app's engines and track the requests that write."""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite' and app.config['SQLITE_PRAGMAS']:
+                event.listen(engine, 'connect', sqlite_pragma_listener(app.config['SQLITE_PRAGMAS']))
+        event.listen(db.engine, 'after_cursor_execute', _record_write)
+
+
+def upgrade_database():
+    """Apply pending migrations, adopting databases that predate them.
+
+    A database with the app's tables but no recorded revision was made by
+    db.create_all(); it is stamped at the baseline revision first, and the
+    later migrations add whatever it lacks.
+    """
+    from alembic.migration import MigrationContext
+    from flask_migrate import stamp, upgrade
+    from app import db
+
+    with db.engine.connect() as connection:
+        revision = MigrationContext.configure(connection).get_current_revision()
+        tables = set(inspect(connection).get_table_names())
+    if revision is None and 'users' in tables:
+        stamp(revision=BASELINE_REVISION)
+    upgrade()
+
+
+def check_backend():
+    """Exercise the dialect-specific paths against the configured database.
+
+    Run after `flask db upgrade` on a scratch database; writes are rolled
+    back. Returns a list of (check name, passed, detail).
+    """
+    from alembic.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+    from app import db
+    from app.models import AttachmentBlob, Subscription
+
+    engine = db.engine
+    results = []
+
+    with engine.connect() as connection:
+        version = '.'.join(str(part) for part in engine.dialect.server_version_info or ())
+        results.append(('connection', True, f'{engine.dialect.name} {version}, {engine.pool.status()}'))
+
+        script = ScriptDirectory.from_config(current_app.extensions['migrate'].migrate.get_config(
+            current_app.extensions['migrate'].directory
+        ))
+        current = set(MigrationContext.configure(connection).get_current_heads())
+        heads = set(script.get_heads())
+        results.append(('migrations', current == heads, f'at {", ".join(sorted(current)) or "nothing"}'))
+
+        indexes = {
+            index['name'] for table in ('subscriptions', 'payment_methods')
+            for index in inspect(connection).get_indexes(table)
+        }
+        partial = {'ix_subscriptions_active_trials', 'ix_subscriptions_active_expiring', 'ix_payment_methods_expiry'}
+        missing = partial - indexes
+        results.append(('partial indexes', not missing, f'missing {", ".join(sorted(missing))}' if missing else 'present'))
+
+        if engine.dialect.name == 'postgresql':
+            settings = dict(connection.execute(text(
+                "SELECT name, setting FROM pg_settings "
+                "WHERE name IN ('statement_timeout', 'idle_in_transaction_session_timeout')"
+            )).all())
+            expected = {
+                'statement_timeout': str(current_app.config['POSTGRES_STATEMENT_TIMEOUT']),
+                'idle_in_transaction_session_timeout': str(current_app.config['POSTGRES_IDLE_TRANSACTION_TIMEOUT']),
+            }
+            results.append(('timeouts', settings == expected, ', '.join(f'{k}={v}ms' for k, v in settings.items())))
+        elif engine.dialect.name == 'sqlite':
+            settings = {
+                name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+                for name in current_app.config['SQLITE_PRAGMAS']
+            }
+            results.append(('pragmas', True, ', '.join(f'{k}={v}' for k, v in settings.items()) or 'defaults'))
+
+        try:
+            sha256 = '0' * 64
+            AttachmentBlob.acquire_many(connection, [(sha256, 1), (sha256, 1)])
+            AttachmentBlob.acquire(connection, sha256, 1)
+            table = AttachmentBlob.__table__
+            count = connection.execute(select(table.c.ref_count).where(table.c.sha256 == sha256)).scalar()
+            path = 'INSERT ... ON CONFLICT' if supports_upsert(connection) else 'UPDATE then INSERT'
+            results.append(('upsert', count == 3, f'{path}, ref_count {count} (expected 3)'))
+        finally:
+            connection.rollback()
+
+    batch_size = current_app.config['SCHEDULER_SCAN_BATCH_SIZE']
+    streamed = sum(1 for _ in stream(Subscription.query.order_by(Subscription.id), batch_size))
+    total = Subscription.query.count()
+    cursor = 'server-side cursor' if engine.dialect.name == 'postgresql' else 'buffered'
+    results.append(('stream', streamed == total, f'{cursor}, {streamed} of {total} subscriptions'))
+    db.session.rollback()
+    return results
+
+
+def benchmark_sqlite(pragmas, readers=4, writers=4, seconds=5.0, write_queue=False, rows=10000):
+    """Run concurrent readers and small-commit writers against a scratch SQLite file.
+
+    Writers commit one row per transaction, like the scheduler's notification
+    checks; with write_queue they hand rows to a single WriteQueue thread that
+    commits them in batches, keeping up to 200 writes each in flight. Returns a dict of operations per second, lock
+    errors and the p95 write latency in milliseconds.
+    """
+    from app.services.write_queue_service import WriteQueue
+
+    directory = tempfile.mkdtemp(prefix='sqlite-bench-')
+    path = os.path.join(directory, 'bench.db')
+    engine = create_engine(f'sqlite:///{path}', connect_args={'timeout': 5})
+    if pragmas:
+        event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE notifications (id INTEGER PRIMARY KEY, user_id INTEGER, '
+            'message TEXT, created_at REAL)'
+        ))
+        connection.execute(text('CREATE INDEX ix_notifications_user ON notifications (user_id)'))
+        connection.execute(
+            text('INSERT INTO notifications (user_id, message, created_at) VALUES (:u, :m, :t)'),
+            [{'u': i % 100, 'm': 'seed', 't': time.time()} for i in range(rows)]
+        )
+
+    insert = text('INSERT INTO notifications (user_id, message, created_at) VALUES (:u, :m, :t)')
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+    stats = {'reads': 0, 'writes': 0, 'locked': 0, 'latencies': []}
+
+    queue = None
+    if write_queue:
+        local = threading.local()
+
+        class _Transaction:
+            def __enter__(self):
+                local.connection = engine.connect()
+                local.transaction = local.connection.begin()
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type is None:
+                    local.transaction.commit()
+                else:
+                    local.transaction.rollback()
+                local.connection.close()
+
+        def queued_insert(params):
+            local.connection.execute(insert, params)
+
+        queue = WriteQueue(_Transaction)
+        max_pending = 200
+
+    def reader():
+        count = 0
+        with engine.connect() as connection:
+            while time.monotonic() < stop:
+                try:
+                    connection.execute(
+                        text('SELECT count(*), max(created_at) FROM notifications WHERE user_id = :u'),
+                        {'u': random.randrange(100)}
+                    ).all()
+                    connection.rollback()
+                    count += 1
+                except OperationalError:
+                    connection.rollback()
+                    with lock:
+                        stats['locked'] += 1
+        with lock:
+            stats['reads'] += count
+
+    def writer():
+        count = 0
+        latencies = []
+        pending = collections.deque()
+
+        def wait_for_oldest():
+            nonlocal count
+            future = pending.popleft()
+            try:
+                future.result()
+                count += 1
+            except (OperationalError, sqlite3.OperationalError):
+                with lock:
+                    stats['locked'] += 1
+
+        while time.monotonic() < stop:
+            params = {'u': random.randrange(100), 'm': 'renewal reminder', 't': time.time()}
+            started = time.perf_counter()
+            if queue is not None:
+                # Like the scheduler jobs, don't wait for each write, only
+                # keep a bounded number in flight
+                future = queue.submit(queued_insert, params)
+                future.add_done_callback(
+                    lambda f, started=started: latencies.append(time.perf_counter() - started)
+                )
+                pending.append(future)
+                if len(pending) >= max_pending:
+                    wait_for_oldest()
+                continue
+            try:
+                with engine.begin() as connection:
+                    connection.execute(insert, params)
+                count += 1
+                latencies.append(time.perf_counter() - started)
+            except (OperationalError, sqlite3.OperationalError):
+                with lock:
+                    stats['locked'] += 1
+        while pending:
+            wait_for_oldest()
+        with lock:
+            stats['writes'] += count
+            stats['latencies'].extend(latencies)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + \
+        [threading.Thread(target=writer) for _ in range(writers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+
+    if queue is not None:
+        queue.stop()
+    engine.dispose()
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+    latencies = sorted(stats['latencies'])
+    return {
+        'reads_per_second': round(stats['reads'] / elapsed),
+        'writes_per_second': round(stats['writes'] / elapsed),
+        'locked_errors': stats['locked'],
+        'write_p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else None,
+    }
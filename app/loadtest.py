@@ -0,0 +1,317 @@
+"""HTTP load test replaying weighted user journeys against a running server.
+
+Each virtual user is a thread with its own keep-alive connection and
+cookie jar. It logs in as a synthetic user, then picks journeys by
+weight (dashboard, subscription list, edit, reports, notification
+polling) with think time between them. Latencies are kept per endpoint
+and summarized as percentiles. Only the standard library is used, so
+it runs offline.
+"""
+import http.client
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlencode, urlsplit
+
+SUBSCRIPTION_LINK = re.compile(r'href="/subscriptions/(\d+)"')
+
+# (journey, weight): how often each browsing pattern is picked
+JOURNEYS = [
+    ('dashboard', 30),
+    ('subscriptions', 20),
+    ('edit_subscription', 5),
+    ('reports', 15),
+    ('poll_notifications', 30),
+]
+
+
+class _Forms(HTMLParser):
+    """Collect the fields of every form on a page as a browser would submit them."""
+
+    def __init__(self):
+        super().__init__()
+        self.forms = []
+        self._select = None
+        self._textarea = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'form':
+            self.forms.append({'action': attrs.get('action', ''), 'method': attrs.get('method', 'get').upper(),
+                               'fields': {}})
+        if not self.forms:
+            return
+        fields = self.forms[-1]['fields']
+        name = attrs.get('name')
+        if tag == 'input' and name and attrs.get('type') not in ('submit', 'button', 'file'):
+            if attrs.get('type') in ('checkbox', 'radio') and 'checked' not in attrs:
+                return
+            fields[name] = attrs.get('value', 'on' if attrs.get('type') == 'checkbox' else '')
+        elif tag == 'select' and name:
+            self._select = name
+            fields.setdefault(name, None)
+        elif tag == 'option' and self._select:
+            if fields[self._select] is None or 'selected' in attrs:
+                fields[self._select] = attrs.get('value', '')
+        elif tag == 'textarea' and name:
+            self._textarea = name
+            fields[name] = ''
+
+    def handle_endtag(self, tag):
+        if tag == 'select':
+            self._select = None
+        elif tag == 'textarea':
+            self._textarea = None
+
+    def handle_data(self, data):
+        if self._textarea and self.forms:
+            self.forms[-1]['fields'][self._textarea] += data
+
+
+def _form(html, path):
+    """Fields of the page's POST form submitting to path (forms without an action post to the page)."""
+    parser = _Forms()
+    parser.feed(html)
+    for form in parser.forms:
+        if form['method'] == 'POST' and form['action'].split('?')[0] in ('', path):
+            return {name: value or '' for name, value in form['fields'].items()}
+    return None
+
+
+class Stats:
+    """Latencies and errors per endpoint, shared by all virtual users."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.failed_users = 0  # Virtual users that could not log in
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def user_failed(self):
+        with self._lock:
+            self.failed_users += 1
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def summary(self):
+        """Get {endpoint: {count, errors, rps, p50, p90, p95, p99, max}}, times in ms; 'total' included."""
+        elapsed = self.elapsed or time.perf_counter() - self.started
+        with self._lock:
+            groups = {name: list(values) for name, values in self.latencies.items()}
+            errors = dict(self.errors)
+        groups['total'] = [value for values in groups.values() for value in values]
+        errors['total'] = sum(errors.values())
+
+        summary = {}
+        for name, values in sorted(groups.items()):
+            if not values:
+                continue
+            values.sort()
+
+            def percentile(share):
+                return round(values[min(len(values) - 1, int(len(values) * share))] * 1000, 1)
+
+            summary[name] = {
+                'count': len(values), 'errors': errors.get(name, 0),
+                'rps': round(len(values) / elapsed, 1),
+                'p50': percentile(0.50), 'p90': percentile(0.90), 'p95': percentile(0.95),
+                'p99': percentile(0.99), 'max': round(values[-1] * 1000, 1),
+            }
+        return summary
+
+
+class VirtualUser:
+    """One simulated browser session."""
+
+    def __init__(self, base_url, email, password, stats, rng, think_time):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.email, self.password = email, password
+        self.stats, self.rng, self.think_time = stats, rng, think_time
+        self.cookies = {}
+        self.subscription_ids = []
+        self._connection = None
+
+    def request(self, name, method, path, form=None, expect=None):
+        """Send a request, record its latency under name, and return (status, body).
+
+        It counts as an error if the status is 400 or more, or is not expect when given.
+        """
+        headers = {'Cookie': '; '.join(f'{key}={value}' for key, value in self.cookies.items())}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        started = time.perf_counter()
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self._connection.request(method, path, body=body, headers=headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed the keep-alive connection; retry once on a new one
+                self._connection.close()
+                self._connection = None
+                if attempt:
+                    self.stats.record(name, time.perf_counter() - started, False)
+                    return None, ''
+        ok = response.status == expect if expect is not None else response.status < 400
+        self.stats.record(name, time.perf_counter() - started, ok)
+
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                key, _, rest = value.partition('=')
+                self.cookies[key] = rest.split(';', 1)[0]
+        return response.status, data.decode('utf-8', 'replace')
+
+    def login(self):
+        _, page = self.request('GET /login', 'GET', '/login')
+        form = _form(page, '/login') or {}
+        status, _ = self.request('POST /login', 'POST', '/login',
+                                 dict(form, email=self.email, password=self.password), expect=302)
+        if status != 302:
+            raise RuntimeError(f'Login failed for {self.email} ({status})')
+        _, page = self.request('GET /subscriptions', 'GET', '/subscriptions')
+        self.subscription_ids = sorted(set(SUBSCRIPTION_LINK.findall(page)))
+
+    def dashboard(self):
+        self.request('GET /', 'GET', '/')
+        self.request('GET /api/dashboard/stats', 'GET', '/api/dashboard/stats')
+
+    def subscriptions(self):
+        self.request('GET /subscriptions', 'GET', '/subscriptions')
+        if self.subscription_ids:
+            self.request('GET /subscriptions/<id>', 'GET', f'/subscriptions/{self.rng.choice(self.subscription_ids)}')
+
+    def edit_subscription(self):
+        if not self.subscription_ids:
+            return
+        path = f'/subscriptions/{self.rng.choice(self.subscription_ids)}/edit'
+        status, page = self.request('GET /subscriptions/<id>/edit', 'GET', path)
+        form = _form(page, path) if status == 200 else None
+        if form is None:
+            return
+        form['notes'] = f'Load test edit {self.rng.randint(1, 10 ** 6)}'
+        self.request('POST /subscriptions/<id>/edit', 'POST', path, form)
+
+    def reports(self):
+        self.request('GET /reports/by-category', 'GET', '/reports/by-category')
+        self.request('GET /reports/by-provider', 'GET', '/reports/by-provider')
+
+    def poll_notifications(self):
+        self.request('GET /notifications/dropdown', 'GET', '/notifications/dropdown')
+
+    def run(self, stop):
+        try:
+            self.login()
+        except RuntimeError:
+            self.stats.user_failed()
+            return
+        names, weights = zip(*JOURNEYS)
+        while not stop.is_set():
+            getattr(self, self.rng.choices(names, weights)[0])()
+            if self.think_time:
+                stop.wait(self.rng.expovariate(1 / self.think_time))
+        if self._connection is not None:
+            self._connection.close()
+
+
+def run_load(base_url, accounts, users=10, seconds=60, ramp_up=5, think_time=1.0, seed=0):
+    """Run users virtual users for seconds against base_url; returns the Stats.
+
+    accounts is a list of (email, password) shared round-robin. Users
+    start evenly over ramp_up seconds.
+    """
+    stats = Stats()
+    stop = threading.Event()
+    threads = []
+    for index in range(users):
+        email, password = accounts[index % len(accounts)]
+        user = VirtualUser(base_url, email, password, stats, random.Random(f'{seed}-{index}'), think_time)
+        thread = threading.Thread(target=user.run, args=(stop,), name=f'vu-{index}', daemon=True)
+        threads.append(thread)
+
+    started = time.monotonic()
+    for index, thread in enumerate(threads):
+        thread.start()
+        if ramp_up and index < users - 1:
+            time.sleep(ramp_up / users)
+    stop.wait(max(0.0, seconds - (time.monotonic() - started)))
+    stop.set()
+    for thread in threads:
+        thread.join(60)
+    stats.stop()
+    return stats
+
+
+def check_thresholds(summary, max_p99=None, endpoint_p99=None, max_error_rate=1.0, failed_users=0):
+    """Get messages for every threshold exceeded (empty when all pass).
+
+    Any virtual user that could not log in fails the run, whatever the error rate.
+    """
+    failures = []
+    if failed_users:
+        failures.append(f'{failed_users} virtual users could not log in')
+    for name, row in summary.items():
+        limit = (endpoint_p99 or {}).get(name, max_p99 if name != 'total' else None)
+        if limit is not None and row['p99'] > limit:
+            failures.append(f'{name}: p99 {row["p99"]}ms > {limit}ms')
+    total = summary.get('total')
+    if total and total['errors'] / total['count'] * 100 > max_error_rate:
+        failures.append(f'error rate {total["errors"] / total["count"] * 100:.1f}% > {max_error_rate}%')
+    return failures
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(cwd=None, timeout=30):
+    """Start `flask run` (threaded, no reloader or scheduler) on a free port.
+
+    The server gets this process's environment (FLASK_APP, DATABASE_URL,
+    ...). Returns (process, base_url) once it answers.
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'flask', 'run', '--port', str(port), '--with-threads',
+         '--no-reload', '--no-debugger'],
+        cwd=cwd, env=dict(os.environ, SCHEDULER_ENABLED='false'),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The app server exited with status {process.returncode}.')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', '/login')
+            connection.getresponse().read()
+            connection.close()
+            return process, base_url
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f'The app server did not start within {timeout} seconds.')
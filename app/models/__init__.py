@@ -4,12 +4,15 @@ from app.models.subscription import (
     Subscription,
     SubscriptionPriceHistory,
     SubscriptionAttachment,
-    SubscriptionGroup
+    SubscriptionGroup,
+    AttachmentBlob
 )
 from app.models.payment_method import PaymentMethod
 from app.models.provider import Provider, Category, SubscriptionType
 from app.models.notification import Notification
 from app.models.currency import CurrencyRate
+from app.models.subscription_import import SubscriptionImport, SubscriptionImportItem
+from app.models.portfolio_summary import UserPortfolioSummary
 
 __all__ = [
     'User',
@@ -17,10 +20,14 @@ __all__ = [
     'SubscriptionPriceHistory',
     'SubscriptionAttachment',
     'SubscriptionGroup',
+    'AttachmentBlob',
     'PaymentMethod',
     'Provider',
     'Category',
     'SubscriptionType',
     'Notification',
-    'CurrencyRate'
+    'CurrencyRate',
+    'SubscriptionImport',
+    'SubscriptionImportItem',
+    'UserPortfolioSummary'
 ]
@@ -1,5 +1,6 @@
 """Currency rate model."""
 from datetime import datetime
+from flask import g, has_app_context
 from app import db
 
 
@@ -44,6 +45,17 @@ class CurrencyRate(db.Model):
         # Default to 1 if rate not found
         return 1.0
 
+    @staticmethod
+    def get_cached_rate(from_currency, to_currency):
+        """Get exchange rate, looked up once per app context (request or job)."""
+        if not has_app_context():
+            return CurrencyRate.get_rate(from_currency, to_currency)
+        rates = g.setdefault('currency_rates', {})
+        key = (from_currency, to_currency)
+        if key not in rates:
+            rates[key] = CurrencyRate.get_rate(from_currency, to_currency)
+        return rates[key]
+
     @staticmethod
     def update_rate(from_currency, to_currency, rate):
         """Update or create exchange rate."""
@@ -64,6 +76,8 @@ class CurrencyRate(db.Model):
             db.session.add(new_rate)
 
         db.session.commit()
+        if has_app_context():
+            g.pop('currency_rates', None)
 
     @staticmethod
     def get_default_rates():
@@ -1,6 +1,7 @@
 """Notification model."""
 from datetime import datetime
 from app import db
+from app.models.user import User
 
 
 class Notification(db.Model):
@@ -18,6 +19,11 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     read_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_subscription_type_created', 'subscription_id', 'type', 'created_at'),
+    )
+
     # Notification types
     TYPE_RENEWAL_REMINDER = 'renewal_reminder'
     TYPE_PAYMENT_DUE = 'payment_due'
@@ -33,15 +39,22 @@ class Notification(db.Model):
         db.session.commit()
 
     @staticmethod
-    def create_notification(user_id, notification_type, message, subscription_id=None):
-        """Create a new notification."""
+    def add_notification(user_id, notification_type, message, subscription_id=None, email_sent=False):
+        """Add a new notification to the session without committing."""
         notification = Notification(
             user_id=user_id,
             subscription_id=subscription_id,
             type=notification_type,
-            message=message
+            message=message,
+            email_sent=email_sent
         )
         db.session.add(notification)
+        return notification
+
+    @staticmethod
+    def create_notification(user_id, notification_type, message, subscription_id=None):
+        """Create a new notification."""
+        notification = Notification.add_notification(user_id, notification_type, message, subscription_id)
         db.session.commit()
         return notification
 
@@ -67,6 +80,7 @@ class Notification(db.Model):
             'is_read': True,
             'read_at': datetime.utcnow()
         })
+        User.bump_data_version(db.session, [user_id])
         db.session.commit()
 
     def get_icon(self):
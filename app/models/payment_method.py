@@ -9,7 +9,7 @@ class PaymentMethod(db.Model):
     __tablename__ = 'payment_methods'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     type = db.Column(db.String(20), nullable=False)  # card, bank
     name = db.Column(db.String(100), nullable=False)  # e.g., "HDFC Credit Card"
     last_four_digits = db.Column(db.String(4))
@@ -17,6 +17,12 @@ class PaymentMethod(db.Model):
     is_default = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Partial index for the scheduler's expiry scan; most methods have no expiry
+        db.Index('ix_payment_methods_expiry', 'expiry_date',
+                 postgresql_where=expiry_date.isnot(None), sqlite_where=expiry_date.isnot(None)),
+    )
+
     # Relationships
     subscriptions = db.relationship('Subscription', backref='payment_method', lazy='dynamic')
 
@@ -43,12 +49,12 @@ class PaymentMethod(db.Model):
 
     def get_subscriptions_count(self):
         """Get count of subscriptions using this payment method."""
-        return self.subscriptions.filter_by(status='active').count()
+        return self.subscriptions.filter_by(user_id=self.user_id, status='active').count()
 
     def get_total_monthly_amount(self, currency='USD'):
         """Calculate total monthly amount charged to this payment method."""
         total = 0
-        for sub in self.subscriptions.filter_by(status='active'):
+        for sub in self.subscriptions.filter_by(user_id=self.user_id, status='active'):
             total += sub.get_monthly_amount(currency)
         return round(total, 2)
 
@@ -0,0 +1,290 @@
+"""Per-user portfolio summary model."""
+from datetime import datetime
+from sqlalchemy import inspect, select
+from app import db
+from app.models.subscription import Subscription
+from app.models.user import User
+
+# Subscription columns the summary is computed from
+SUMMARY_COLUMNS = ('user_id', 'status', 'is_trial', 'billing_cycle', 'currency', 'amount', 'category_id')
+
+# Statuses counted in a <status>_count column
+COUNTED_STATUSES = ('active', 'inactive', 'cancelled')
+
+# Position of each billing cycle's total in a [monthly, yearly] spend pair
+CYCLE_INDEX = {'monthly': 0, 'yearly': 1}
+
+# Values a new subscription gets at INSERT for columns left unset
+_DEFAULTS = {
+    column.key: column.default.arg for column in Subscription.__table__.c
+    if column.key in SUMMARY_COLUMNS and column.default is not None and column.default.is_scalar
+}
+
+_CHUNK_SIZE = 500  # IDs per IN (...) list
+
+
+def _empty():
+    return {'active_count': 0, 'inactive_count': 0, 'cancelled_count': 0, 'trial_count': 0,
+            'spend': {}, 'category_spend': {}}
+
+
+def _add(totals, row, sign=1):
+    """Add (sign=1) or remove (sign=-1) one subscription's share of totals."""
+    status = row['status']
+    if status in COUNTED_STATUSES:
+        totals[f'{status}_count'] += sign
+    if status != 'active':
+        return
+    if row['is_trial']:
+        totals['trial_count'] += sign
+
+    index = CYCLE_INDEX.get(row['billing_cycle'])
+    if index is None:
+        return  # One-time payments are not recurring spend
+    cents = sign * round((row['amount'] or 0) * 100)
+    category = str(row['category_id']) if row['category_id'] is not None else 'none'
+    for spend in (totals['spend'], totals['category_spend'].setdefault(category, {})):
+        spend.setdefault(row['currency'], [0, 0])[index] += cents
+
+
+def _merge(totals, delta):
+    for key in ('active_count', 'inactive_count', 'cancelled_count', 'trial_count'):
+        totals[key] += delta[key]
+    spends = [(totals['spend'], delta['spend'])]
+    for category, spend in delta['category_spend'].items():
+        spends.append((totals['category_spend'].setdefault(category, {}), spend))
+    for target, source in spends:
+        for currency, (monthly, yearly) in source.items():
+            pair = target.setdefault(currency, [0, 0])
+            pair[0] += monthly
+            pair[1] += yearly
+    return _prune(totals)
+
+
+def _prune(totals):
+    """Drop zero spend entries, so equal totals compare equal."""
+    totals['spend'] = {currency: pair for currency, pair in totals['spend'].items() if any(pair)}
+    totals['category_spend'] = {
+        category: spend for category, spend in (
+            (category, {currency: pair for currency, pair in spend.items() if any(pair)})
+            for category, spend in totals['category_spend'].items()
+        ) if spend
+    }
+    return totals
+
+
+def _convert(spend, currency, monthly_share, yearly_share):
+    """Sum [monthly, yearly] cent totals in currency, each weighted by its share."""
+    from app.models.currency import CurrencyRate
+    total = 0
+    for source, (monthly, yearly) in spend.items():
+        total += (monthly * monthly_share + yearly * yearly_share) / 100 * CurrencyRate.get_cached_rate(source, currency)
+    return round(total, 2)
+
+
+class UserPortfolioSummary(db.Model):
+    """Counts and spend of a user's subscriptions, kept current on every change.
+
+    Updated in the same flush as any ORM insert, update or delete of a
+    Subscription. Spend is held in whole cents of the subscriptions' own
+    currencies, so incremental updates are exact and rate changes need no
+    update: spend is {currency: [monthly total, yearly total]} of active
+    monthly and yearly subscriptions, category_spend is that per category
+    id ('none' for no category). Core statements bypass the ORM, so code
+    writing subscriptions that way must call rebuild() for the users.
+    """
+
+    __tablename__ = 'user_portfolio_summary'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    active_count = db.Column(db.Integer, nullable=False, default=0)
+    inactive_count = db.Column(db.Integer, nullable=False, default=0)
+    cancelled_count = db.Column(db.Integer, nullable=False, default=0)
+    trial_count = db.Column(db.Integer, nullable=False, default=0)
+    spend = db.Column(db.JSON, nullable=False, default=dict)
+    category_spend = db.Column(db.JSON, nullable=False, default=dict)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def totals(self):
+        """Copy of the stored values as a dict (safe to modify)."""
+        return {
+            'active_count': self.active_count, 'inactive_count': self.inactive_count,
+            'cancelled_count': self.cancelled_count, 'trial_count': self.trial_count,
+            'spend': {currency: list(pair) for currency, pair in (self.spend or {}).items()},
+            'category_spend': {
+                category: {currency: list(pair) for currency, pair in spend.items()}
+                for category, spend in (self.category_spend or {}).items()
+            },
+        }
+
+    def _store(self, totals):
+        for key, value in totals.items():
+            setattr(self, key, value)
+
+    def get_monthly_spend(self, currency):
+        """Monthly spend of active subscriptions in currency (yearly ones count 1/12)."""
+        return _convert(self.spend, currency, 1, 1 / 12)
+
+    def get_yearly_spend(self, currency):
+        """Yearly spend of active subscriptions in currency (monthly ones count 12 times)."""
+        return _convert(self.spend, currency, 12, 1)
+
+    def get_category_spend(self, currency):
+        """Monthly spend per category id in currency (None for no category), zero totals left out."""
+        spending = {}
+        for category, spend in self.category_spend.items():
+            total = _convert(spend, currency, 1, 1 / 12)
+            if total:
+                spending[int(category) if category != 'none' else None] = total
+        return spending
+
+    @staticmethod
+    def for_user(user_id):
+        """Get a user's summary.
+
+        Users without a stored row (no subscriptions yet, or not rebuilt
+        since the table was added) get one computed on the fly; it is not
+        saved.
+        """
+        summary = db.session.get(UserPortfolioSummary, user_id)
+        if summary is None:
+            summary = UserPortfolioSummary(user_id=user_id)
+            summary._store(UserPortfolioSummary.compute([user_id]).get(user_id, _empty()))
+        return summary
+
+    @staticmethod
+    def compute(user_ids=None):
+        """Compute {user_id: totals} from the subscriptions table (all users by default).
+
+        Users without subscriptions are left out.
+        """
+        table = Subscription.__table__
+        query = select(*(table.c[column] for column in SUMMARY_COLUMNS))
+        if user_ids is None:
+            queries = [query]
+        else:
+            user_ids = list(user_ids)
+            queries = [query.where(table.c.user_id.in_(user_ids[start:start + _CHUNK_SIZE]))
+                       for start in range(0, len(user_ids), _CHUNK_SIZE)]
+
+        computed = {}
+        for chunk_query in queries:
+            for row in db.session.execute(chunk_query).mappings():
+                totals = computed.get(row['user_id'])
+                if totals is None:
+                    totals = computed[row['user_id']] = _empty()
+                _add(totals, row)
+        return {user_id: _prune(totals) for user_id, totals in computed.items()}
+
+    @staticmethod
+    def rebuild(user_ids=None):
+        """Recompute stored summaries from the subscriptions, without committing.
+
+        user_ids limits the rebuild to those users (all users by default).
+        Returns the number of summaries written.
+        """
+        table = UserPortfolioSummary.__table__
+        computed = UserPortfolioSummary.compute(user_ids)
+
+        # Loaded summaries would be stale after the Core statements below
+        for summary in [obj for obj in db.session.identity_map.values() if isinstance(obj, UserPortfolioSummary)]:
+            db.session.expunge(summary)
+
+        if user_ids is None:
+            db.session.execute(table.delete())
+        else:
+            user_ids = list(user_ids)
+            for start in range(0, len(user_ids), _CHUNK_SIZE):
+                db.session.execute(table.delete().where(table.c.user_id.in_(user_ids[start:start + _CHUNK_SIZE])))
+
+        now = datetime.utcnow()
+        rows = [dict(totals, user_id=user_id, updated_at=now) for user_id, totals in computed.items()]
+        for start in range(0, len(rows), _CHUNK_SIZE):
+            db.session.execute(table.insert(), rows[start:start + _CHUNK_SIZE])
+        return len(rows)
+
+    @staticmethod
+    def check(user_ids=None):
+        """Compare stored summaries with freshly computed ones.
+
+        Returns [(user_id, stored totals, expected totals)] for every user
+        whose summary is wrong or missing.
+        """
+        computed = UserPortfolioSummary.compute(user_ids)
+        query = UserPortfolioSummary.query
+        stored = {}
+        if user_ids is None:
+            stored = {summary.user_id: summary for summary in query}
+        else:
+            user_ids = list(user_ids)
+            for start in range(0, len(user_ids), _CHUNK_SIZE):
+                stored.update((summary.user_id, summary) for summary in query.filter(
+                    UserPortfolioSummary.user_id.in_(user_ids[start:start + _CHUNK_SIZE])))
+
+        mismatches = []
+        for user_id in sorted(set(computed) | set(stored)):
+            actual = _prune(stored[user_id].totals()) if user_id in stored else _prune(_empty())
+            expected = computed.get(user_id, _prune(_empty()))
+            if actual != expected:
+                mismatches.append((user_id, actual, expected))
+        return mismatches
+
+    def __repr__(self):
+        return f'<UserPortfolioSummary user={self.user_id} active={self.active_count}>'
+
+
+def _summary_changed(subscription):
+    attrs = inspect(subscription).attrs
+    return any(attrs[column].history.has_changes() for column in SUMMARY_COLUMNS)
+
+
+def _current_values(subscription):
+    values = {column: getattr(subscription, column) for column in SUMMARY_COLUMNS}
+    for column, default in _DEFAULTS.items():
+        if values[column] is None:
+            values[column] = default
+    if values['user_id'] is None and subscription.user is not None:
+        values['user_id'] = subscription.user.id
+    return values
+
+
+# Every ORM write to a subscription moves its share of the owner's summary
+# within the same flush, so the summary commits or rolls back with it.
+@db.event.listens_for(db.session, 'before_flush')
+def _update_portfolio_summaries(session, flush_context, instances):
+    removed_users = [obj.id for obj in session.deleted if isinstance(obj, User)]
+    if removed_users:
+        summaries = UserPortfolioSummary.__table__
+        session.execute(summaries.delete().where(summaries.c.user_id.in_(removed_users)))
+
+    new = [obj for obj in session.new if isinstance(obj, Subscription)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Subscription)]
+    changed = [obj for obj in session.dirty if isinstance(obj, Subscription) and _summary_changed(obj)]
+    if not (new or deleted or changed):
+        return
+
+    deltas = {}
+    # Previous values come from the database, which this flush has not changed
+    # yet; attribute history lacks them for attributes set while expired
+    table = Subscription.__table__
+    previous_ids = [obj.id for obj in deleted + changed]
+    for start in range(0, len(previous_ids), _CHUNK_SIZE):
+        rows = session.execute(
+            select(*(table.c[column] for column in SUMMARY_COLUMNS))
+            .where(table.c.id.in_(previous_ids[start:start + _CHUNK_SIZE]))
+        ).mappings()
+        for row in rows:
+            _add(deltas.setdefault(row['user_id'], _empty()), row, -1)
+    for subscription in new + changed:
+        values = _current_values(subscription)
+        _add(deltas.setdefault(values['user_id'], _empty()), values)
+
+    for user_id, delta in deltas.items():
+        if user_id is None or user_id in removed_users or _prune(delta) == _prune(_empty()):
+            continue
+        summary = session.get(UserPortfolioSummary, user_id, with_for_update=True, populate_existing=True)
+        if summary is None:
+            summary = UserPortfolioSummary(user_id=user_id)
+            summary._store(UserPortfolioSummary.compute([user_id]).get(user_id, _empty()))
+            session.add(summary)
+        summary._store(_merge(summary.totals(), delta))
@@ -77,6 +77,14 @@ class Provider(db.Model):
     # Relationships
     subscriptions = db.relationship('Subscription', backref='provider', lazy='dynamic')
 
+    def get_logo_thumbnail_url(self, size):
+        """Get a URL for the logo at a thumbnail size (external URLs as-is)."""
+        prefix = '/uploads/logos/'
+        if not self.logo_url or not self.logo_url.startswith(prefix):
+            return self.logo_url
+        from flask import url_for
+        return url_for('attachments.logo', filename=self.logo_url[len(prefix):], size=size)
+
     def get_subscriptions_count(self, user_id=None):
         """Get count of subscriptions for this provider."""
         query = self.subscriptions.filter_by(status='active')
@@ -1,6 +1,7 @@
 """Subscription related models."""
 from datetime import datetime, timedelta
 from app import db
+from app.database import supports_upsert, upsert
 
 
 class SubscriptionGroup(db.Model):
@@ -9,7 +10,7 @@ class SubscriptionGroup(db.Model):
     __tablename__ = 'subscription_groups'
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -43,7 +44,7 @@ class Subscription(db.Model):
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     subscription_type_id = db.Column(db.Integer, db.ForeignKey('subscription_types.id'))
     payment_method_id = db.Column(db.Integer, db.ForeignKey('payment_methods.id'))
-    group_id = db.Column(db.Integer, db.ForeignKey('subscription_groups.id'), nullable=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('subscription_groups.id'), nullable=True, index=True)
 
     amount = db.Column(db.Float, nullable=False)
     currency = db.Column(db.String(3), default='USD')
@@ -68,6 +69,22 @@ class Subscription(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Composite indexes for the per-user list, filter and renewal queries
+    __table_args__ = (
+        db.Index('ix_subscriptions_user_status_renewal', 'user_id', 'status', 'next_renewal_date'),
+        db.Index('ix_subscriptions_user_category_status', 'user_id', 'category_id', 'status'),
+        db.Index('ix_subscriptions_user_provider_status', 'user_id', 'provider_id', 'status'),
+        db.Index('ix_subscriptions_user_payment_method_status', 'user_id', 'payment_method_id', 'status'),
+        db.Index('ix_subscriptions_status_renewal', 'status', 'next_renewal_date'),
+        # Partial indexes for the scheduler's cross-user scans: only the rows they can match
+        db.Index('ix_subscriptions_active_trials', 'trial_end_date',
+                 postgresql_where=db.and_(is_trial == True, status == 'active'),  # noqa: E712
+                 sqlite_where=db.and_(is_trial == True, status == 'active')),  # noqa: E712
+        db.Index('ix_subscriptions_active_expiring', 'next_renewal_date',
+                 postgresql_where=db.and_(auto_renew == False, status == 'active'),  # noqa: E712
+                 sqlite_where=db.and_(auto_renew == False, status == 'active')),  # noqa: E712
+    )
+
     # Relationships
     price_history = db.relationship('SubscriptionPriceHistory', backref='subscription',
                                     lazy='dynamic', cascade='all, delete-orphan')
@@ -76,6 +93,48 @@ class Subscription(db.Model):
     notifications = db.relationship('Notification', backref='subscription',
                                     lazy='dynamic', cascade='all, delete-orphan')
 
+    CREDENTIAL_COLUMNS = ('account_email_encrypted', 'account_username_encrypted')
+
+    @property
+    def account_email(self):
+        """Decrypted account email (decrypted on first access)."""
+        return self._get_credential('account_email_encrypted')
+
+    @property
+    def account_username(self):
+        """Decrypted account username (decrypted on first access)."""
+        return self._get_credential('account_username_encrypted')
+
+    def _get_credential(self, column):
+        """Decrypt a credential column, memoized until its ciphertext changes."""
+        ciphertext = getattr(self, column)
+        cache = self.__dict__.setdefault('_credential_cache', {})
+        cached = cache.get(column)
+        hit = cached is not None and cached[0] == ciphertext
+        if not hit:
+            from app.services.encryption_service import decrypt_credential
+            cached = (ciphertext, decrypt_credential(ciphertext))
+            cache[column] = cached
+        from app.services.metrics_service import MetricsService
+        MetricsService.record_cache('credentials', hit)
+        return cached[1]
+
+    @staticmethod
+    def load_credentials(subscriptions):
+        """Decrypt credentials for many subscriptions in one batch call."""
+        from app.services.encryption_service import EncryptionService
+        pending = [
+            (sub, column)
+            for sub in subscriptions
+            for column in Subscription.CREDENTIAL_COLUMNS
+        ]
+        plaintexts = EncryptionService.decrypt_many(
+            [getattr(sub, column) for sub, column in pending]
+        )
+        for (sub, column), plaintext in zip(pending, plaintexts):
+            cache = sub.__dict__.setdefault('_credential_cache', {})
+            cache[column] = (getattr(sub, column), plaintext)
+
     def get_amount_in_currency(self, target_currency):
         """Convert amount to target currency."""
         if self.currency == target_currency:
@@ -216,6 +275,10 @@ class SubscriptionPriceHistory(db.Model):
     changed_at = db.Column(db.DateTime, default=datetime.utcnow)
     reason = db.Column(db.String(255), nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_subscription_price_history_subscription_changed', 'subscription_id', 'changed_at'),
+    )
+
     def __repr__(self):
         return f'<PriceHistory {self.subscription_id}: {self.old_amount} -> {self.new_amount}>'
 
@@ -226,14 +289,26 @@ class SubscriptionAttachment(db.Model):
     __tablename__ = 'subscription_attachments'
 
     id = db.Column(db.Integer, primary_key=True)
-    subscription_id = db.Column(db.Integer, db.ForeignKey('subscriptions.id'), nullable=False)
-    filename = db.Column(db.String(255), nullable=False)  # Stored filename (UUID)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscriptions.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255), nullable=False)  # Stored filename (content hash for blobs, UUID for legacy files)
     original_filename = db.Column(db.String(255), nullable=False)
     file_type = db.Column(db.String(20))  # receipt, invoice, contract, other
     file_size = db.Column(db.Integer)  # in bytes
+    sha256 = db.Column(db.String(64), db.ForeignKey('attachment_blobs.sha256'), nullable=True, index=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     notes = db.Column(db.Text)
 
+    def is_blob_stored(self):
+        """Check if the file lives in the shared blob store (vs. the legacy per-subscription folder)."""
+        return self.sha256 is not None and self.filename == self.sha256
+
+    def get_preview_kind(self):
+        """Return 'image' or 'pdf' if thumbnails can be made for this file, else None."""
+        if not self.is_blob_stored():
+            return None
+        from app.services.thumbnail_service import ThumbnailService
+        return ThumbnailService.source_kind(self.original_filename)
+
     def get_file_size_display(self):
         """Get human readable file size."""
         if self.file_size < 1024:
@@ -245,3 +320,92 @@ class SubscriptionAttachment(db.Model):
 
     def __repr__(self):
         return f'<Attachment {self.original_filename}>'
+
+
+class AttachmentBlob(db.Model):
+    """Content-addressed attachment file, shared by all identical uploads."""
+
+    __tablename__ = 'attachment_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @staticmethod
+    def acquire(connection, sha256, size):
+        """Add a reference to a blob, creating its row if needed."""
+        AttachmentBlob.acquire_many(connection, [(sha256, size)])
+
+    @staticmethod
+    def acquire_many(connection, blobs):
+        """Add a reference per (sha256, size) in blobs, creating rows as needed.
+
+        Uses a single INSERT ... ON CONFLICT where the database has it, which
+        also can't race a concurrent first upload of the same file.
+        """
+        table = AttachmentBlob.__table__
+        counts = {}
+        for sha256, size in blobs:
+            counts[sha256] = (size, counts.get(sha256, (size, 0))[1] + 1)
+        if not counts:
+            return
+
+        now = datetime.utcnow()
+        if supports_upsert(connection):
+            upsert(
+                connection, table,
+                [{'sha256': sha256, 'size': size, 'ref_count': count, 'created_at': now}
+                 for sha256, (size, count) in counts.items()],
+                index_elements=[table.c.sha256],
+                update=lambda excluded: {'ref_count': table.c.ref_count + excluded.ref_count}
+            )
+            return
+
+        for sha256, (size, count) in counts.items():
+            result = connection.execute(
+                table.update()
+                .where(table.c.sha256 == sha256)
+                .values(ref_count=table.c.ref_count + count)
+            )
+            if result.rowcount == 0:
+                connection.execute(table.insert().values(
+                    sha256=sha256, size=size, ref_count=count, created_at=now
+                ))
+
+    @staticmethod
+    def release(connection, sha256):
+        """Drop a reference to a blob.
+
+        Returns True if that was the last reference and the row was deleted.
+        """
+        table = AttachmentBlob.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.sha256 == sha256)
+            .values(ref_count=table.c.ref_count - 1)
+        )
+        result = connection.execute(
+            table.delete().where(table.c.sha256 == sha256, table.c.ref_count <= 0)
+        )
+        return result.rowcount > 0
+
+    def __repr__(self):
+        return f'<AttachmentBlob {self.sha256[:12]} refs={self.ref_count}>'
+
+
+# Blob reference counting follows attachment rows, however they are deleted
+# (directly or through subscription/user cascades). The blob row is created
+# before the attachment row, which references it. Files of released blobs are
+# left for BlobService.collect_garbage: an upload of the same content may be
+# about to reference the file again.
+@db.event.listens_for(SubscriptionAttachment, 'before_insert')
+def _acquire_attachment_blob(mapper, connection, target):
+    if target.is_blob_stored():
+        AttachmentBlob.acquire(connection, target.sha256, target.file_size)
+
+
+@db.event.listens_for(SubscriptionAttachment, 'after_delete')
+def _release_attachment_blob(mapper, connection, target):
+    if target.is_blob_stored():
+        AttachmentBlob.release(connection, target.sha256)
@@ -0,0 +1,39 @@
+"""Subscription import models."""
+from datetime import datetime
+from app import db
+
+
+class SubscriptionImport(db.Model):
+    """A bulk CSV import, kept so it can be reviewed and reverted."""
+
+    __tablename__ = 'subscription_imports'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    filename = db.Column(db.String(255))
+    imported_count = db.Column(db.Integer, default=0)
+    duplicate_count = db.Column(db.Integer, default=0)
+    error_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reverted_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationships
+    items = db.relationship('SubscriptionImportItem', backref='subscription_import',
+                            lazy='dynamic', cascade='all, delete-orphan')
+
+    def is_reverted(self):
+        """Check if the import has been undone."""
+        return self.reverted_at is not None
+
+    def __repr__(self):
+        return f'<SubscriptionImport {self.filename} ({self.imported_count} rows)>'
+
+
+class SubscriptionImportItem(db.Model):
+    """Subscription created by an import."""
+
+    __tablename__ = 'subscription_import_items'
+
+    import_id = db.Column(db.Integer, db.ForeignKey('subscription_imports.id'), primary_key=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('subscriptions.id', ondelete='CASCADE'),
+                                primary_key=True)
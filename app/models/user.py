@@ -1,5 +1,6 @@
 """User model."""
 from datetime import datetime
+from sqlalchemy import inspect, update
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app import db
@@ -20,6 +21,8 @@ class User(UserMixin, db.Model):
     dark_mode = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
+    # Bumped by every change to what the user's pages show; caches of derived data key on it
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # Relationships
     subscriptions = db.relationship('Subscription', backref='user', lazy='dynamic',
@@ -30,6 +33,8 @@ class User(UserMixin, db.Model):
                                     cascade='all, delete-orphan')
     subscription_groups = db.relationship('SubscriptionGroup', backref='user', lazy='dynamic',
                                           cascade='all, delete-orphan')
+    subscription_imports = db.relationship('SubscriptionImport', backref='user', lazy='dynamic',
+                                           cascade='all, delete-orphan')
 
     def set_password(self, password):
         """Hash and set the user password."""
@@ -67,5 +72,64 @@ class User(UserMixin, db.Model):
 
         return round(total, 2)
 
+    @staticmethod
+    def bump_data_version(session, user_ids=None):
+        """Increment data_version in the session's transaction, for all users by default.
+
+        Needed after changing their data with Core statements, which the
+        ORM listener below does not see.
+        """
+        table = User.__table__
+        statement = update(table).values(data_version=table.c.data_version + 1)
+        if user_ids is not None:
+            user_ids = set(user_ids)
+            if not user_ids:
+                return
+            statement = statement.where(table.c.id.in_(user_ids))
+        session.execute(statement)
+        # Match loaded users by identity key: reading obj.id on a user expired
+        # by the last commit would load it again, one SELECT per user
+        for obj in session.identity_map.values():
+            if isinstance(obj, User) and (user_ids is None or inspect(obj).identity[0] in user_ids):
+                session.expire(obj, ['data_version'])
+
     def __repr__(self):
         return f'<User {self.email}>'
+
+
+# User columns that no page shows
+_UNVERSIONED_COLUMNS = ('last_login', 'data_version')
+
+
+def _owner_id(obj):
+    return obj.user_id if obj.user_id is not None else getattr(obj.user, 'id', None)
+
+
+def _profile_changed(user):
+    attrs = inspect(user).attrs
+    return any(attrs[column.key].history.has_changes()
+               for column in User.__table__.c if column.key not in _UNVERSIONED_COLUMNS)
+
+
+# Writes to a user's own rows bump that user's data_version; writes to the
+# shared rates and reference tables bump everyone's.
+@db.event.listens_for(db.session, 'before_flush')
+def _bump_data_versions(session, flush_context, instances):
+    from app.models import (Subscription, SubscriptionGroup, PaymentMethod, Notification,
+                            CurrencyRate, Category, Provider, SubscriptionType)
+    owned = (Subscription, SubscriptionGroup, PaymentMethod, Notification)
+    shared = (CurrencyRate, Category, Provider, SubscriptionType)
+
+    changed = list(session.new) + list(session.deleted) + [
+        obj for obj in session.dirty if isinstance(obj, owned + shared) and session.is_modified(obj)
+    ]
+    if any(isinstance(obj, shared) for obj in changed):
+        User.bump_data_version(session)
+        return
+
+    user_ids = {_owner_id(obj) for obj in changed if isinstance(obj, owned)}
+    user_ids.update(inspect(obj).identity[0] for obj in session.dirty
+                    if isinstance(obj, User) and _profile_changed(obj))
+    user_ids -= {inspect(obj).identity[0] for obj in session.deleted if isinstance(obj, User)}
+    user_ids.discard(None)
+    User.bump_data_version(session, user_ids)
@@ -1,15 +1,28 @@
 """Admin panel routes."""
-import os
-import uuid
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
+from datetime import datetime
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, current_app,
+    Response, stream_with_context, abort, send_file
+)
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from functools import wraps
 from app import db
+from app.database import read_only
 from app.models import User, Category, Provider, SubscriptionType
+from app.services.export_service import ExportService, SUBSCRIPTION_CSV_HEADER
+from app.services.key_rotation_service import KeyRotationService
+from app.services.memory_service import MemoryService
+from app.services.profiler_service import ProfilerService
+from app.services.slow_query_service import SlowQueryService
+from app.services.storage_service import StorageService
+from app.services.thumbnail_service import ThumbnailService
+from app.services.scheduler_service import schedule_key_rotation, schedule_notification_profile
 
 admin_bp = Blueprint('admin', __name__)
 
+LOGO_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'svg']
+
 
 def admin_required(f):
     """Decorator to require admin access."""
@@ -22,6 +35,22 @@ def admin_required(f):
     return decorated_function
 
 
+def save_logo(file):
+    """Store an uploaded logo and queue its thumbnails.
+
+    Returns the logo URL, or None if the file type is not allowed.
+    """
+    filename = secure_filename(file.filename)
+    ext = filename.rsplit('.', 1)[-1].lower()
+    if ext not in LOGO_EXTENSIONS:
+        return None
+
+    sha256, stored_filename = StorageService.save_logo(file, ext)
+    ThumbnailService.queue(StorageService.logo_path(stored_filename), sha256,
+                           ThumbnailService.source_kind(stored_filename))
+    return f'/uploads/logos/{stored_filename}'
+
+
 @admin_bp.route('/')
 @login_required
 @admin_required
@@ -148,14 +177,7 @@ def add_provider():
         if 'logo' in request.files:
             file = request.files['logo']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                ext = filename.rsplit('.', 1)[-1].lower()
-                if ext in ['png', 'jpg', 'jpeg', 'gif', 'svg']:
-                    unique_filename = f'{uuid.uuid4()}.{ext}'
-                    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'logos', unique_filename)
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    file.save(filepath)
-                    logo_url = f'/uploads/logos/{unique_filename}'
+                logo_url = save_logo(file) or logo_url
 
         if not name:
             flash('Provider name is required.', 'danger')
@@ -204,14 +226,7 @@ def edit_provider(id):
         if 'logo' in request.files:
             file = request.files['logo']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                ext = filename.rsplit('.', 1)[-1].lower()
-                if ext in ['png', 'jpg', 'jpeg', 'gif', 'svg']:
-                    unique_filename = f'{uuid.uuid4()}.{ext}'
-                    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], 'logos', unique_filename)
-                    os.makedirs(os.path.dirname(filepath), exist_ok=True)
-                    file.save(filepath)
-                    provider.logo_url = f'/uploads/logos/{unique_filename}'
+                provider.logo_url = save_logo(file) or provider.logo_url
 
         db.session.commit()
 
@@ -345,3 +360,196 @@ def toggle_admin(id):
     status = 'granted' if user.is_admin else 'revoked'
     flash(f'Admin access {status} for {user.email}.', 'success')
     return redirect(url_for('admin.users'))
+
+
+# ===== Key Rotation =====
+@admin_bp.route('/key-rotation')
+@login_required
+@admin_required
+def key_rotation():
+    """Credential key rotation status."""
+    progress = KeyRotationService.get_progress()
+    old_keys_count = len(current_app.config.get('ENCRYPTION_OLD_KEYS', []))
+    return render_template('admin/key_rotation.html',
+                           progress=progress,
+                           old_keys_count=old_keys_count)
+
+
+@admin_bp.route('/key-rotation/start', methods=['POST'])
+@login_required
+@admin_required
+def start_key_rotation():
+    """Start background re-encryption of stored credentials."""
+    if KeyRotationService.is_running():
+        flash('Key rotation is already running.', 'info')
+        return redirect(url_for('admin.key_rotation'))
+
+    schedule_key_rotation()
+
+    flash('Key rotation started in the background.', 'success')
+    return redirect(url_for('admin.key_rotation'))
+
+
+# ===== Slow Queries =====
+@admin_bp.route('/slow-queries')
+@login_required
+@admin_required
+def slow_queries():
+    """Slowest query shapes from the slow query log, by total time."""
+    offenders = SlowQueryService.top_offenders()
+    return render_template('admin/slow_queries.html',
+                           offenders=offenders,
+                           threshold_ms=current_app.config['SLOW_QUERY_MS'])
+
+
+@admin_bp.route('/slow-queries/clear', methods=['POST'])
+@login_required
+@admin_required
+def clear_slow_queries():
+    """Empty the slow query log."""
+    SlowQueryService.clear()
+    flash('Slow query log cleared.', 'success')
+    return redirect(url_for('admin.slow_queries'))
+
+
+# ===== Profiles =====
+@admin_bp.route('/profiles')
+@login_required
+@admin_required
+def profiles():
+    """Saved sampling profiles, newest first."""
+    return render_template('admin/profiles.html',
+                           profiles=ProfilerService.list_profiles(),
+                           sample_rate=current_app.config['PROFILE_SAMPLE_RATE'],
+                           min_ms=current_app.config['PROFILE_SAMPLE_MIN_MS'])
+
+
+@admin_bp.route('/profiles/<name>')
+@login_required
+@admin_required
+def view_profile(name):
+    """Flame graph and hottest frames of a profile."""
+    try:
+        saved = ProfilerService.get(name)
+    except ValueError:
+        saved = None
+    if saved is None:
+        flash('Profile not found.', 'danger')
+        return redirect(url_for('admin.profiles'))
+
+    info, stacks = saved
+    return render_template('admin/profile.html',
+                           info=info,
+                           root=ProfilerService.flamegraph(stacks),
+                           hottest=ProfilerService.hottest(stacks))
+
+
+@admin_bp.route('/profiles/<name>.folded')
+@login_required
+@admin_required
+def download_profile(name):
+    """Download the collapsed stacks of a profile."""
+    try:
+        path = ProfilerService.folded_path(name)
+    except ValueError:
+        path = None
+    if path is None:
+        abort(404)
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f'{name}.folded')
+
+
+@admin_bp.route('/profiles/<name>/delete', methods=['POST'])
+@login_required
+@admin_required
+def delete_profile(name):
+    """Remove a saved profile."""
+    try:
+        ProfilerService.delete(name)
+    except ValueError:
+        abort(404)
+    flash('Profile deleted.', 'success')
+    return redirect(url_for('admin.profiles'))
+
+
+@admin_bp.route('/profiles/notification-checks', methods=['POST'])
+@login_required
+@admin_required
+def profile_notification_checks():
+    """Run the notification checks once under the profiler."""
+    schedule_notification_profile()
+    flash('Profiled notification check started; the profile appears here when it finishes.', 'success')
+    return redirect(url_for('admin.profiles'))
+
+
+# ===== Memory =====
+@admin_bp.route('/memory')
+@login_required
+@admin_required
+def memory():
+    """Memory status, snapshots and per-request allocation measurements.
+
+    ?snapshot=NAME shows a snapshot's largest allocations; ?old=A&new=B
+    compares two snapshots.
+    """
+    snapshots = MemoryService.list_snapshots()
+    report = None
+    try:
+        if request.args.get('old') and request.args.get('new'):
+            report = dict(MemoryService.diff(request.args['old'], request.args['new']),
+                          kind='diff', old=request.args['old'], new=request.args['new'])
+        elif request.args.get('snapshot'):
+            report = dict(MemoryService.top(request.args['snapshot']),
+                          kind='top', snapshot=request.args['snapshot'])
+    except ValueError as e:
+        flash(str(e), 'danger')
+
+    return render_template('admin/memory.html',
+                           status=MemoryService.status(),
+                           snapshots=snapshots,
+                           report=report,
+                           measurements=MemoryService.recent(),
+                           enabled=MemoryService.is_tracing(),
+                           sample_rate=current_app.config['MEMORY_SAMPLE_RATE'],
+                           alert_mb=current_app.config['MEMORY_ALERT_MB'])
+
+
+@admin_bp.route('/memory/snapshot', methods=['POST'])
+@login_required
+@admin_required
+def take_memory_snapshot():
+    """Save a snapshot of the traced allocations of this process."""
+    try:
+        name = MemoryService.take_snapshot()
+    except RuntimeError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.memory'))
+    flash(f'Snapshot {name} saved.', 'success')
+    return redirect(url_for('admin.memory', snapshot=name))
+
+
+@admin_bp.route('/memory/<name>/delete', methods=['POST'])
+@login_required
+@admin_required
+def delete_memory_snapshot(name):
+    """Remove a saved snapshot."""
+    try:
+        MemoryService.delete_snapshot(name)
+    except ValueError:
+        abort(404)
+    flash('Snapshot deleted.', 'success')
+    return redirect(url_for('admin.memory'))
+
+
+# ===== Exports =====
+@admin_bp.route('/export/subscriptions.csv')
+@login_required
+@admin_required
+@read_only
+def export_subscriptions():
+    """Export every user's subscriptions to CSV."""
+    rows = ExportService.subscription_rows()
+    return Response(
+        stream_with_context(ExportService.stream_csv(['User'] + SUBSCRIPTION_CSV_HEADER, rows)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename=all_subscriptions_{datetime.now().strftime("%Y%m%d")}.csv'}
+    )
@@ -3,13 +3,15 @@ from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from app import db
-from app.models import Subscription, Category, Provider, Notification
+from app.database import read_only
+from app.models import Subscription, Category, Provider, Notification, UserPortfolioSummary
 
 api_bp = Blueprint('api', __name__)
 
 
 @api_bp.route('/subscriptions')
 @login_required
+@read_only
 def get_subscriptions():
     """Get all subscriptions for current user."""
     status = request.args.get('status')
@@ -41,6 +43,7 @@ def get_subscriptions():
 
 @api_bp.route('/subscriptions/<int:id>')
 @login_required
+@read_only
 def get_subscription(id):
     """Get single subscription."""
     subscription = Subscription.query.filter_by(
@@ -68,13 +71,15 @@ def get_subscription(id):
 
 @api_bp.route('/dashboard/stats')
 @login_required
+@read_only
 def dashboard_stats():
     """Get dashboard statistics."""
     currency = current_user.default_currency
 
-    active_count = current_user.subscriptions.filter_by(status='active').count()
-    inactive_count = current_user.subscriptions.filter_by(status='inactive').count()
-    monthly_spend = current_user.get_monthly_spend(currency)
+    summary = UserPortfolioSummary.for_user(current_user.id)
+    active_count = summary.active_count
+    inactive_count = summary.inactive_count
+    monthly_spend = summary.get_monthly_spend(currency)
 
     today = datetime.utcnow().date()
     upcoming_date = today + timedelta(days=15)
@@ -96,6 +101,7 @@ def dashboard_stats():
 
 @api_bp.route('/categories')
 @login_required
+@read_only
 def get_categories():
     """Get all categories."""
     categories = Category.query.order_by(Category.name).all()
@@ -110,6 +116,7 @@ def get_categories():
 
 @api_bp.route('/providers')
 @login_required
+@read_only
 def get_providers():
     """Get all providers."""
     providers = Provider.query.order_by(Provider.name).all()
@@ -123,6 +130,7 @@ def get_providers():
 
 @api_bp.route('/notifications')
 @login_required
+@read_only
 def get_notifications():
     """Get user notifications."""
     unread_only = request.args.get('unread', 'false').lower() == 'true'
@@ -170,14 +178,16 @@ def mark_all_notifications_read():
 
 @api_bp.route('/spending/by-category')
 @login_required
+@read_only
 def spending_by_category():
     """Get spending breakdown by category."""
     currency = current_user.default_currency
     categories = Category.query.all()
+    totals = UserPortfolioSummary.for_user(current_user.id).get_category_spend(currency)
 
     data = []
     for category in categories:
-        total = category.get_total_monthly_spend(current_user.id, currency)
+        total = totals.get(category.id, 0)
         if total > 0:
             data.append({
                 'category': category.name,
@@ -195,6 +205,7 @@ def spending_by_category():
 
 @api_bp.route('/upcoming-renewals')
 @login_required
+@read_only
 def upcoming_renewals():
     """Get upcoming renewals."""
     days = request.args.get('days', 30, type=int)
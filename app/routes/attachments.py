@@ -1,23 +1,51 @@
 """Attachment routes for subscription documents."""
 import os
-import uuid
-from flask import Blueprint, render_template, redirect, url_for, flash, request, send_from_directory, current_app
+import re
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, send_from_directory,
+    current_app, jsonify, abort, Response
+)
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
-from app.models import Subscription, SubscriptionAttachment
+from app.models import Subscription, SubscriptionAttachment, SubscriptionGroup
+from app.services.archive_service import ArchiveService
+from app.services.download_service import DownloadService
+from app.services.storage_service import StorageService, UploadError, UploadOffsetMismatch
+from app.services.thumbnail_service import ThumbnailService
 
 attachments_bp = Blueprint('attachments', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
 
 
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
 def allowed_file(filename):
     """Check if file extension is allowed."""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def get_owned_upload(sub_id, upload_id):
+    """Get a resumable upload's subscription and metadata, or abort with 404."""
+    subscription = Subscription.query.filter_by(
+        id=sub_id, user_id=current_user.id
+    ).first_or_404()
+
+    try:
+        metadata = StorageService.get_upload(upload_id)
+    except UploadError:
+        metadata = None
+
+    if metadata is None or metadata['user_id'] != current_user.id \
+            or metadata['subscription_id'] != subscription.id:
+        abort(404)
+
+    return subscription, metadata
+
+
 @attachments_bp.route('/subscriptions/<int:sub_id>/attachments')
 @login_required
 def index(sub_id):
@@ -55,25 +83,10 @@ def upload(sub_id):
             return redirect(url_for('attachments.upload', sub_id=sub_id))
 
         if file and allowed_file(file.filename):
-            # Generate unique filename
             original_filename = secure_filename(file.filename)
-            ext = original_filename.rsplit('.', 1)[1].lower()
-            unique_filename = f'{uuid.uuid4()}.{ext}'
-
-            # Create attachments directory if not exists
-            attachments_dir = os.path.join(
-                current_app.config['UPLOAD_FOLDER'],
-                'attachments',
-                str(subscription.id)
-            )
-            os.makedirs(attachments_dir, exist_ok=True)
-
-            # Save file
-            filepath = os.path.join(attachments_dir, unique_filename)
-            file.save(filepath)
 
-            # Get file size
-            file_size = os.path.getsize(filepath)
+            # Save file (already streamed to disk and hashed while parsing)
+            sha256, file_size = StorageService.save_upload(file)
 
             # Get file type from form
             file_type = request.form.get('file_type', 'other')
@@ -82,14 +95,16 @@ def upload(sub_id):
             # Create attachment record
             attachment = SubscriptionAttachment(
                 subscription_id=subscription.id,
-                filename=unique_filename,
+                filename=sha256,
                 original_filename=original_filename,
                 file_type=file_type,
                 file_size=file_size,
+                sha256=sha256,
                 notes=notes
             )
             db.session.add(attachment)
             db.session.commit()
+            ThumbnailService.queue_attachment(attachment)
 
             flash('File uploaded successfully.', 'success')
             return redirect(url_for('subscriptions.view', id=sub_id))
@@ -100,6 +115,118 @@ def upload(sub_id):
     return render_template('attachments/upload.html', subscription=subscription)
 
 
+@attachments_bp.route('/subscriptions/<int:sub_id>/attachments/uploads', methods=['POST'])
+@login_required
+def create_upload(sub_id):
+    """Start a resumable chunked upload (AJAX)."""
+    subscription = Subscription.query.filter_by(
+        id=sub_id, user_id=current_user.id
+    ).first_or_404()
+
+    data = request.get_json(silent=True) or {}
+    original_filename = secure_filename(data.get('filename', ''))
+    size = data.get('size')
+
+    if not original_filename or not allowed_file(original_filename):
+        return jsonify({'error': 'File type not allowed.'}), 400
+
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({'error': 'Invalid file size.'}), 400
+
+    try:
+        upload_id = StorageService.create_upload({
+            'user_id': current_user.id,
+            'subscription_id': subscription.id,
+            'original_filename': original_filename,
+            'file_type': data.get('file_type', 'other'),
+            'notes': (data.get('notes') or '').strip(),
+            'size': size
+        })
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 413
+
+    return jsonify({
+        'upload_id': upload_id,
+        'chunk_size': current_app.config['UPLOAD_CHUNK_SIZE'],
+        'url': url_for('attachments.upload_chunk', sub_id=subscription.id, upload_id=upload_id)
+    }), 201
+
+
+@attachments_bp.route('/subscriptions/<int:sub_id>/attachments/uploads/<upload_id>')
+@login_required
+def upload_status(sub_id, upload_id):
+    """Get how many bytes of a resumable upload have been received (AJAX)."""
+    _, metadata = get_owned_upload(sub_id, upload_id)
+
+    return jsonify({
+        'received': metadata['received'],
+        'size': metadata['size']
+    })
+
+
+@attachments_bp.route('/subscriptions/<int:sub_id>/attachments/uploads/<upload_id>', methods=['PUT'])
+@login_required
+def upload_chunk(sub_id, upload_id):
+    """Append a chunk to a resumable upload (AJAX).
+
+    The request body is the raw chunk, placed with a
+    "Content-Range: bytes start-end/total" header. Without the header the
+    body is taken as the whole file.
+    """
+    subscription, metadata = get_owned_upload(sub_id, upload_id)
+
+    offset = 0
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        match = CONTENT_RANGE_PATTERN.match(content_range)
+        if not match or int(match.group(3)) != metadata['size']:
+            return jsonify({'error': 'Invalid Content-Range header.'}), 400
+        offset = int(match.group(1))
+
+    try:
+        received = StorageService.append_chunk(upload_id, request.stream, offset)
+    except UploadOffsetMismatch as e:
+        return jsonify({'error': str(e), 'received': e.received}), 409
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if received < metadata['size']:
+        return jsonify({'received': received, 'size': metadata['size']})
+
+    # Upload complete: move into the blob store and record it
+    sha256, file_size = StorageService.finish_upload(upload_id)
+
+    attachment = SubscriptionAttachment(
+        subscription_id=subscription.id,
+        filename=sha256,
+        original_filename=metadata['original_filename'],
+        file_type=metadata['file_type'],
+        file_size=file_size,
+        sha256=sha256,
+        notes=metadata['notes']
+    )
+    db.session.add(attachment)
+    db.session.commit()
+    ThumbnailService.queue_attachment(attachment)
+
+    flash('File uploaded successfully.', 'success')
+    return jsonify({
+        'received': received,
+        'size': metadata['size'],
+        'attachment_id': attachment.id,
+        'redirect': url_for('subscriptions.view', id=subscription.id)
+    }), 201
+
+
+@attachments_bp.route('/subscriptions/<int:sub_id>/attachments/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def abort_upload(sub_id, upload_id):
+    """Discard a resumable upload (AJAX)."""
+    get_owned_upload(sub_id, upload_id)
+    StorageService.abort_upload(upload_id)
+    return jsonify({'success': True})
+
+
 @attachments_bp.route('/attachments/<int:id>/download')
 @login_required
 def download(id):
@@ -112,17 +239,16 @@ def download(id):
         user_id=current_user.id
     ).first_or_404()
 
-    attachments_dir = os.path.join(
-        current_app.config['UPLOAD_FOLDER'],
-        'attachments',
-        str(subscription.id)
-    )
+    filepath = StorageService.attachment_path(attachment)
+    if not os.path.exists(filepath):
+        abort(404)
 
-    return send_from_directory(
-        attachments_dir,
-        attachment.filename,
-        as_attachment=True,
-        download_name=attachment.original_filename
+    # Blobs have no extension, so the MIME type comes from download_name
+    return DownloadService.send(
+        filepath,
+        attachment.original_filename,
+        etag=attachment.sha256 or True,
+        as_attachment=True
     )
 
 
@@ -138,13 +264,106 @@ def view(id):
         user_id=current_user.id
     ).first_or_404()
 
-    attachments_dir = os.path.join(
-        current_app.config['UPLOAD_FOLDER'],
-        'attachments',
-        str(subscription.id)
+    filepath = StorageService.attachment_path(attachment)
+    if not os.path.exists(filepath):
+        abort(404)
+
+    return DownloadService.send(
+        filepath,
+        attachment.original_filename,
+        etag=attachment.sha256 or True
     )
 
-    return send_from_directory(attachments_dir, attachment.filename)
+
+@attachments_bp.route('/attachments/<int:id>/thumbnail/<int:size>')
+@login_required
+def thumbnail(id, size):
+    """Serve a small preview of an image or PDF attachment."""
+    attachment = SubscriptionAttachment.query.get_or_404(id)
+
+    # Verify ownership
+    Subscription.query.filter_by(
+        id=attachment.subscription_id,
+        user_id=current_user.id
+    ).first_or_404()
+
+    if size not in current_app.config['THUMBNAIL_SIZES'] or not attachment.get_preview_kind():
+        abort(404)
+
+    filepath = ThumbnailService.get_thumbnail(attachment.sha256, size)
+    if filepath is None:
+        # Not generated yet (e.g. migrated file): queue it, the page falls back to an icon
+        ThumbnailService.queue_attachment(attachment)
+        abort(404)
+
+    # Derivatives are keyed by content hash, so they never change
+    return send_from_directory(
+        os.path.dirname(filepath),
+        os.path.basename(filepath),
+        max_age=31536000
+    )
+
+
+@attachments_bp.route('/uploads/logos/<filename>')
+@login_required
+def logo(filename):
+    """Serve a provider logo, as a thumbnail when a size is given."""
+    size = request.args.get('size', type=int)
+    sha256 = filename.rsplit('.', 1)[0]
+
+    if size in current_app.config['THUMBNAIL_SIZES'] and ThumbnailService.source_kind(filename) \
+            and secure_filename(filename) == filename:
+        filepath = ThumbnailService.get_thumbnail(sha256, size)
+        if filepath is not None:
+            return send_from_directory(os.path.dirname(filepath), os.path.basename(filepath),
+                                       max_age=31536000)
+        ThumbnailService.queue(StorageService.logo_path(filename), sha256, 'image')
+
+    # Logos are small: serve the original until the thumbnail is ready
+    return send_from_directory(os.path.dirname(StorageService.logo_path(filename)), filename)
+
+
+def send_zip(entries, download_name):
+    """Stream a ZIP of attachment entries as a download."""
+    response = Response(
+        ArchiveService.stream_zip(entries, current_app.config['UPLOAD_READ_SIZE']),
+        mimetype='application/zip'
+    )
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    response.cache_control.no_store = True
+    return response
+
+
+@attachments_bp.route('/subscriptions/<int:sub_id>/attachments/export.zip')
+@login_required
+def export_subscription(sub_id):
+    """Download all attachments of a subscription as a ZIP."""
+    subscription = Subscription.query.filter_by(
+        id=sub_id, user_id=current_user.id
+    ).first_or_404()
+
+    entries = ArchiveService.attachment_entries(current_user.id, subscription_id=subscription.id)
+    return send_zip(entries, f'{secure_filename(subscription.name) or "subscription"}-attachments.zip')
+
+
+@attachments_bp.route('/groups/<int:group_id>/attachments/export.zip')
+@login_required
+def export_group(group_id):
+    """Download all attachments of a group's subscriptions as a ZIP."""
+    group = SubscriptionGroup.query.filter_by(
+        id=group_id, user_id=current_user.id
+    ).first_or_404()
+
+    entries = ArchiveService.attachment_entries(current_user.id, group_id=group.id)
+    return send_zip(entries, f'{secure_filename(group.name) or "group"}-attachments.zip')
+
+
+@attachments_bp.route('/attachments/export.zip')
+@login_required
+def export_all():
+    """Download every attachment in the account as a ZIP."""
+    entries = ArchiveService.attachment_entries(current_user.id)
+    return send_zip(entries, 'attachments.zip')
 
 
 @attachments_bp.route('/attachments/<int:id>/delete', methods=['POST'])
@@ -159,21 +378,14 @@ def delete(id):
         user_id=current_user.id
     ).first_or_404()
 
-    # Delete file
-    attachments_dir = os.path.join(
-        current_app.config['UPLOAD_FOLDER'],
-        'attachments',
-        str(subscription.id)
-    )
-    filepath = os.path.join(attachments_dir, attachment.filename)
-
-    try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-    except OSError:
-        pass
+    # Legacy files belong to this attachment alone
+    if not attachment.is_blob_stored():
+        try:
+            os.remove(StorageService.attachment_path(attachment))
+        except OSError:
+            pass
 
-    # Delete record
+    # Delete record (the blob file is removed once its last reference goes)
     db.session.delete(attachment)
     db.session.commit()
 
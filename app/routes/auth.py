@@ -1,12 +1,13 @@
 """Authentication routes."""
 from datetime import datetime
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
 from app import db
 from app.models import User, Category, Provider, SubscriptionType
 from app.models.currency import CurrencyRate
 from app.services.currency_service import CurrencyService
+from app.services.backup_service import BackupService
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -149,6 +150,40 @@ def change_password():
     return redirect(url_for('auth.profile'))
 
 
+@auth_bp.route('/profile/backup.zip')
+@login_required
+def backup():
+    """Download a backup of all the user's data."""
+    response = Response(
+        stream_with_context(BackupService.stream_backup(current_user._get_current_object())),
+        mimetype='application/zip'
+    )
+    response.headers.set('Content-Disposition', 'attachment',
+                         filename=f'subscriptions_backup_{datetime.now().strftime("%Y%m%d")}.zip')
+    response.cache_control.no_store = True
+    return response
+
+
+@auth_bp.route('/profile/restore', methods=['POST'])
+@login_required
+def restore():
+    """Restore a backup archive into the user's account."""
+    file = request.files.get('file')
+    if not file or not file.filename:
+        flash('Please choose a backup file to restore.', 'danger')
+        return redirect(url_for('auth.profile'))
+
+    try:
+        counts = BackupService.restore_backup(current_user, file.stream)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('auth.profile'))
+
+    flash(f'Backup restored: {counts["subscriptions"]} subscriptions, '
+          f'{counts["subscription_attachments"]} attachments.', 'success')
+    return redirect(url_for('auth.profile'))
+
+
 def seed_default_data():
     """Seed default categories, providers, and subscription types."""
     # Seed categories
@@ -3,14 +3,19 @@ from datetime import datetime, timedelta
 import calendar
 from flask import Blueprint, render_template, request
 from flask_login import login_required, current_user
-from app.models import Subscription
+from app.database import read_only
+from app.models import UserPortfolioSummary
 from app.services.currency_service import CurrencyService
+from app.services.portfolio_service import PortfolioService, Portfolio
+from app.services.response_cache_service import cached_response
 
 budget_bp = Blueprint('budget', __name__)
 
 
 @budget_bp.route('/budget')
 @login_required
+@cached_response
+@read_only
 def index():
     """Budget overview and planning page."""
     currency = current_user.default_currency
@@ -32,11 +37,8 @@ def index():
     else:
         last_day = datetime(current_year, current_month + 1, 1).date() - timedelta(days=1)
 
-    renewals_this_month = current_user.subscriptions.filter(
-        Subscription.status == 'active',
-        Subscription.next_renewal_date >= first_day,
-        Subscription.next_renewal_date <= last_day
-    ).order_by(Subscription.next_renewal_date).all()
+    portfolio = PortfolioService.get(current_user)
+    renewals_this_month = portfolio.renewals_between(first_day, last_day)
 
     # Group by day
     renewals_by_day = {}
@@ -47,13 +49,10 @@ def index():
         renewals_by_day[day].append(sub)
 
     # Calculate monthly totals
-    monthly_total = sum(
-        sub.get_amount_in_currency(currency)
-        for sub in renewals_this_month
-    )
+    monthly_total = Portfolio.amount_total(renewals_this_month, currency)
 
     # Get spending breakdown
-    recurring_monthly = current_user.get_monthly_spend(currency)
+    recurring_monthly = UserPortfolioSummary.for_user(current_user.id).get_monthly_spend(currency)
 
     # Navigation
     prev_month = current_month - 1
@@ -86,11 +85,14 @@ def index():
 
 @budget_bp.route('/budget/yearly')
 @login_required
+@cached_response
+@read_only
 def yearly():
     """Yearly budget overview."""
     currency = current_user.default_currency
     today = datetime.utcnow().date()
     current_year = request.args.get('year', today.year, type=int)
+    portfolio = PortfolioService.get(current_user)
 
     months_data = []
 
@@ -102,16 +104,8 @@ def yearly():
             last_day = datetime(current_year, month + 1, 1).date() - timedelta(days=1)
 
         # Get renewals for this month
-        renewals = current_user.subscriptions.filter(
-            Subscription.status == 'active',
-            Subscription.next_renewal_date >= first_day,
-            Subscription.next_renewal_date <= last_day
-        ).all()
-
-        month_total = sum(
-            sub.get_amount_in_currency(currency)
-            for sub in renewals
-        )
+        renewals = portfolio.renewals_between(first_day, last_day)
+        month_total = Portfolio.amount_total(renewals, currency)
 
         months_data.append({
             'month': month,
@@ -133,11 +127,15 @@ def yearly():
 
 @budget_bp.route('/budget/forecast')
 @login_required
+@cached_response
+@read_only
 def forecast():
     """Budget forecast for upcoming months."""
     currency = current_user.default_currency
     today = datetime.utcnow().date()
 
+    portfolio = PortfolioService.get(current_user)
+
     # Forecast next 6 months
     forecast_data = []
 
@@ -156,16 +154,8 @@ def forecast():
             last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
 
         # Get expected renewals
-        renewals = current_user.subscriptions.filter(
-            Subscription.status == 'active',
-            Subscription.next_renewal_date >= first_day,
-            Subscription.next_renewal_date <= last_day
-        ).all()
-
-        month_total = sum(
-            sub.get_amount_in_currency(currency)
-            for sub in renewals
-        )
+        renewals = portfolio.renewals_between(first_day, last_day)
+        month_total = Portfolio.amount_total(renewals, currency)
 
         forecast_data.append({
             'month': f'{calendar.month_name[month]} {year}',
@@ -4,44 +4,42 @@ from flask import Blueprint, render_template, jsonify
 from flask_login import login_required, current_user
 from sqlalchemy import func
 from app import db
-from app.models import Subscription, Notification, Category
+from app.database import read_only
+from app.models import Notification, Category, UserPortfolioSummary
+from app.services.portfolio_service import PortfolioService
+from app.services.response_cache_service import cached_response
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 
 @dashboard_bp.route('/')
 @login_required
+@cached_response
+@read_only
 def index():
     """Main dashboard page."""
-    # Summary statistics
-    active_count = current_user.subscriptions.filter_by(status='active').count()
-    inactive_count = current_user.subscriptions.filter_by(status='inactive').count()
-    trial_count = current_user.subscriptions.filter(
-        Subscription.is_trial == True,
-        Subscription.status == 'active'
-    ).count()
-
-    monthly_spend = current_user.get_monthly_spend(current_user.default_currency)
+    # Summary statistics, maintained with every subscription change
+    summary = UserPortfolioSummary.for_user(current_user.id)
+    active_count = summary.active_count
+    inactive_count = summary.inactive_count
+    trial_count = summary.trial_count
+
+    monthly_spend = summary.get_monthly_spend(current_user.default_currency)
     yearly_spend = monthly_spend * 12
 
     # Upcoming renewals (next 15 days)
     today = datetime.utcnow().date()
     upcoming_date = today + timedelta(days=15)
-    upcoming_renewals = current_user.subscriptions.filter(
-        Subscription.status == 'active',
-        Subscription.next_renewal_date.isnot(None),
-        Subscription.next_renewal_date >= today,
-        Subscription.next_renewal_date <= upcoming_date
-    ).order_by(Subscription.next_renewal_date).limit(5).all()
+    upcoming_renewals = PortfolioService.get(current_user).renewals_between(today, upcoming_date)[:5]
 
     # Recent notifications
     recent_notifications = Notification.get_unread_for_user(current_user.id, limit=5)
 
     # Get spending by category for chart
-    category_spending = get_category_spending()
+    category_spending = get_category_spending(summary)
 
     # Get monthly spending for last 6 months
-    monthly_history = get_monthly_spending_history()
+    monthly_history = get_monthly_spending_history(monthly_spend)
 
     return render_template('dashboard/index.html',
                            active_count=active_count,
@@ -55,16 +53,14 @@ def index():
                            monthly_history=monthly_history)
 
 
-def get_category_spending():
-    """Get spending breakdown by category."""
+def get_category_spending(summary):
+    """Get spending breakdown by category from the user's portfolio summary."""
     categories = Category.query.all()
+    totals = summary.get_category_spend(current_user.default_currency)
     data = []
 
     for category in categories:
-        total = category.get_total_monthly_spend(
-            current_user.id,
-            current_user.default_currency
-        )
+        total = totals.get(category.id, 0)
         if total > 0:
             data.append({
                 'name': category.name,
@@ -77,7 +73,7 @@ def get_category_spending():
     return data
 
 
-def get_monthly_spending_history():
+def get_monthly_spending_history(monthly_spend):
     """Get monthly spending for the last 6 months."""
     today = datetime.utcnow().date()
     months = []
@@ -86,7 +82,7 @@ def get_monthly_spending_history():
         month_date = today - timedelta(days=i * 30)
         months.append({
             'label': month_date.strftime('%b'),
-            'amount': current_user.get_monthly_spend(current_user.default_currency)
+            'amount': monthly_spend
         })
 
     return months
@@ -94,13 +90,13 @@ def get_monthly_spending_history():
 
 @dashboard_bp.route('/api/stats')
 @login_required
+@read_only
 def api_stats():
     """API endpoint for dashboard statistics."""
-    active_count = current_user.subscriptions.filter_by(status='active').count()
-    monthly_spend = current_user.get_monthly_spend(current_user.default_currency)
+    summary = UserPortfolioSummary.for_user(current_user.id)
 
     return jsonify({
-        'active_count': active_count,
-        'monthly_spend': monthly_spend,
+        'active_count': summary.active_count,
+        'monthly_spend': summary.get_monthly_spend(current_user.default_currency),
         'currency': current_user.default_currency
     })
@@ -3,12 +3,14 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from app import db
 from app.models import SubscriptionGroup, Subscription
+from app.services.response_cache_service import cached_response
 
 groups_bp = Blueprint('groups', __name__)
 
 
 @groups_bp.route('/groups')
 @login_required
+@cached_response
 def index():
     """List all subscription groups."""
     groups = current_user.subscription_groups.all()
@@ -43,6 +45,7 @@ def add():
 
 @groups_bp.route('/groups/<int:id>')
 @login_required
+@cached_response
 def view(id):
     """View subscription group."""
     group = SubscriptionGroup.query.filter_by(
@@ -0,0 +1,20 @@
+"""Metrics routes."""
+import hmac
+from flask import Blueprint, Response, abort, current_app, request
+from app.services.metrics_service import MetricsService
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint, hidden until METRICS_TOKEN is set or METRICS_PUBLIC opts out of it."""
+    token = current_app.config['METRICS_TOKEN']
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+            abort(401)
+    elif not current_app.config['METRICS_PUBLIC']:
+        abort(404)
+
+    return Response(MetricsService.render(), mimetype='text/plain; version=0.0.4')
@@ -1,61 +1,58 @@
 """Reports and analytics routes."""
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, request, Response
+from flask import Blueprint, render_template, request, Response, stream_with_context, abort
 from flask_login import login_required, current_user
-from app.models import Subscription, Category, Provider, PaymentMethod
+from app.database import read_only
+from app.models import Category, Provider, UserPortfolioSummary
 from app.services.currency_service import CurrencyService
-import csv
-import io
+from app.services.portfolio_service import PortfolioService, Portfolio
+from app.services.response_cache_service import cached_response
+from app.services.export_service import ExportService, EXPORTERS, DATASETS, SUBSCRIPTION_CSV_HEADER
 
 reports_bp = Blueprint('reports', __name__)
 
 
+def _report_row(key, group, subs, currency):
+    """One group of a breakdown report: its subscriptions and their totals."""
+    monthly_total = Portfolio.monthly_total(subs, currency)
+    return {
+        key: group,
+        'subscriptions': subs,
+        'count': len(subs),
+        'monthly_total': monthly_total,
+        'yearly_total': monthly_total * 12
+    }
+
+
 @reports_bp.route('/reports')
 @login_required
+@read_only
 def index():
     """Reports overview page."""
-    return render_template('reports/index.html')
+    return render_template('reports/index.html',
+                           datasets=DATASETS,
+                           export_formats=ExportService.available_formats())
 
 
 @reports_bp.route('/reports/by-category')
 @login_required
+@cached_response
+@read_only
 def by_category():
     """Report: Subscriptions by category."""
-    categories = Category.query.all()
     currency = current_user.default_currency
+    by_category_id = PortfolioService.get(current_user).group_by('category_id', status='active')
 
     report_data = []
-    for category in categories:
-        subs = current_user.subscriptions.filter_by(
-            category_id=category.id,
-            status='active'
-        ).all()
-
+    for category in Category.query.all():
+        subs = by_category_id.get(category.id)
         if subs:
-            monthly_total = sum(s.get_monthly_amount(currency) for s in subs)
-            yearly_total = monthly_total * 12
-            report_data.append({
-                'category': category,
-                'subscriptions': subs,
-                'count': len(subs),
-                'monthly_total': monthly_total,
-                'yearly_total': yearly_total
-            })
+            report_data.append(_report_row('category', category, subs, currency))
 
     # Uncategorized
-    uncategorized = current_user.subscriptions.filter_by(
-        category_id=None,
-        status='active'
-    ).all()
+    uncategorized = by_category_id.get(None)
     if uncategorized:
-        monthly_total = sum(s.get_monthly_amount(currency) for s in uncategorized)
-        report_data.append({
-            'category': None,
-            'subscriptions': uncategorized,
-            'count': len(uncategorized),
-            'monthly_total': monthly_total,
-            'yearly_total': monthly_total * 12
-        })
+        report_data.append(_report_row('category', None, uncategorized, currency))
 
     # Sort by monthly total
     report_data.sort(key=lambda x: x['monthly_total'], reverse=True)
@@ -72,42 +69,23 @@ def by_category():
 
 @reports_bp.route('/reports/by-provider')
 @login_required
+@cached_response
+@read_only
 def by_provider():
     """Report: Subscriptions by provider."""
-    providers = Provider.query.all()
     currency = current_user.default_currency
+    by_provider_id = PortfolioService.get(current_user).group_by('provider_id', status='active')
 
     report_data = []
-    for provider in providers:
-        subs = current_user.subscriptions.filter_by(
-            provider_id=provider.id,
-            status='active'
-        ).all()
-
+    for provider in Provider.query.all():
+        subs = by_provider_id.get(provider.id)
         if subs:
-            monthly_total = sum(s.get_monthly_amount(currency) for s in subs)
-            report_data.append({
-                'provider': provider,
-                'subscriptions': subs,
-                'count': len(subs),
-                'monthly_total': monthly_total,
-                'yearly_total': monthly_total * 12
-            })
+            report_data.append(_report_row('provider', provider, subs, currency))
 
     # No provider
-    no_provider = current_user.subscriptions.filter_by(
-        provider_id=None,
-        status='active'
-    ).all()
+    no_provider = by_provider_id.get(None)
     if no_provider:
-        monthly_total = sum(s.get_monthly_amount(currency) for s in no_provider)
-        report_data.append({
-            'provider': None,
-            'subscriptions': no_provider,
-            'count': len(no_provider),
-            'monthly_total': monthly_total,
-            'yearly_total': monthly_total * 12
-        })
+        report_data.append(_report_row('provider', None, no_provider, currency))
 
     report_data.sort(key=lambda x: x['monthly_total'], reverse=True)
 
@@ -123,42 +101,23 @@ def by_provider():
 
 @reports_bp.route('/reports/by-payment-method')
 @login_required
+@cached_response
+@read_only
 def by_payment_method():
     """Report: Subscriptions by payment method."""
-    payment_methods = current_user.payment_methods.all()
     currency = current_user.default_currency
+    by_payment_method_id = PortfolioService.get(current_user).group_by('payment_method_id', status='active')
 
     report_data = []
-    for pm in payment_methods:
-        subs = pm.subscriptions.filter_by(
-            user_id=current_user.id,
-            status='active'
-        ).all()
-
+    for pm in current_user.payment_methods.all():
+        subs = by_payment_method_id.get(pm.id)
         if subs:
-            monthly_total = sum(s.get_monthly_amount(currency) for s in subs)
-            report_data.append({
-                'payment_method': pm,
-                'subscriptions': subs,
-                'count': len(subs),
-                'monthly_total': monthly_total,
-                'yearly_total': monthly_total * 12
-            })
+            report_data.append(_report_row('payment_method', pm, subs, currency))
 
     # No payment method
-    no_pm = current_user.subscriptions.filter_by(
-        payment_method_id=None,
-        status='active'
-    ).all()
+    no_pm = by_payment_method_id.get(None)
     if no_pm:
-        monthly_total = sum(s.get_monthly_amount(currency) for s in no_pm)
-        report_data.append({
-            'payment_method': None,
-            'subscriptions': no_pm,
-            'count': len(no_pm),
-            'monthly_total': monthly_total,
-            'yearly_total': monthly_total * 12
-        })
+        report_data.append(_report_row('payment_method', None, no_pm, currency))
 
     report_data.sort(key=lambda x: x['monthly_total'], reverse=True)
 
@@ -174,24 +133,20 @@ def by_payment_method():
 
 @reports_bp.route('/reports/by-status')
 @login_required
+@cached_response
+@read_only
 def by_status():
     """Report: Subscriptions by status."""
     currency = current_user.default_currency
+    by_status_name = PortfolioService.get(current_user).group_by('status')
 
     statuses = ['active', 'inactive', 'cancelled']
     report_data = []
 
     for status in statuses:
-        subs = current_user.subscriptions.filter_by(status=status).all()
+        subs = by_status_name.get(status)
         if subs:
-            monthly_total = sum(s.get_monthly_amount(currency) for s in subs)
-            report_data.append({
-                'status': status,
-                'subscriptions': subs,
-                'count': len(subs),
-                'monthly_total': monthly_total,
-                'yearly_total': monthly_total * 12
-            })
+            report_data.append(_report_row('status', status, subs, currency))
 
     total_monthly = sum(d['monthly_total'] for d in report_data)
     total_yearly = total_monthly * 12
@@ -205,50 +160,44 @@ def by_status():
 
 @reports_bp.route('/reports/export/csv')
 @login_required
+@read_only
 def export_csv():
     """Export subscriptions to CSV."""
-    subscriptions = current_user.subscriptions.all()
-
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Header
-    writer.writerow([
-        'Name', 'Provider', 'Category', 'Amount', 'Currency',
-        'Billing Cycle', 'Status', 'Next Renewal', 'Start Date',
-        'Auto Renew', 'Is Trial', 'Notes'
-    ])
-
-    for sub in subscriptions:
-        writer.writerow([
-            sub.name,
-            sub.provider.name if sub.provider else '',
-            sub.category.name if sub.category else '',
-            sub.amount,
-            sub.currency,
-            sub.billing_cycle,
-            sub.status,
-            sub.next_renewal_date.strftime('%Y-%m-%d') if sub.next_renewal_date else '',
-            sub.start_date.strftime('%Y-%m-%d'),
-            'Yes' if sub.auto_renew else 'No',
-            'Yes' if sub.is_trial else 'No',
-            sub.notes or ''
-        ])
-
-    output.seek(0)
+    rows = ExportService.subscription_rows(current_user.id)
     return Response(
-        output,
+        stream_with_context(ExportService.stream_csv(SUBSCRIPTION_CSV_HEADER, rows)),
         mimetype='text/csv',
         headers={'Content-Disposition': f'attachment; filename=subscriptions_{datetime.now().strftime("%Y%m%d")}.csv'}
     )
 
 
+@reports_bp.route('/reports/export/<dataset>.<format_name>')
+@login_required
+@read_only
+def export_data(dataset, format_name):
+    """Export a dataset in any available format."""
+    exporter = EXPORTERS.get(format_name)
+    if dataset not in DATASETS or exporter is None or not exporter.is_available():
+        abort(404)
+
+    filename = f'{dataset}_{datetime.now().strftime("%Y%m%d")}.{exporter.extension}'
+    return Response(
+        stream_with_context(ExportService.stream_dataset(dataset, format_name, current_user.id)),
+        mimetype=exporter.mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
 @reports_bp.route('/reports/spending-trends')
 @login_required
+@cached_response
+@read_only
 def spending_trends():
     """Report: Spending trends over time."""
     currency = current_user.default_currency
 
+    monthly_now = UserPortfolioSummary.for_user(current_user.id).get_monthly_spend(currency)
+
     # Get monthly data for last 12 months
     today = datetime.utcnow().date()
     months_data = []
@@ -259,7 +208,7 @@ def spending_trends():
 
         # For simplicity, we'll use current monthly spend
         # In a real app, you'd track historical spending
-        monthly_spend = current_user.get_monthly_spend(currency)
+        monthly_spend = monthly_now
 
         months_data.append({
             'label': month_label,
@@ -5,9 +5,10 @@ from flask_login import login_required, current_user
 from app import db
 from app.models import (
     Subscription, Category, Provider, SubscriptionType,
-    PaymentMethod, SubscriptionGroup, SubscriptionPriceHistory
+    PaymentMethod, SubscriptionGroup, SubscriptionPriceHistory, SubscriptionImport
 )
-from app.services.encryption_service import encrypt_credential, decrypt_credential
+from app.services.encryption_service import encrypt_credential
+from app.services.import_service import ImportService
 from app.services.notification_service import NotificationService
 
 subscriptions_bp = Blueprint('subscriptions', __name__)
@@ -152,10 +153,6 @@ def view(id):
     """View subscription details."""
     subscription = Subscription.query.filter_by(id=id, user_id=current_user.id).first_or_404()
 
-    # Decrypt credentials for display
-    account_email = decrypt_credential(subscription.account_email_encrypted)
-    account_username = decrypt_credential(subscription.account_username_encrypted)
-
     # Get price history
     price_history = subscription.price_history.order_by(
         SubscriptionPriceHistory.changed_at.desc()
@@ -166,8 +163,6 @@ def view(id):
 
     return render_template('subscriptions/view.html',
                            subscription=subscription,
-                           account_email=account_email,
-                           account_username=account_username,
                            price_history=price_history,
                            attachments=attachments)
 
@@ -221,11 +216,12 @@ def edit(id):
         elif not subscription.is_trial:
             subscription.trial_end_date = None
 
-        # Credentials
-        account_email = request.form.get('account_email', '').strip()
-        account_username = request.form.get('account_username', '').strip()
-        subscription.account_email_encrypted = encrypt_credential(account_email) if account_email else None
-        subscription.account_username_encrypted = encrypt_credential(account_username) if account_username else None
+        # Credentials (only when revealed in the form, otherwise keep stored values)
+        if request.form.get('credentials_revealed') == '1':
+            account_email = request.form.get('account_email', '').strip()
+            account_username = request.form.get('account_username', '').strip()
+            subscription.account_email_encrypted = encrypt_credential(account_email) if account_email else None
+            subscription.account_username_encrypted = encrypt_credential(account_username) if account_username else None
 
         subscription.notes = request.form.get('notes', '').strip()
 
@@ -241,10 +237,6 @@ def edit(id):
     payment_methods = current_user.payment_methods.all()
     groups = current_user.subscription_groups.all()
 
-    # Decrypt credentials
-    account_email = decrypt_credential(subscription.account_email_encrypted)
-    account_username = decrypt_credential(subscription.account_username_encrypted)
-
     return render_template('subscriptions/form.html',
                            subscription=subscription,
                            categories=categories,
@@ -252,11 +244,23 @@ def edit(id):
                            subscription_types=subscription_types,
                            payment_methods=payment_methods,
                            groups=groups,
-                           account_email=account_email,
-                           account_username=account_username,
                            mode='edit')
 
 
+@subscriptions_bp.route('/subscriptions/<int:id>/credentials')
+@login_required
+def credentials(id):
+    """Reveal decrypted account credentials (AJAX)."""
+    subscription = Subscription.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+
+    response = jsonify({
+        'account_email': subscription.account_email,
+        'account_username': subscription.account_username
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
 @subscriptions_bp.route('/subscriptions/<int:id>/delete', methods=['POST'])
 @login_required
 def delete(id):
@@ -329,3 +333,52 @@ def cancel(id):
 
     flash(f'"{subscription.name}" has been cancelled.', 'warning')
     return redirect(url_for('subscriptions.view', id=subscription.id))
+
+
+@subscriptions_bp.route('/subscriptions/import', methods=['GET', 'POST'])
+@login_required
+def import_csv():
+    """Import subscriptions from a CSV file."""
+    result = None
+    errors = []
+
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Please choose a CSV file to import.', 'danger')
+            return redirect(url_for('subscriptions.import_csv'))
+
+        try:
+            result, errors = ImportService.import_subscriptions(
+                current_user.id, file.stream, filename=file.filename
+            )
+        except ValueError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('subscriptions.import_csv'))
+
+        flash(f'Imported {result.imported_count} subscriptions.', 'success')
+
+    imports = current_user.subscription_imports.order_by(
+        SubscriptionImport.created_at.desc()
+    ).limit(10).all()
+
+    return render_template('subscriptions/import.html',
+                           result=result,
+                           errors=errors,
+                           imports=imports)
+
+
+@subscriptions_bp.route('/subscriptions/imports/<int:id>/revert', methods=['POST'])
+@login_required
+def revert_import(id):
+    """Delete the subscriptions created by an import."""
+    subscription_import = SubscriptionImport.query.filter_by(id=id, user_id=current_user.id).first_or_404()
+
+    if subscription_import.is_reverted():
+        flash('This import has already been reverted.', 'info')
+        return redirect(url_for('subscriptions.import_csv'))
+
+    count = ImportService.revert_import(subscription_import)
+
+    flash(f'Import reverted: {count} subscriptions deleted.', 'warning')
+    return redirect(url_for('subscriptions.import_csv'))
@@ -3,10 +3,46 @@ from app.services.encryption_service import EncryptionService
 from app.services.email_service import EmailService
 from app.services.notification_service import NotificationService
 from app.services.currency_service import CurrencyService
+from app.services.key_rotation_service import KeyRotationService
+from app.services.storage_service import StorageService
+from app.services.blob_service import BlobService
+from app.services.thumbnail_service import ThumbnailService
+from app.services.download_service import DownloadService
+from app.services.archive_service import ArchiveService
+from app.services.export_service import ExportService
+from app.services.import_service import ImportService
+from app.services.backup_service import BackupService
+from app.services.query_plan_service import QueryPlanService
+from app.services.write_queue_service import WriteQueueService
+from app.services.query_stats_service import QueryStatsService
+from app.services.slow_query_service import SlowQueryService
+from app.services.metrics_service import MetricsService
+from app.services.profiler_service import ProfilerService
+from app.services.memory_service import MemoryService
+from app.services.portfolio_service import PortfolioService
+from app.services.response_cache_service import ResponseCacheService
 
 __all__ = [
     'EncryptionService',
     'EmailService',
     'NotificationService',
-    'CurrencyService'
+    'CurrencyService',
+    'KeyRotationService',
+    'StorageService',
+    'BlobService',
+    'ThumbnailService',
+    'DownloadService',
+    'ArchiveService',
+    'ExportService',
+    'ImportService',
+    'BackupService',
+    'QueryPlanService',
+    'WriteQueueService',
+    'QueryStatsService',
+    'SlowQueryService',
+    'MetricsService',
+    'ProfilerService',
+    'MemoryService',
+    'PortfolioService',
+    'ResponseCacheService'
 ]
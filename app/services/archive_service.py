@@ -0,0 +1,106 @@
+"""Archive service for streaming ZIP downloads."""
+import os
+import zipfile
+from werkzeug.utils import secure_filename
+from app.models import Subscription, SubscriptionAttachment
+from app.services.storage_service import StorageService
+
+# Formats that are already compressed: stored as-is instead of deflated again
+STORED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'webp', 'docx', 'zip'}
+
+
+class StreamBuffer:
+    """Write-only file object that collects output for a generator to yield.
+
+    It has no tell() or seek(), so ZipFile writes local headers with data
+    descriptors and never goes back to patch earlier output.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Return and clear everything written since the last drain."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArchiveService:
+    """Service for building ZIP archives of attachments on the fly."""
+
+    @staticmethod
+    def attachment_entries(user_id, subscription_id=None, group_id=None):
+        """Get (archive name, path, uploaded_at) for a user's attachments.
+
+        Entries are grouped in one folder per subscription; clashing names
+        get a numeric suffix. Paths are resolved here so streaming needs no
+        app context.
+        """
+        query = SubscriptionAttachment.query.join(Subscription).with_entities(
+            SubscriptionAttachment, Subscription.name
+        ).filter(Subscription.user_id == user_id)
+
+        if subscription_id is not None:
+            query = query.filter(Subscription.id == subscription_id)
+        if group_id is not None:
+            query = query.filter(Subscription.group_id == group_id)
+
+        query = query.order_by(Subscription.name, Subscription.id, SubscriptionAttachment.uploaded_at)
+
+        entries = []
+        used_names = set()
+        for attachment, subscription_name in query:
+            folder = secure_filename(subscription_name) or f'subscription-{attachment.subscription_id}'
+            base, ext = os.path.splitext(secure_filename(attachment.original_filename) or 'file')
+            name = f'{folder}/{base}{ext}'
+            counter = 2
+            while name in used_names:
+                name = f'{folder}/{base} ({counter}){ext}'
+                counter += 1
+            used_names.add(name)
+            entries.append((name, StorageService.attachment_path(attachment), attachment.uploaded_at))
+        return entries
+
+    @staticmethod
+    def stream_zip(entries, chunk_size=64 * 1024):
+        """Yield a ZIP archive of (archive name, path, modified datetime) entries.
+
+        Files are read and emitted chunk by chunk, so memory stays constant
+        and the first bytes are sent before later files are opened. Missing
+        files are skipped.
+        """
+        buffer = StreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', allowZip64=True) as archive:
+            for name, path, modified in entries:
+                try:
+                    source = open(path, 'rb')
+                except OSError:
+                    continue
+
+                with source:
+                    info = zipfile.ZipInfo(name, date_time=modified.timetuple()[:6])
+                    info.file_size = os.fstat(source.fileno()).st_size
+                    ext = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+                    info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS \
+                        else zipfile.ZIP_DEFLATED
+
+                    # The known size lets ZipFile pick Zip64 headers only when needed
+                    with archive.open(info, 'w') as target:
+                        for chunk in iter(lambda: source.read(chunk_size), b''):
+                            target.write(chunk)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+
+        # Trailing data descriptor and central directory
+        yield buffer.drain()
@@ -0,0 +1,318 @@
+"""Backup service for per-user backup and restore archives."""
+import io
+import json
+import os
+import zipfile
+from datetime import date, datetime
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import (
+    Subscription, SubscriptionGroup, SubscriptionPriceHistory, SubscriptionAttachment,
+    AttachmentBlob, PaymentMethod, Notification, Provider, Category, SubscriptionType, User,
+    UserPortfolioSummary
+)
+from app.services.archive_service import StreamBuffer, STORED_EXTENSIONS
+from app.services.storage_service import StorageService
+
+BACKUP_FORMAT = 'subscription-manager-backup'
+BACKUP_VERSION = 1
+
+# User-owned tables in restore order: (archive name, model, {column: table its IDs refer to})
+BACKUP_TABLES = (
+    ('payment_methods', PaymentMethod, {}),
+    ('subscription_groups', SubscriptionGroup, {}),
+    ('subscriptions', Subscription, {
+        'payment_method_id': 'payment_methods',
+        'group_id': 'subscription_groups',
+    }),
+    ('subscription_price_history', SubscriptionPriceHistory, {'subscription_id': 'subscriptions'}),
+    ('notifications', Notification, {'subscription_id': 'subscriptions'}),
+    ('subscription_attachments', SubscriptionAttachment, {'subscription_id': 'subscriptions'}),
+)
+
+# Shared reference data is written by name, since IDs differ between instances
+REFERENCE_COLUMNS = {
+    'provider_id': ('provider', Provider),
+    'category_id': ('category', Category),
+    'subscription_type_id': ('subscription_type', SubscriptionType),
+}
+
+
+def _encode(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f'Cannot serialize {type(value).__name__}')
+
+
+def _decoder(column):
+    """Get a function turning a JSON value back into the column's Python type."""
+    if isinstance(column.type, db.DateTime):
+        return datetime.fromisoformat
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat
+    return None
+
+
+class BackupService:
+    """Service for backing up and restoring everything a user owns.
+
+    A backup is a ZIP archive holding manifest.json, one NDJSON file per
+    user-owned table under data/, and the attachment files under blobs/,
+    named by content hash. Both directions work row batch by row batch and
+    file chunk by file chunk, so archive size is not limited by memory.
+    """
+
+    @staticmethod
+    def _table_query(name, model, user_id):
+        """Select a user's rows of a backup table, ordered by ID."""
+        table = model.__table__
+        if name == 'subscriptions':
+            query = select(table)
+            for column, (label, reference) in REFERENCE_COLUMNS.items():
+                alias = reference.__table__.alias(label)
+                query = query.add_columns(alias.c.name.label(label)).outerjoin(
+                    alias, alias.c.id == table.c[column]
+                )
+            return query.where(table.c.user_id == user_id).order_by(table.c.id)
+
+        if 'user_id' in table.c:
+            return select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+
+        subscriptions = Subscription.__table__
+        return select(table).join(
+            subscriptions, subscriptions.c.id == table.c.subscription_id
+        ).where(subscriptions.c.user_id == user_id).order_by(table.c.id)
+
+    @staticmethod
+    def _table_lines(name, model, user_id, files):
+        """Yield NDJSON chunks for a table, one chunk per batch of rows.
+
+        Attachment rows get a "file" key naming their archive member, and
+        the files to include are added to files as (member, path, ext).
+        """
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        result = db.session.execute(
+            BackupService._table_query(name, model, user_id).execution_options(yield_per=batch_size)
+        )
+
+        for batch in result.mappings().partitions():
+            lines = []
+            for row in batch:
+                record = dict(row)
+                record.pop('user_id', None)
+                for column in REFERENCE_COLUMNS:
+                    record.pop(column, None)
+
+                if model is SubscriptionAttachment:
+                    if row['sha256'] is not None and row['filename'] == row['sha256']:
+                        record['file'] = f'blobs/{row["sha256"]}'
+                        path = StorageService.blob_path(row['sha256'])
+                    else:
+                        record['file'] = f'files/{row["id"]}'
+                        path = StorageService.legacy_path(row['subscription_id'], row['filename'])
+                    if record['file'] not in files and os.path.exists(path):
+                        original_filename = row['original_filename']
+                        ext = original_filename.rsplit('.', 1)[-1].lower() if '.' in original_filename else ''
+                        files[record['file']] = (path, ext)
+
+                lines.append(json.dumps(record, default=_encode))
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+    @staticmethod
+    def stream_backup(user, chunk_size=64 * 1024):
+        """Yield a backup archive of a user's data as chunks of bytes.
+
+        Needs an app context for the whole iteration (stream_with_context).
+        """
+        buffer = StreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            manifest = {
+                'format': BACKUP_FORMAT,
+                'version': BACKUP_VERSION,
+                'created_at': datetime.utcnow().isoformat(),
+                'user': {
+                    'email': user.email,
+                    'full_name': user.full_name,
+                    'default_currency': user.default_currency,
+                },
+                'tables': [name for name, _, _ in BACKUP_TABLES],
+            }
+            archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+            files = {}
+            for name, model, _ in BACKUP_TABLES:
+                info = zipfile.ZipInfo(f'data/{name}.ndjson', date_time=datetime.now().timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                # Size is unknown up front, so always allow Zip64 sizes
+                with archive.open(info, 'w', force_zip64=True) as target:
+                    for chunk in BackupService._table_lines(name, model, user.id, files):
+                        target.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+
+            for member, (path, ext) in files.items():
+                try:
+                    source = open(path, 'rb')
+                except OSError:
+                    continue
+
+                with source:
+                    info = zipfile.ZipInfo(member, date_time=datetime.now().timetuple()[:6])
+                    info.file_size = os.fstat(source.fileno()).st_size
+                    info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS \
+                        else zipfile.ZIP_DEFLATED
+                    with archive.open(info, 'w') as target:
+                        for chunk in iter(lambda: source.read(chunk_size), b''):
+                            target.write(chunk)
+                            data = buffer.drain()
+                            if data:
+                                yield data
+
+        yield buffer.drain()
+
+    @staticmethod
+    def _read_manifest(archive):
+        try:
+            manifest = json.loads(archive.read('manifest.json'))
+        except (KeyError, ValueError):
+            raise ValueError('The file is not a backup archive.')
+        if manifest.get('format') != BACKUP_FORMAT:
+            raise ValueError('The file is not a backup archive.')
+        if manifest.get('version') != BACKUP_VERSION:
+            raise ValueError(f'Unsupported backup version {manifest.get("version")}.')
+        return manifest
+
+    @staticmethod
+    def _read_records(archive, name):
+        """Yield the records of a table's NDJSON file, one line at a time."""
+        try:
+            member = archive.open(f'data/{name}.ndjson')
+        except KeyError:
+            return
+        with member, io.TextIOWrapper(member, encoding='utf-8') as lines:
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+
+    @staticmethod
+    def _restore_files(archive):
+        """Copy the archive's files into the blob store.
+
+        Returns {member name: (sha256, size)}.
+        """
+        stored = {}
+        for info in archive.infolist():
+            if not info.filename.startswith(('blobs/', 'files/')) or info.is_dir():
+                continue
+            with archive.open(info) as source:
+                sha256, size = StorageService.save_stream(source)
+            if info.filename.startswith('blobs/') and info.filename != f'blobs/{sha256}':
+                raise ValueError(f'{info.filename} does not match its content hash.')
+            stored[info.filename] = (sha256, size)
+        return stored
+
+    @staticmethod
+    def restore_backup(user, source):
+        """Load a backup archive into a user's account in one transaction.
+
+        source is a path or a seekable binary file. Rows get new IDs and
+        references between them are remapped; providers, categories and
+        types are matched by name. Restored data is added to what the
+        account already has. Returns {table name: rows restored}.
+        Raises ValueError if the archive is invalid.
+
+        Encrypted credentials are restored as stored, so the source
+        instance's key must be current or listed in ENCRYPTION_OLD_KEYS.
+        """
+        batch_size = current_app.config['IMPORT_BATCH_SIZE']
+        try:
+            archive = zipfile.ZipFile(source)
+        except zipfile.BadZipFile:
+            raise ValueError('The file is not a backup archive.')
+
+        with archive:
+            BackupService._read_manifest(archive)
+
+            references = {
+                label: {name: id for id, name in db.session.query(reference.id, reference.name)}
+                for label, reference in REFERENCE_COLUMNS.values()
+            }
+            id_maps = {}
+            counts = {}
+
+            try:
+                # Files first: attachment rows need their blobs in the store
+                files = BackupService._restore_files(archive)
+                counts['files'] = len(files)
+                connection = db.session.connection()
+
+                for name, model, foreign_keys in BACKUP_TABLES:
+                    table = model.__table__
+                    columns = [column for column in table.c if column.key != 'id']
+                    decoders = {column.key: _decoder(column) for column in columns}
+                    id_map = id_maps[name] = {}
+                    counts[name] = 0
+
+                    batch = []
+                    old_ids = []
+                    records = BackupService._read_records(archive, name)
+                    for record in records:
+                        row = {}
+                        for column in columns:
+                            value = record.get(column.key)
+                            if value is not None and decoders[column.key]:
+                                value = decoders[column.key](value)
+                            row[column.key] = value
+
+                        if 'user_id' in row:
+                            row['user_id'] = user.id
+                        for column, (label, _) in REFERENCE_COLUMNS.items():
+                            if column in row:
+                                row[column] = references[label].get(record.get(label))
+                        for column, target in foreign_keys.items():
+                            if row[column] is not None:
+                                row[column] = id_maps[target].get(row[column])
+                        if model is SubscriptionAttachment:
+                            if row['subscription_id'] is None or record.get('file') not in files:
+                                continue
+                            row['sha256'], row['file_size'] = files[record['file']]
+                            row['filename'] = row['sha256']
+                        elif model is SubscriptionPriceHistory and row['subscription_id'] is None:
+                            continue
+
+                        batch.append(row)
+                        old_ids.append(record.get('id'))
+                        if len(batch) >= batch_size:
+                            BackupService._insert_batch(connection, model, batch, old_ids, id_map)
+                            counts[name] += len(batch)
+                            batch, old_ids = [], []
+
+                    if batch:
+                        BackupService._insert_batch(connection, model, batch, old_ids, id_map)
+                        counts[name] += len(batch)
+
+                # Core inserts skip the ORM events that maintain the summary and data version
+                UserPortfolioSummary.rebuild([user.id])
+                User.bump_data_version(db.session, [user.id])
+            except Exception:
+                # Blobs already copied are unreferenced and removed by blob GC
+                db.session.rollback()
+                raise
+
+        db.session.commit()
+        return counts
+
+    @staticmethod
+    def _insert_batch(connection, model, rows, old_ids, id_map):
+        """Insert a batch of rows, recording old ID -> new ID in id_map."""
+        table = model.__table__
+        if model is SubscriptionAttachment:
+            # Core inserts skip the ORM events that count blob references
+            AttachmentBlob.acquire_many(connection, [(row['sha256'], row['file_size']) for row in rows])
+
+        new_ids = connection.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        id_map.update(zip(old_ids, new_ids))
@@ -0,0 +1,178 @@
+"""Blob service for attachment storage maintenance."""
+import hashlib
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import exists, func, or_, select
+from app import db
+from app.models import SubscriptionAttachment, AttachmentBlob
+from app.services.storage_service import StorageService
+
+
+def _hash_file(path, chunk_size):
+    """Hash a file on disk. Returns (sha256 hex digest, size) or None if missing."""
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+                size += len(chunk)
+    except OSError:
+        return None
+    return sha256.hexdigest(), size
+
+
+def _link_into_store(path, destination):
+    """Add a file to the store without removing the original.
+
+    Returns False if an identical blob was already stored.
+    """
+    if os.path.exists(destination):
+        return False
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(path, destination)
+    except OSError:
+        # Hard links unsupported or cross-device: fall back to a copy
+        temp = f'{destination}.{os.getpid()}.tmp'
+        shutil.copyfile(path, temp)
+        os.replace(temp, destination)
+    return True
+
+
+class BlobService:
+    """Service for migrating and garbage-collecting attachment blobs."""
+
+    @staticmethod
+    def migrate_legacy_attachments(workers=4, batch_size=200):
+        """Move attachments from per-subscription folders into the blob store.
+
+        Files are hashed in parallel, linked into the store (identical files
+        are stored once) and their rows updated with one commit per batch.
+        Originals are removed only after the batch is committed. Must be
+        called inside an app context.
+        """
+        stats = {'migrated': 0, 'deduplicated': 0, 'missing': 0, 'bytes_saved': 0}
+        chunk_size = current_app.config['UPLOAD_READ_SIZE']
+        last_id = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                attachments = SubscriptionAttachment.query.filter(
+                    SubscriptionAttachment.id > last_id,
+                    or_(
+                        SubscriptionAttachment.sha256.is_(None),
+                        SubscriptionAttachment.filename != SubscriptionAttachment.sha256
+                    )
+                ).order_by(SubscriptionAttachment.id).limit(batch_size).all()
+
+                if not attachments:
+                    break
+                last_id = attachments[-1].id
+
+                paths = [StorageService.attachment_path(attachment) for attachment in attachments]
+                hashes = list(executor.map(lambda path: _hash_file(path, chunk_size), paths))
+
+                acquired = []
+                for attachment, path, result in zip(attachments, paths, hashes):
+                    if result is None:
+                        stats['missing'] += 1
+                        continue
+
+                    sha256, size = result
+                    if _link_into_store(path, StorageService.blob_path(sha256)):
+                        stats['migrated'] += 1
+                    else:
+                        stats['deduplicated'] += 1
+                        stats['bytes_saved'] += size
+
+                    attachment.sha256 = sha256
+                    attachment.filename = sha256
+                    attachment.file_size = size
+                    acquired.append((sha256, size))
+
+                AttachmentBlob.acquire_many(db.session.connection(), acquired)
+                db.session.commit()
+
+                for path, result in zip(paths, hashes):
+                    if result is not None:
+                        os.remove(path)
+
+        # Drop now-empty legacy folders
+        legacy_root = os.path.join(current_app.config['UPLOAD_FOLDER'], 'attachments')
+        if os.path.isdir(legacy_root):
+            for name in os.listdir(legacy_root):
+                try:
+                    os.rmdir(os.path.join(legacy_root, name))
+                except OSError:
+                    pass
+
+        return stats
+
+    @staticmethod
+    def collect_garbage(grace_hours=1):
+        """Reconcile blob rows with attachments and files on disk.
+
+        Fixes drifted reference counts, deletes unreferenced blobs and removes
+        files with no row, which includes the files of deleted attachments.
+        Counts are fixed with single UPDATE statements so concurrent uploads
+        are never lost. Files younger than grace_hours are kept, since an
+        upload stores (or touches) its file just before committing its row.
+        """
+        stats = {'recounted': 0, 'removed_rows': 0, 'removed_files': 0}
+        attachments = SubscriptionAttachment.__table__
+        blobs = AttachmentBlob.__table__
+
+        references = select(func.count()).where(
+            attachments.c.sha256 == blobs.c.sha256,
+            attachments.c.filename == attachments.c.sha256
+        ).scalar_subquery()
+        result = db.session.execute(
+            blobs.update().where(blobs.c.ref_count != references).values(ref_count=references)
+        )
+        stats['recounted'] = result.rowcount
+
+        # Referenced blobs that lost their row
+        orphaned = db.session.query(
+            SubscriptionAttachment.sha256,
+            func.max(SubscriptionAttachment.file_size),
+            func.count(SubscriptionAttachment.id)
+        ).filter(
+            SubscriptionAttachment.filename == SubscriptionAttachment.sha256,
+            ~exists().where(blobs.c.sha256 == attachments.c.sha256)
+        ).group_by(SubscriptionAttachment.sha256).all()
+        for sha256, size, count in orphaned:
+            db.session.add(AttachmentBlob(sha256=sha256, size=size or 0, ref_count=count))
+            stats['recounted'] += 1
+        db.session.commit()
+
+        unreferenced = [
+            sha256 for (sha256,) in
+            db.session.query(AttachmentBlob.sha256).filter(AttachmentBlob.ref_count <= 0)
+        ]
+        for sha256 in unreferenced:
+            # Re-check the count in the DELETE itself in case an upload revived it
+            result = db.session.execute(
+                blobs.delete().where(blobs.c.sha256 == sha256, blobs.c.ref_count <= 0)
+            )
+            db.session.commit()
+            # The file goes with the other row-less files below, once past the grace period
+            stats['removed_rows'] += result.rowcount
+
+        known = {sha256 for (sha256,) in db.session.query(AttachmentBlob.sha256)}
+        cutoff = time.time() - grace_hours * 3600
+
+        for directory, _, filenames in os.walk(current_app.config['BLOB_FOLDER']):
+            for name in filenames:
+                path = os.path.join(directory, name)
+                try:
+                    if name not in known and os.path.getmtime(path) < cutoff:
+                        StorageService.remove_blob(name)
+                        stats['removed_files'] += 1
+                except OSError:
+                    pass
+
+        return stats
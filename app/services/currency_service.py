@@ -1,6 +1,9 @@
 """Currency service for conversion operations."""
+from datetime import datetime
 from app import db
+from app.database import supports_upsert, upsert
 from app.models.currency import CurrencyRate
+from app.models.user import User
 
 
 class CurrencyService:
@@ -41,9 +44,23 @@ class CurrencyService:
 
     @staticmethod
     def seed_default_rates():
-        """Seed default currency rates."""
+        """Seed default currency rates, keeping rates that already exist."""
         default_rates = CurrencyRate.get_default_rates()
 
+        connection = db.session.connection()
+        if supports_upsert(connection):
+            table = CurrencyRate.__table__
+            now = datetime.utcnow()
+            result = upsert(
+                connection, table,
+                [dict(rate_data, updated_at=now) for rate_data in default_rates],
+                index_elements=[table.c.from_currency, table.c.to_currency]
+            )
+            if result.rowcount != 0:  # -1 when the driver cannot tell
+                User.bump_data_version(db.session)
+            db.session.commit()
+            return
+
         for rate_data in default_rates:
             existing = CurrencyRate.query.filter_by(
                 from_currency=rate_data['from_currency'],
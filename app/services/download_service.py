@@ -0,0 +1,93 @@
+"""Download service for serving stored files."""
+import os
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+from werkzeug.utils import send_file
+
+
+class DownloadService:
+    """Service for sending files with Range and conditional request support.
+
+    DOWNLOAD_OFFLOAD selects how the body is sent:
+    - '' (default): the WSGI server streams the file; full responses use the
+      server's wsgi.file_wrapper (sendfile under gunicorn).
+    - 'sendfile': range responses are also handed to wsgi.file_wrapper,
+      positioned at the range start, so the server can os.sendfile them.
+    - 'x-sendfile' / 'x-accel-redirect': the front proxy (Apache, nginx)
+      sends the file and handles Range itself; the app only answers 304s.
+    """
+
+    @staticmethod
+    def send(path, download_name, etag, as_attachment=False):
+        """Send a file. etag is a string (e.g. the content hash) or True to derive one.
+
+        Callers must check access first; headers and status are final.
+        """
+        mode = current_app.config['DOWNLOAD_OFFLOAD']
+        if mode in ('x-sendfile', 'x-accel-redirect'):
+            return DownloadService._send_offloaded(path, download_name, etag, as_attachment, mode)
+
+        response = send_file(
+            path,
+            request.environ,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=etag
+        )
+        response.cache_control.private = True
+        if response.status_code == 200:
+            # Werkzeug only advertises ranges on range requests; PDF viewers look for it
+            response.headers['Accept-Ranges'] = 'bytes'
+
+        if mode == 'sendfile' and response.status_code == 206:
+            DownloadService._use_file_wrapper(response, path)
+        return response
+
+    @staticmethod
+    def _use_file_wrapper(response, path):
+        """Replace a range response body with a server file wrapper at the range start.
+
+        Servers such as gunicorn send a wrapped file with os.sendfile from its
+        current position, bounded by Content-Length. Without a server file
+        wrapper the body is left as Werkzeug's range iterator.
+        """
+        file_wrapper = request.environ.get('wsgi.file_wrapper')
+        if file_wrapper is None:
+            return
+
+        start = response.content_range.start
+        f = open(path, 'rb')
+        f.seek(start)
+        response.response.close()
+        response.response = file_wrapper(f, current_app.config['UPLOAD_READ_SIZE'])
+
+    @staticmethod
+    def _send_offloaded(path, download_name, etag, as_attachment, mode):
+        """Answer with headers only and let the front proxy send the file."""
+        response = send_file(
+            path,
+            request.environ,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            use_x_sendfile=True,
+            conditional=False,
+            etag=etag
+        )
+        response.cache_control.private = True
+
+        # Only conditional requests are answered here; the proxy serves ranges
+        etag_value, _ = response.get_etag()
+        if request.method in ('GET', 'HEAD') and not is_resource_modified(
+                request.environ, etag=etag_value, last_modified=response.last_modified):
+            response.status_code = 304
+            response.headers.pop('X-Sendfile', None)
+            response.headers.pop('Content-Length', None)
+            return response
+
+        if mode == 'x-accel-redirect':
+            response.headers.pop('X-Sendfile', None)
+            relative_path = os.path.relpath(path, current_app.config['UPLOAD_FOLDER'])
+            response.headers['X-Accel-Redirect'] = \
+                current_app.config['DOWNLOAD_ACCEL_PREFIX'] + relative_path.replace(os.sep, '/')
+        return response
@@ -2,6 +2,7 @@
 from flask import current_app, render_template_string
 from flask_mail import Message
 from app import mail
+from app.services.metrics_service import MetricsService
 
 
 class EmailService:
@@ -10,6 +11,7 @@ class EmailService:
     @staticmethod
     def send_email(to, subject, body, html=None):
         """Send an email."""
+        MetricsService.inc('email_queue_depth')
         try:
             msg = Message(
                 subject=subject,
@@ -18,10 +20,14 @@ class EmailService:
                 html=html
             )
             mail.send(msg)
+            MetricsService.inc('emails_sent_total', result='sent')
             return True
         except Exception as e:
             current_app.logger.error(f'Failed to send email: {e}')
+            MetricsService.inc('emails_sent_total', result='failed')
             return False
+        finally:
+            MetricsService.inc('email_queue_depth', -1)
 
     @staticmethod
     def send_renewal_reminder(user, subscription):
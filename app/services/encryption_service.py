@@ -1,7 +1,7 @@
 """Encryption service for secure credential storage."""
 import base64
 import os
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from flask import current_app
@@ -11,19 +11,22 @@ class EncryptionService:
     """Service for encrypting and decrypting sensitive data."""
 
     _fernet = None
+    _current_fernet = None
 
     @classmethod
     def _get_fernet(cls):
-        """Get or create Fernet instance."""
+        """Get or create MultiFernet instance (current key first, then old keys)."""
         if cls._fernet is None:
-            key = cls._derive_key()
-            cls._fernet = Fernet(key)
+            passwords = [current_app.config.get('ENCRYPTION_KEY', 'default-key')]
+            passwords += current_app.config.get('ENCRYPTION_OLD_KEYS', [])
+            fernets = [Fernet(cls._derive_key(password)) for password in passwords]
+            cls._current_fernet = fernets[0]
+            cls._fernet = MultiFernet(fernets)
         return cls._fernet
 
     @classmethod
-    def _derive_key(cls):
-        """Derive encryption key from config."""
-        password = current_app.config.get('ENCRYPTION_KEY', 'default-key').encode()
+    def _derive_key(cls, password):
+        """Derive encryption key from a configured password."""
         # Use a fixed salt for consistency (in production, consider user-specific salts)
         salt = b'subscriptionm_salt_2024'
         kdf = PBKDF2HMAC(
@@ -32,9 +35,20 @@ class EncryptionService:
             salt=salt,
             iterations=100000,
         )
-        key = base64.urlsafe_b64encode(kdf.derive(password))
+        key = base64.urlsafe_b64encode(kdf.derive(password.encode()))
         return key
 
+    @classmethod
+    def load_keys(cls):
+        """Re-derive and cache keys from config.
+
+        Call this inside an app context before using the service from
+        worker threads, which have no access to current_app.
+        """
+        cls._fernet = None
+        cls._current_fernet = None
+        cls._get_fernet()
+
     @classmethod
     def encrypt(cls, plaintext):
         """Encrypt a string."""
@@ -59,6 +73,38 @@ class EncryptionService:
         except Exception:
             return None
 
+    @classmethod
+    def decrypt_many(cls, ciphertexts):
+        """Decrypt a list of strings in one call.
+
+        Empty values and failures come back as None, like decrypt().
+        """
+        fernet = cls._get_fernet()
+        plaintexts = {}
+        for ciphertext in set(filter(None, ciphertexts)):
+            try:
+                plaintexts[ciphertext] = fernet.decrypt(ciphertext.encode()).decode()
+            except Exception:
+                plaintexts[ciphertext] = None
+        return [plaintexts.get(ciphertext) for ciphertext in ciphertexts]
+
+    @classmethod
+    def rotate(cls, ciphertext):
+        """Re-encrypt a string under the current key.
+
+        Returns the ciphertext unchanged if the current key already decrypts
+        it. Raises InvalidToken if none of the configured keys can.
+        """
+        if not ciphertext:
+            return ciphertext
+        fernet = cls._get_fernet()
+        token = ciphertext.encode()
+        try:
+            cls._current_fernet.decrypt(token)
+            return ciphertext
+        except InvalidToken:
+            return fernet.rotate(token).decode()
+
 
 def encrypt_credential(value):
     """Helper function to encrypt a credential."""
@@ -0,0 +1,491 @@
+"""Export service for streaming report data."""
+import csv
+import io
+import json
+import re
+import zipfile
+from collections import namedtuple
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+from flask import current_app
+from sqlalchemy.orm import aliased
+from app import db
+from app.database import replica_reads
+from app.models import (
+    Subscription, SubscriptionPriceHistory, SubscriptionGroup, Provider, Category, User,
+    Notification, PaymentMethod
+)
+from app.services.archive_service import StreamBuffer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# A typed export column: type is one of 'int', 'float', 'bool', 'str', 'date', 'datetime'
+Column = namedtuple('Column', 'name type')
+
+# Exporters by format name, filled in by @register_exporter
+EXPORTERS = {}
+
+# Control characters that are not allowed in XML
+XML_ILLEGAL_CHARACTERS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Datasets available to ExportService.stream_dataset, with display names
+DATASETS = {
+    'subscriptions': 'Subscriptions',
+    'price_history': 'Price History',
+    'notifications': 'Notifications',
+    'payment_methods': 'Payment Methods',
+}
+
+SUBSCRIPTION_CSV_HEADER = [
+    'Name', 'Provider', 'Category', 'Amount', 'Currency',
+    'Billing Cycle', 'Status', 'Next Renewal', 'Start Date',
+    'Auto Renew', 'Is Trial', 'Notes'
+]
+
+
+def register_exporter(exporter):
+    """Class decorator adding an exporter to EXPORTERS under its name."""
+    EXPORTERS[exporter.name] = exporter
+    return exporter
+
+
+def _on_replica(rows):
+    """Iterate a query with its reads sent to the replica, if one is configured.
+
+    Exports stream after their view has returned, so they can't rely on
+    the view's read_only decorator.
+    """
+    with replica_reads():
+        yield from rows
+
+
+def _batches(rows, size):
+    """Group an iterable of rows into lists of up to size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Exporter:
+    """Base class for export formats.
+
+    stream() turns typed columns and batches of row tuples into chunks of
+    bytes, one or more per batch, so output is sent as rows are fetched.
+    """
+
+    name = None
+    label = None
+    extension = None
+    mimetype = None
+
+    @staticmethod
+    def is_available():
+        """Whether the format's dependencies are installed."""
+        return True
+
+    @staticmethod
+    def stream(columns, batches):
+        raise NotImplementedError
+
+
+@register_exporter
+class CsvExporter(Exporter):
+    """Comma-separated values with ISO dates and true/false booleans."""
+
+    name = 'csv'
+    label = 'CSV'
+    extension = 'csv'
+    mimetype = 'text/csv'
+
+    @staticmethod
+    def _format(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def stream(columns, batches):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([column.name for column in columns])
+        for batch in batches:
+            writer.writerows([CsvExporter._format(value) for value in row] for row in batch)
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+
+@register_exporter
+class JsonLinesExporter(Exporter):
+    """One JSON object per line, with ISO 8601 dates."""
+
+    name = 'jsonl'
+    label = 'JSON Lines'
+    extension = 'jsonl'
+    mimetype = 'application/x-ndjson'
+
+    @staticmethod
+    def stream(columns, batches):
+        names = [column.name for column in columns]
+        for batch in batches:
+            lines = [
+                json.dumps(dict(zip(names, row)), default=lambda value: value.isoformat())
+                for row in batch
+            ]
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+@register_exporter
+class XlsxExporter(Exporter):
+    """Excel workbook written row by row into a streamed ZIP.
+
+    Numbers, booleans and dates are stored as typed cells (dates as serial
+    numbers with a date format), so Excel and pandas need no inference.
+    """
+
+    name = 'xlsx'
+    label = 'Excel'
+    extension = 'xlsx'
+    mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    EPOCH = datetime(1899, 12, 30)
+
+    # Cell style indexes in STYLES
+    DATE_STYLE = 1
+    DATETIME_STYLE = 2
+    HEADER_STYLE = 3
+
+    CONTENT_TYPES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    )
+    ROOT_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    )
+    WORKBOOK = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+    WORKBOOK_RELS = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    )
+    STYLES = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font/><font><b/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="4"><xf/>'
+        '<xf numFmtId="14" applyNumberFormat="1"/>'
+        '<xf numFmtId="22" applyNumberFormat="1"/>'
+        '<xf fontId="1" applyFont="1"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    )
+
+    @staticmethod
+    def _text_cell(value, style=0):
+        text = escape(XML_ILLEGAL_CHARACTERS.sub('', str(value)))
+        style_attr = f' s="{style}"' if style else ''
+        return f'<c t="inlineStr"{style_attr}><is><t xml:space="preserve">{text}</t></is></c>'
+
+    @staticmethod
+    def _cell(value):
+        if value is None:
+            return '<c/>'
+        if isinstance(value, bool):
+            return f'<c t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, float)):
+            return f'<c><v>{value!r}</v></c>'
+        if isinstance(value, datetime):
+            serial = (value - XlsxExporter.EPOCH).total_seconds() / 86400
+            return f'<c s="{XlsxExporter.DATETIME_STYLE}"><v>{serial!r}</v></c>'
+        if isinstance(value, date):
+            serial = (value - XlsxExporter.EPOCH.date()).days
+            return f'<c s="{XlsxExporter.DATE_STYLE}"><v>{serial}</v></c>'
+        return XlsxExporter._text_cell(value)
+
+    @staticmethod
+    def stream(columns, batches):
+        buffer = StreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('[Content_Types].xml', XlsxExporter.CONTENT_TYPES)
+            archive.writestr('_rels/.rels', XlsxExporter.ROOT_RELS)
+            archive.writestr('xl/workbook.xml', XlsxExporter.WORKBOOK)
+            archive.writestr('xl/_rels/workbook.xml.rels', XlsxExporter.WORKBOOK_RELS)
+            archive.writestr('xl/styles.xml', XlsxExporter.STYLES)
+
+            # Size is unknown up front, so allow Zip64 for very large sheets
+            with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                header = ''.join(
+                    XlsxExporter._text_cell(column.name, XlsxExporter.HEADER_STYLE) for column in columns
+                )
+                sheet.write((
+                    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    f'<sheetData><row>{header}</row>'
+                ).encode('utf-8'))
+
+                for batch in batches:
+                    xml = ''.join(
+                        '<row>' + ''.join(XlsxExporter._cell(value) for value in row) + '</row>'
+                        for row in batch
+                    )
+                    sheet.write(xml.encode('utf-8'))
+                    yield buffer.drain()
+
+                sheet.write(b'</sheetData></worksheet>')
+
+        yield buffer.drain()
+
+
+@register_exporter
+class ParquetExporter(Exporter):
+    """Apache Parquet file written one row group per batch (requires pyarrow)."""
+
+    name = 'parquet'
+    label = 'Parquet'
+    extension = 'parquet'
+    mimetype = 'application/vnd.apache.parquet'
+
+    @staticmethod
+    def is_available():
+        return pyarrow is not None
+
+    @staticmethod
+    def _schema(columns):
+        types = {
+            'int': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'bool': pyarrow.bool_(),
+            'str': pyarrow.string(),
+            'date': pyarrow.date32(),
+            'datetime': pyarrow.timestamp('us'),
+        }
+        return pyarrow.schema([(column.name, types[column.type]) for column in columns])
+
+    @staticmethod
+    def stream(columns, batches):
+        schema = ParquetExporter._schema(columns)
+        buffer = StreamBuffer()
+        # PythonFile tracks its own position, so the sink never needs to seek
+        sink = pyarrow.PythonFile(buffer, mode='w')
+        with pyarrow.parquet.ParquetWriter(sink, schema) as writer:
+            for batch in batches:
+                arrays = [
+                    pyarrow.array([row[index] for row in batch], type=field.type)
+                    for index, field in enumerate(schema)
+                ]
+                writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=schema))
+                yield buffer.drain()
+        yield buffer.drain()
+
+
+class ExportService:
+    """Service for exporting data as streams of rows.
+
+    Rows come from a single joined query fetched in batches of
+    EXPORT_BATCH_SIZE, so memory stays flat however many rows are exported.
+    Each dataset is a typed column list plus a query returning one tuple per
+    row in the same order. Generators must run inside an app context (use
+    stream_with_context).
+    """
+
+    @staticmethod
+    def subscription_rows(user_id=None):
+        """Yield CSV rows of subscriptions, for one user or (user_id=None) everyone.
+
+        The all-users export starts each row with the owner's email.
+        """
+        columns = [
+            Subscription.name,
+            Provider.name,
+            Category.name,
+            Subscription.amount,
+            Subscription.currency,
+            Subscription.billing_cycle,
+            Subscription.status,
+            Subscription.next_renewal_date,
+            Subscription.start_date,
+            Subscription.auto_renew,
+            Subscription.is_trial,
+            Subscription.notes
+        ]
+        if user_id is None:
+            columns.insert(0, User.email)
+
+        query = db.session.query(*columns).select_from(Subscription).outerjoin(
+            Provider, Subscription.provider_id == Provider.id
+        ).outerjoin(
+            Category, Subscription.category_id == Category.id
+        )
+
+        if user_id is None:
+            query = query.join(User, Subscription.user_id == User.id)
+        else:
+            query = query.filter(Subscription.user_id == user_id)
+
+        query = query.order_by(Subscription.id).yield_per(current_app.config['EXPORT_BATCH_SIZE'])
+
+        for row in _on_replica(query):
+            *prefix, name, provider, category, amount, currency, billing_cycle, status, \
+                next_renewal, start_date, auto_renew, is_trial, notes = row
+            yield prefix + [
+                name,
+                provider or '',
+                category or '',
+                amount,
+                currency,
+                billing_cycle,
+                status,
+                next_renewal.strftime('%Y-%m-%d') if next_renewal else '',
+                start_date.strftime('%Y-%m-%d'),
+                'Yes' if auto_renew else 'No',
+                'Yes' if is_trial else 'No',
+                notes or ''
+            ]
+
+    @staticmethod
+    def _subscriptions_dataset(user_id):
+        payment_method = aliased(PaymentMethod)
+        columns = [
+            Column('id', 'int'), Column('name', 'str'), Column('provider', 'str'),
+            Column('category', 'str'), Column('payment_method', 'str'), Column('group', 'str'),
+            Column('amount', 'float'), Column('currency', 'str'), Column('billing_cycle', 'str'),
+            Column('status', 'str'), Column('start_date', 'date'), Column('next_renewal_date', 'date'),
+            Column('reminder_days', 'int'), Column('auto_renew', 'bool'), Column('is_trial', 'bool'),
+            Column('trial_end_date', 'date'), Column('notes', 'str'),
+            Column('created_at', 'datetime'), Column('updated_at', 'datetime'),
+        ]
+        query = db.session.query(
+            Subscription.id, Subscription.name, Provider.name, Category.name,
+            payment_method.name, SubscriptionGroup.name,
+            Subscription.amount, Subscription.currency, Subscription.billing_cycle,
+            Subscription.status, Subscription.start_date, Subscription.next_renewal_date,
+            Subscription.reminder_days, Subscription.auto_renew, Subscription.is_trial,
+            Subscription.trial_end_date, Subscription.notes,
+            Subscription.created_at, Subscription.updated_at
+        ).select_from(Subscription).outerjoin(
+            Provider, Subscription.provider_id == Provider.id
+        ).outerjoin(
+            Category, Subscription.category_id == Category.id
+        ).outerjoin(
+            payment_method, Subscription.payment_method_id == payment_method.id
+        ).outerjoin(
+            SubscriptionGroup, Subscription.group_id == SubscriptionGroup.id
+        ).filter(Subscription.user_id == user_id).order_by(Subscription.id)
+        return columns, query
+
+    @staticmethod
+    def _price_history_dataset(user_id):
+        columns = [
+            Column('id', 'int'), Column('subscription_id', 'int'), Column('subscription', 'str'),
+            Column('old_amount', 'float'), Column('new_amount', 'float'), Column('currency', 'str'),
+            Column('changed_at', 'datetime'), Column('reason', 'str'),
+        ]
+        query = db.session.query(
+            SubscriptionPriceHistory.id, SubscriptionPriceHistory.subscription_id, Subscription.name,
+            SubscriptionPriceHistory.old_amount, SubscriptionPriceHistory.new_amount,
+            SubscriptionPriceHistory.currency, SubscriptionPriceHistory.changed_at,
+            SubscriptionPriceHistory.reason
+        ).join(
+            Subscription, SubscriptionPriceHistory.subscription_id == Subscription.id
+        ).filter(Subscription.user_id == user_id).order_by(SubscriptionPriceHistory.id)
+        return columns, query
+
+    @staticmethod
+    def _notifications_dataset(user_id):
+        columns = [
+            Column('id', 'int'), Column('subscription_id', 'int'), Column('type', 'str'),
+            Column('message', 'str'), Column('is_read', 'bool'), Column('email_sent', 'bool'),
+            Column('created_at', 'datetime'), Column('read_at', 'datetime'),
+        ]
+        query = db.session.query(
+            Notification.id, Notification.subscription_id, Notification.type, Notification.message,
+            Notification.is_read, Notification.email_sent, Notification.created_at, Notification.read_at
+        ).filter(Notification.user_id == user_id).order_by(Notification.id)
+        return columns, query
+
+    @staticmethod
+    def _payment_methods_dataset(user_id):
+        columns = [
+            Column('id', 'int'), Column('type', 'str'), Column('name', 'str'),
+            Column('last_four_digits', 'str'), Column('expiry_date', 'date'),
+            Column('is_default', 'bool'), Column('created_at', 'datetime'),
+        ]
+        query = db.session.query(
+            PaymentMethod.id, PaymentMethod.type, PaymentMethod.name, PaymentMethod.last_four_digits,
+            PaymentMethod.expiry_date, PaymentMethod.is_default, PaymentMethod.created_at
+        ).filter(PaymentMethod.user_id == user_id).order_by(PaymentMethod.id)
+        return columns, query
+
+    @staticmethod
+    def available_formats():
+        """Exporters whose dependencies are installed."""
+        return [exporter for exporter in EXPORTERS.values() if exporter.is_available()]
+
+    @staticmethod
+    def stream_dataset(dataset, format_name, user_id):
+        """Yield a user's dataset as bytes in a registered format.
+
+        Must run inside an app context.
+        """
+        columns, query = getattr(ExportService, f'_{dataset}_dataset')(user_id)
+        batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        batches = _batches(_on_replica(query.yield_per(batch_size)), batch_size)
+        return EXPORTERS[format_name].stream(columns, batches)
+
+    @staticmethod
+    def stream_csv(header, rows, chunk_rows=None):
+        """Yield CSV text, one chunk per chunk_rows rows."""
+        chunk_rows = chunk_rows or current_app.config['EXPORT_BATCH_SIZE']
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
@@ -0,0 +1,317 @@
+"""Import service for bulk-loading subscriptions from CSV."""
+import csv
+import io
+import math
+from datetime import date, datetime
+from flask import current_app
+from app import db
+from app.models import (
+    Subscription, SubscriptionGroup, SubscriptionAttachment, SubscriptionPriceHistory,
+    SubscriptionImport, SubscriptionImportItem, Provider, Category, PaymentMethod, Notification, User,
+    UserPortfolioSummary
+)
+
+# Accepted CSV headers (normalized: lower case, underscores) and the field they fill.
+# Covers both the Reports CSV export and the typed data export.
+HEADER_FIELDS = {
+    'name': 'name',
+    'provider': 'provider',
+    'category': 'category',
+    'payment_method': 'payment_method',
+    'group': 'group',
+    'amount': 'amount',
+    'currency': 'currency',
+    'billing_cycle': 'billing_cycle',
+    'status': 'status',
+    'next_renewal': 'next_renewal_date',
+    'next_renewal_date': 'next_renewal_date',
+    'start_date': 'start_date',
+    'reminder_days': 'reminder_days',
+    'auto_renew': 'auto_renew',
+    'is_trial': 'is_trial',
+    'trial_end_date': 'trial_end_date',
+    'notes': 'notes',
+}
+
+REQUIRED_FIELDS = ('name', 'amount', 'start_date')
+
+BILLING_CYCLES = {'monthly', 'yearly', 'one_time'}
+STATUSES = {'active', 'inactive', 'cancelled'}
+TRUE_VALUES = {'yes', 'y', 'true', '1'}
+FALSE_VALUES = {'no', 'n', 'false', '0'}
+
+# Name columns resolved to foreign keys
+LOOKUP_FIELDS = {
+    'provider': 'provider_id',
+    'category': 'category_id',
+    'payment_method': 'payment_method_id',
+    'group': 'group_id',
+}
+
+
+def _normalize_header(value):
+    return value.strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid {field.replace("_", " ")} "{value}" (expected YYYY-MM-DD).')
+
+
+def _parse_bool(value, field, default):
+    if not value:
+        return default
+    lowered = value.lower()
+    if lowered in TRUE_VALUES:
+        return True
+    if lowered in FALSE_VALUES:
+        return False
+    raise ValueError(f'Invalid {field.replace("_", " ")} "{value}" (expected Yes or No).')
+
+
+class ImportService:
+    """Service for importing subscriptions in bulk.
+
+    The CSV is read as a stream; names are resolved against lookup maps
+    loaded once per import, duplicates are detected in memory against a set
+    of existing keys, and valid rows are inserted with multi-row INSERT ... RETURNING
+    statements in batches of IMPORT_BATCH_SIZE. Each import is recorded with the IDs it
+    created so it can be reverted.
+    """
+
+    @staticmethod
+    def _lookup_maps(user_id):
+        """Map lower-cased names to IDs for every name column."""
+        return {
+            'provider': {
+                name.lower(): id for id, name in db.session.query(Provider.id, Provider.name)
+            },
+            'category': {
+                name.lower(): id for id, name in db.session.query(Category.id, Category.name)
+            },
+            'payment_method': {
+                name.lower(): id for id, name in
+                db.session.query(PaymentMethod.id, PaymentMethod.name).filter_by(user_id=user_id)
+            },
+            'group': {
+                name.lower(): id for id, name in
+                db.session.query(SubscriptionGroup.id, SubscriptionGroup.name).filter_by(user_id=user_id)
+            },
+        }
+
+    @staticmethod
+    def _duplicate_key(name, provider_id, billing_cycle, start_date):
+        """Key identifying the same subscription across imports and the form."""
+        return name.lower(), provider_id, billing_cycle, start_date
+
+    @staticmethod
+    def _existing_keys(user_id):
+        return {
+            ImportService._duplicate_key(*row) for row in db.session.query(
+                Subscription.name, Subscription.provider_id,
+                Subscription.billing_cycle, Subscription.start_date
+            ).filter_by(user_id=user_id)
+        }
+
+    @staticmethod
+    def _parse_row(row, lookups, user_id, default_currency, currencies):
+        """Turn a CSV row dict into a Subscription mapping. Raises ValueError."""
+        name = row.get('name', '')
+        if not name:
+            raise ValueError('Name is required.')
+        if len(name) > 100:
+            raise ValueError('Name is longer than 100 characters.')
+
+        try:
+            amount = float(row.get('amount', ''))
+            if not math.isfinite(amount):  # nan, inf and overflows like 1e309
+                raise ValueError
+        except ValueError:
+            raise ValueError(f'Invalid amount "{row.get("amount", "")}".')
+        if amount < 0:
+            raise ValueError('Amount cannot be negative.')
+
+        currency = (row.get('currency') or default_currency).upper()
+        if currency not in currencies:
+            raise ValueError(f'Unsupported currency "{currency}".')
+
+        billing_cycle = (row.get('billing_cycle') or 'monthly').lower().replace('-', '_')
+        if billing_cycle not in BILLING_CYCLES:
+            raise ValueError(f'Invalid billing cycle "{row["billing_cycle"]}".')
+
+        status = (row.get('status') or 'active').lower()
+        if status not in STATUSES:
+            raise ValueError(f'Invalid status "{row["status"]}".')
+
+        start_date = _parse_date(row.get('start_date', ''), 'start_date')
+        next_renewal = row.get('next_renewal_date')
+        next_renewal_date = _parse_date(next_renewal, 'next_renewal_date') if next_renewal else start_date
+        trial_end = row.get('trial_end_date')
+
+        reminder_days = row.get('reminder_days')
+        try:
+            reminder_days = int(reminder_days) if reminder_days else 15
+        except ValueError:
+            raise ValueError(f'Invalid reminder days "{reminder_days}".')
+
+        mapping = {
+            'user_id': user_id,
+            'name': name,
+            'amount': amount,
+            'currency': currency,
+            'billing_cycle': billing_cycle,
+            'status': status,
+            'start_date': start_date,
+            'next_renewal_date': next_renewal_date,
+            'reminder_days': reminder_days,
+            'auto_renew': _parse_bool(row.get('auto_renew'), 'auto_renew', True),
+            'is_trial': _parse_bool(row.get('is_trial'), 'is_trial', False),
+            'trial_end_date': _parse_date(trial_end, 'trial_end_date') if trial_end else None,
+            'notes': row.get('notes', ''),
+        }
+
+        for field, column in LOOKUP_FIELDS.items():
+            value = row.get(field)
+            mapping[column] = None
+            if value:
+                mapping[column] = lookups[field].get(value.lower())
+                if mapping[column] is None:
+                    raise ValueError(f'Unknown {field.replace("_", " ")} "{value}".')
+
+        return mapping
+
+    @staticmethod
+    def _insert_batch(subscription_import, mappings):
+        """Insert a batch of subscriptions and record their IDs on the import."""
+        # Core inserts skip the ORM unit of work; unordered RETURNING lets the
+        # dialect send multi-row VALUES batches instead of one statement per row
+        table = Subscription.__table__
+        subscription_ids = db.session.scalars(
+            table.insert().returning(table.c.id), mappings
+        ).all()
+        import_id = subscription_import.id
+        db.session.execute(SubscriptionImportItem.__table__.insert(), [
+            {'import_id': import_id, 'subscription_id': subscription_id}
+            for subscription_id in subscription_ids
+        ])
+        subscription_import.imported_count += len(subscription_ids)
+
+    @staticmethod
+    def import_subscriptions(user_id, stream, filename=None):
+        """Import subscriptions from a binary CSV stream in one transaction.
+
+        Returns (SubscriptionImport, errors) where errors lists
+        (line number, message) for rejected rows, up to IMPORT_MAX_ERRORS.
+        Raises ValueError if the file itself cannot be read.
+        """
+        batch_size = current_app.config['IMPORT_BATCH_SIZE']
+        max_errors = current_app.config['IMPORT_MAX_ERRORS']
+
+        reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        try:
+            header = next(reader, None)
+        except (UnicodeDecodeError, csv.Error):
+            raise ValueError('The file is not a UTF-8 CSV file.')
+        if not header:
+            raise ValueError('The file is empty.')
+
+        fields = [HEADER_FIELDS.get(_normalize_header(column)) for column in header]
+        missing = [field for field in REQUIRED_FIELDS if field not in fields]
+        if missing:
+            raise ValueError(f'Missing required columns: {", ".join(missing)}.')
+
+        default_currency = db.session.get(User, user_id).default_currency
+        currencies = set(current_app.config['SUPPORTED_CURRENCIES'])
+        lookups = ImportService._lookup_maps(user_id)
+        seen_keys = ImportService._existing_keys(user_id)
+
+        subscription_import = SubscriptionImport(
+            user_id=user_id, filename=filename,
+            imported_count=0, duplicate_count=0, error_count=0
+        )
+        db.session.add(subscription_import)
+        db.session.flush()
+
+        errors = []
+        batch = []
+        try:
+            for line_number, values in enumerate(reader, start=2):
+                if not any(values):
+                    continue
+                row = {field: value.strip() for field, value in zip(fields, values) if field}
+
+                try:
+                    mapping = ImportService._parse_row(
+                        row, lookups, user_id, default_currency, currencies
+                    )
+                except ValueError as e:
+                    subscription_import.error_count += 1
+                    if len(errors) < max_errors:
+                        errors.append((line_number, str(e)))
+                    continue
+
+                key = ImportService._duplicate_key(
+                    mapping['name'], mapping['provider_id'],
+                    mapping['billing_cycle'], mapping['start_date']
+                )
+                if key in seen_keys:
+                    subscription_import.duplicate_count += 1
+                    continue
+                seen_keys.add(key)
+
+                batch.append(mapping)
+                if len(batch) >= batch_size:
+                    ImportService._insert_batch(subscription_import, batch)
+                    batch = []
+
+            if batch:
+                ImportService._insert_batch(subscription_import, batch)
+            # Core inserts skip the ORM events that maintain the summary and data version
+            UserPortfolioSummary.rebuild([user_id])
+            User.bump_data_version(db.session, [user_id])
+        except (UnicodeDecodeError, csv.Error):
+            db.session.rollback()
+            raise ValueError('The file is not a valid UTF-8 CSV file.')
+        except Exception:
+            db.session.rollback()
+            raise
+
+        db.session.commit()
+        return subscription_import, errors
+
+    @staticmethod
+    def revert_import(subscription_import):
+        """Delete the subscriptions an import created and mark it reverted.
+
+        Rows are deleted with set-based statements in chunks of
+        IMPORT_BATCH_SIZE. Attachments added since the import are deleted
+        through the ORM first so their blob references are released.
+        """
+        batch_size = current_app.config['IMPORT_BATCH_SIZE']
+        subscription_ids = [
+            subscription_id for (subscription_id,) in
+            db.session.query(SubscriptionImportItem.subscription_id).join(Subscription).filter(
+                SubscriptionImportItem.import_id == subscription_import.id,
+                Subscription.user_id == subscription_import.user_id
+            )
+        ]
+
+        for start in range(0, len(subscription_ids), batch_size):
+            chunk = subscription_ids[start:start + batch_size]
+            for attachment in SubscriptionAttachment.query.filter(
+                    SubscriptionAttachment.subscription_id.in_(chunk)):
+                db.session.delete(attachment)
+            db.session.flush()
+
+            for model in (SubscriptionPriceHistory, Notification, SubscriptionImportItem):
+                model.query.filter(model.subscription_id.in_(chunk)).delete(synchronize_session=False)
+            Subscription.query.filter(Subscription.id.in_(chunk)).delete(synchronize_session=False)
+
+        subscription_import.items.delete(synchronize_session=False)
+        UserPortfolioSummary.rebuild([subscription_import.user_id])
+        User.bump_data_version(db.session, [subscription_import.user_id])
+        subscription_import.reverted_at = datetime.utcnow()
+        db.session.commit()
+        return len(subscription_ids)
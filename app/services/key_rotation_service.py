@@ -0,0 +1,196 @@
+"""Key rotation service for re-encrypting stored credentials."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from cryptography.fernet import InvalidToken
+from flask import current_app
+from sqlalchemy import bindparam, or_, update
+from app import db
+from app.models import Subscription
+from app.services.encryption_service import EncryptionService
+
+CREDENTIAL_COLUMNS = ('account_email_encrypted', 'account_username_encrypted')
+
+_progress_lock = threading.Lock()
+_progress = {'status': 'idle'}
+
+
+def _rotate_row(row):
+    """Re-encrypt the credential columns of one row.
+
+    Returns a tuple of (update mapping or None if unchanged, failed columns).
+    """
+    mapping = {}
+    failed = 0
+    for column in CREDENTIAL_COLUMNS:
+        ciphertext = getattr(row, column)
+        if not ciphertext:
+            continue
+        try:
+            rotated = EncryptionService.rotate(ciphertext)
+        except InvalidToken:
+            failed += 1
+            continue
+        if rotated != ciphertext:
+            mapping[column] = rotated
+
+    if not mapping:
+        return None, failed
+
+    # The write only applies while the row still holds what was read here
+    for column in list(mapping):
+        mapping[f'old_{column}'] = getattr(row, column)
+    mapping['row_id'] = row.id
+    return mapping, failed
+
+
+def _write_rotated(mappings):
+    """Write rotated ciphertexts, skipping rows changed since they were read.
+
+    Returns the number of rows written.
+    """
+    table = Subscription.__table__
+    by_columns = {}
+    for mapping in mappings:
+        columns = tuple(column for column in CREDENTIAL_COLUMNS if column in mapping)
+        by_columns.setdefault(columns, []).append(mapping)
+
+    written = 0
+    for columns, group in by_columns.items():
+        statement = update(table).where(
+            table.c.id == bindparam('row_id'),
+            *(table.c[column] == bindparam(f'old_{column}') for column in columns)
+        ).values(
+            # Keep the user-visible "last updated" date untouched
+            updated_at=table.c.updated_at,
+            **{column: bindparam(column) for column in columns}
+        )
+        written += db.session.execute(statement, group).rowcount
+    return written
+
+
+class KeyRotationService:
+    """Service for rotating credential encryption keys."""
+
+    @staticmethod
+    def get_progress():
+        """Return a snapshot of the current or last rotation run."""
+        with _progress_lock:
+            progress = dict(_progress)
+
+        if progress.get('started_at'):
+            end = progress.get('finished_at') or datetime.utcnow()
+            elapsed = (end - progress['started_at']).total_seconds()
+            progress['elapsed_seconds'] = round(elapsed, 1)
+            progress['rows_per_second'] = round(progress['processed'] / elapsed, 1) if elapsed else 0.0
+            if progress['total']:
+                progress['percent'] = round(100.0 * progress['processed'] / progress['total'], 1)
+            else:
+                progress['percent'] = 100.0
+        return progress
+
+    @staticmethod
+    def is_running():
+        """Check if a rotation run is in progress."""
+        with _progress_lock:
+            return _progress.get('status') == 'running'
+
+    @staticmethod
+    def _update_progress(**values):
+        """Update progress values under the lock."""
+        with _progress_lock:
+            _progress.update(values)
+
+    @staticmethod
+    def rotate_credentials(batch_size=None, workers=None, pause=None):
+        """Re-encrypt every stored credential under the current key.
+
+        Rows are read in keyset-paginated batches ordered by id, rotated on a
+        thread pool and written back with one commit per batch, so no long
+        transaction holds the table. Must be called inside an app context.
+        """
+        config = current_app.config
+        batch_size = batch_size or config['KEY_ROTATION_BATCH_SIZE']
+        workers = workers or config['KEY_ROTATION_WORKERS']
+        pause = config['KEY_ROTATION_BATCH_PAUSE'] if pause is None else pause
+
+        with _progress_lock:
+            if _progress.get('status') == 'running':
+                return False
+            _progress.clear()
+            _progress.update({
+                'status': 'running',
+                'started_at': datetime.utcnow(),
+                'finished_at': None,
+                'total': 0,
+                'processed': 0,
+                'rotated': 0,
+                'failed': 0,
+                'batches': 0,
+                'last_id': 0,
+                'error': None,
+            })
+
+        has_credentials = or_(
+            Subscription.account_email_encrypted.isnot(None),
+            Subscription.account_username_encrypted.isnot(None)
+        )
+
+        try:
+            # Derive keys once here; worker threads have no app context
+            EncryptionService.load_keys()
+            KeyRotationService._update_progress(
+                total=Subscription.query.filter(has_credentials).count()
+            )
+
+            last_id = 0
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                while True:
+                    rows = db.session.query(
+                        Subscription.id,
+                        Subscription.account_email_encrypted,
+                        Subscription.account_username_encrypted,
+                        Subscription.updated_at
+                    ).filter(
+                        Subscription.id > last_id,
+                        has_credentials
+                    ).order_by(Subscription.id).limit(batch_size).all()
+
+                    if not rows:
+                        break
+
+                    results = list(executor.map(_rotate_row, rows))
+                    mappings = [mapping for mapping, _ in results if mapping]
+                    failed = sum(count for _, count in results)
+
+                    rotated = _write_rotated(mappings) if mappings else 0
+                    db.session.commit()
+
+                    last_id = rows[-1].id
+                    with _progress_lock:
+                        _progress['processed'] += len(rows)
+                        _progress['rotated'] += rotated
+                        _progress['failed'] += failed
+                        _progress['batches'] += 1
+                        _progress['last_id'] = last_id
+
+                    if pause:
+                        # Yield to request traffic between batches
+                        time.sleep(pause)
+
+            KeyRotationService._update_progress(status='completed', finished_at=datetime.utcnow())
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f'Credential key rotation failed: {e}')
+            KeyRotationService._update_progress(
+                status='failed', finished_at=datetime.utcnow(), error=str(e)
+            )
+            return False
+
+        progress = KeyRotationService.get_progress()
+        current_app.logger.info(
+            f'Credential key rotation completed: {progress["rotated"]} rotated, '
+            f'{progress["failed"]} failed, {progress["rows_per_second"]} rows/s'
+        )
+        return True
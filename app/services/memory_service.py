@@ -0,0 +1,242 @@
+"""Memory service for tracemalloc snapshots and per-request allocation tracking."""
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, g, request
+from app.services.profiler_service import short_path
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_NAME = re.compile(r'^[\w.-]+$')
+
+# Not measured: static files, scrapes, and the memory pages (reading snapshots takes a lot)
+UNMEASURED = (None, 'static', 'metrics.metrics', 'admin.memory', 'admin.take_memory_snapshot')
+
+# tracemalloc's peak is process-wide, so one request or job is measured at
+# a time; others that overlap it are skipped rather than blamed for its memory
+_measure_lock = threading.Lock()
+_recent = deque(maxlen=200)  # Finished measurements, newest last
+_alert_bytes = 0
+
+# Allocations by the import system and tracemalloc itself are noise in every report
+_FILTERS = (
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _module(filename):
+    """Dotted module name of a source file, e.g. sqlalchemy.orm.identity."""
+    path = short_path(filename)
+    if path.endswith('.py'):
+        path = path[:-3]
+    if path.endswith('/__init__'):
+        path = path[:-len('/__init__')]
+    return path.replace(os.sep, '.').replace('/', '.')
+
+
+def _by_module(statistics, attribute):
+    """Sum tracemalloc statistics per module. Returns [(module, value, count)], largest first."""
+    modules = {}
+    for stat in statistics:
+        module = _module(stat.traceback[0].filename)
+        entry = modules.setdefault(module, [0, 0])
+        entry[0] += getattr(stat, attribute)
+        entry[1] += stat.count_diff if attribute == 'size_diff' else stat.count
+    return sorted(((module, value, count) for module, (value, count) in modules.items()),
+                  key=lambda item: abs(item[1]), reverse=True)
+
+
+def init_memory_profiling(app):
+    """Trace allocations and measure sampled requests when MEMORY_PROFILING_ENABLED."""
+    global _alert_bytes
+    if not app.config['MEMORY_PROFILING_ENABLED']:
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(app.config['MEMORY_TRACE_FRAMES'])
+    _alert_bytes = app.config['MEMORY_ALERT_MB'] * 1024 * 1024
+
+    @app.before_request
+    def start_memory_measure():
+        if request.endpoint not in UNMEASURED and random.random() * 100 < app.config['MEMORY_SAMPLE_RATE']:
+            g.memory_measure = MemoryService.start(f'{request.method} {request.endpoint or request.path}')
+
+    @app.teardown_request
+    def finish_memory_measure(error):
+        measure = g.pop('memory_measure', None)
+        if measure is not None:
+            MemoryService.finish(measure)
+
+
+class MemoryService:
+    """Service for finding where the process's memory goes.
+
+    With MEMORY_PROFILING_ENABLED, tracemalloc records every allocation
+    (slowing the app noticeably, so leave it off unless investigating).
+    Snapshots are saved to MEMORY_SNAPSHOT_FOLDER and can be compared
+    to show what grew. Measurements record the allocation peak and net
+    growth of sampled requests and scheduler jobs, and any over
+    MEMORY_ALERT_MB is logged. Everything is per process.
+    """
+
+    @staticmethod
+    def is_tracing():
+        return tracemalloc.is_tracing()
+
+    @staticmethod
+    def status():
+        """Get traced, peak, RSS and tracemalloc overhead in bytes (traced values None when off)."""
+        traced = peak = overhead = None
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            overhead = tracemalloc.get_tracemalloc_memory()
+        rss = None
+        try:
+            with open('/proc/self/statm') as statm:
+                rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            pass
+        return {'traced': traced, 'peak': peak, 'overhead': overhead, 'rss': rss, 'pid': os.getpid()}
+
+    @staticmethod
+    def start(label):
+        """Begin measuring the current request or job. Returns a measure, or None if not possible now."""
+        if not tracemalloc.is_tracing() or not _measure_lock.acquire(blocking=False):
+            return None
+        tracemalloc.reset_peak()
+        return {'label': label, 'started': time.perf_counter(), 'before': tracemalloc.get_traced_memory()[0]}
+
+    @staticmethod
+    def finish(measure):
+        """End a measurement, keep it for the admin page and log it if over MEMORY_ALERT_MB."""
+        current, peak = tracemalloc.get_traced_memory()
+        _measure_lock.release()
+
+        record = {
+            'label': measure['label'],
+            'time': datetime.utcnow().isoformat(),
+            'duration_ms': round((time.perf_counter() - measure['started']) * 1000, 1),
+            'peak_bytes': peak - measure['before'],
+            'net_bytes': current - measure['before'],
+        }
+        _recent.append(record)
+        if _alert_bytes and record['peak_bytes'] > _alert_bytes:
+            logger.warning(
+                f"{record['label']} allocated up to {record['peak_bytes'] / 1048576:.1f} MB "
+                f"(net {record['net_bytes'] / 1048576:+.1f} MB) in {record['duration_ms']}ms"
+            )
+        return record
+
+    @staticmethod
+    @contextmanager
+    def track(label):
+        """Measure a block such as a scheduler job (does nothing unless tracing).
+
+        with MemoryService.track('job notification_checks'):
+            NotificationService.run_all_checks()
+        """
+        measure = MemoryService.start(label)
+        try:
+            yield
+        finally:
+            if measure is not None:
+                MemoryService.finish(measure)
+
+    @staticmethod
+    def recent():
+        """Get finished measurements, newest first."""
+        return list(reversed(_recent))
+
+    @staticmethod
+    def take_snapshot():
+        """Save a snapshot of the traced allocations. Returns its name."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('Memory profiling is off; set MEMORY_PROFILING_ENABLED.')
+        folder = current_app.config['MEMORY_SNAPSHOT_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        name = f'{datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")}-pid{os.getpid()}'
+        tracemalloc.take_snapshot().filter_traces(_FILTERS).dump(os.path.join(folder, f'{name}.snapshot'))
+
+        names = MemoryService.list_snapshots()
+        for old in names[current_app.config['MEMORY_MAX_SNAPSHOTS']:]:
+            MemoryService.delete_snapshot(old)
+        return name
+
+    @staticmethod
+    def _path(name):
+        if not SNAPSHOT_NAME.match(name):
+            raise ValueError(f'Invalid snapshot name: {name}')
+        return os.path.join(current_app.config['MEMORY_SNAPSHOT_FOLDER'], f'{name}.snapshot')
+
+    @staticmethod
+    def list_snapshots():
+        """Get saved snapshot names, newest first."""
+        folder = current_app.config['MEMORY_SNAPSHOT_FOLDER']
+        if not os.path.isdir(folder):
+            return []
+        return sorted((file[:-len('.snapshot')] for file in os.listdir(folder) if file.endswith('.snapshot')),
+                      reverse=True)
+
+    @staticmethod
+    def delete_snapshot(name):
+        """Remove a saved snapshot."""
+        path = MemoryService._path(name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _load(name):
+        path = MemoryService._path(name)
+        if not os.path.exists(path):
+            raise ValueError(f'No snapshot named {name}')
+        return tracemalloc.Snapshot.load(path)
+
+    @staticmethod
+    def top(name, limit=30):
+        """Largest allocations of a snapshot.
+
+        Returns {'total', 'modules': [(module, bytes, blocks)], 'lines':
+        [(file:line, bytes, blocks)]}.
+        """
+        snapshot = MemoryService._load(name)
+        by_file = snapshot.statistics('filename')
+        lines = [
+            (f'{short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}', stat.size, stat.count)
+            for stat in snapshot.statistics('lineno')[:limit]
+        ]
+        return {
+            'total': sum(stat.size for stat in by_file),
+            'modules': _by_module(by_file, 'size')[:limit],
+            'lines': lines,
+        }
+
+    @staticmethod
+    def diff(old, new, limit=30):
+        """What grew between two snapshots.
+
+        Returns {'total', 'modules': [(module, bytes, blocks)], 'lines':
+        [(file:line, bytes, blocks, call stack oldest first)]} as changes,
+        largest first.
+        """
+        before, after = MemoryService._load(old), MemoryService._load(new)
+        by_file = after.compare_to(before, 'filename')
+        lines = [
+            (f'{short_path(stat.traceback[-1].filename)}:{stat.traceback[-1].lineno}', stat.size_diff,
+             stat.count_diff, [f'{short_path(frame.filename)}:{frame.lineno}' for frame in stat.traceback])
+            for stat in after.compare_to(before, 'traceback')[:limit]
+        ]
+        return {
+            'total': sum(stat.size_diff for stat in by_file),
+            'modules': _by_module(by_file, 'size_diff')[:limit],
+            'lines': lines,
+        }
@@ -0,0 +1,225 @@
+"""Metrics service for Prometheus-format application metrics."""
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, request
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+JOB_BUCKETS = (0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+# name -> (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.', LATENCY_BUCKETS),
+    'http_requests_in_flight': ('gauge', 'Requests being handled.', None),
+    'db_queries_per_request': ('histogram', 'SQL statements run per request, by endpoint.', QUERY_COUNT_BUCKETS),
+    'db_time_per_request_seconds': ('histogram', 'Time spent in SQL per request, by endpoint.', LATENCY_BUCKETS),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result (hit or miss).', None),
+    'cache_hit_ratio': ('gauge', 'Share of cache lookups that were hits since start.', None),
+    'scheduler_job_duration_seconds': ('histogram', 'Scheduler job run time.', JOB_BUCKETS),
+    'notification_check_duration_seconds': ('histogram', 'NotificationService check run time.', JOB_BUCKETS),
+    'notification_check_items_total': ('counter', 'Rows scanned and notifications created by each check.', None),
+    'emails_sent_total': ('counter', 'Emails sent, by result.', None),
+    'email_queue_depth': ('gauge', 'Emails waiting to be handed to the mail server.', None),
+    'write_queue_depth': ('gauge', 'Writes waiting for the background writer.', None),
+    'thumbnail_queue_depth': ('gauge', 'Attachments with thumbnails being generated.', None),
+}
+
+# Each thread updates its own dict without locking; a scrape sums them.
+# Keys are (metric name, sorted label tuple); histogram values are lists of
+# per-bucket counts followed by the +Inf count and the sum.
+_local = threading.local()
+_shards = []  # (thread, values)
+_shards_lock = threading.Lock()
+_retired = {}  # Values of threads that have exited
+
+# Functions called at scrape time: each returns {(name, label pairs): value} for gauges
+_collectors = []
+
+
+def _values():
+    values = getattr(_local, 'values', None)
+    if values is None:
+        values = _local.values = {}
+        with _shards_lock:
+            _shards.append((threading.current_thread(), values))
+    return values
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _merge(totals, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(value)
+            else:
+                for index, count in enumerate(value):
+                    total[index] += count
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _queue_depths():
+    from app.services.thumbnail_service import ThumbnailService
+    from app.services.write_queue_service import WriteQueueService
+    return {
+        ('write_queue_depth', ()): WriteQueueService.depth(),
+        ('thumbnail_queue_depth', ()): ThumbnailService.pending_count(),
+    }
+
+
+def init_metrics(app):
+    """Record request latency, in-flight requests and per-request DB use."""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    MetricsService.register_collector(_queue_depths)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        MetricsService.inc('http_requests_in_flight')
+
+    @app.after_request
+    def record_status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_metrics(error):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        MetricsService.inc('http_requests_in_flight', -1)
+
+        endpoint = request.endpoint or 'unknown'
+        status = g.get('metrics_status', 500)
+        MetricsService.inc('http_requests_total', endpoint=endpoint, method=request.method, status=status)
+        MetricsService.observe('http_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+
+        stats = g.get('query_stats')
+        if stats is not None:
+            MetricsService.observe('db_queries_per_request', stats.count, endpoint=endpoint)
+            MetricsService.observe('db_time_per_request_seconds', stats.total_time, endpoint=endpoint)
+
+
+class MetricsService:
+    """Service for recording and exposing metrics in Prometheus text format.
+
+    Recording touches only the calling thread's counters, so it needs no
+    lock and is cheap enough to leave on. Metrics must be declared in
+    METRICS; label values should have few distinct values (endpoints, job
+    names), never IDs.
+    """
+
+    @staticmethod
+    def inc(name, amount=1, **labels):
+        """Add to a counter, or to a gauge that the same thread later decrements."""
+        values = _values()
+        key = _key(name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    @staticmethod
+    def observe(name, value, **labels):
+        """Record a value in a histogram."""
+        buckets = METRICS[name][2]
+        values = _values()
+        key = _key(name, labels)
+        entry = values.get(key)
+        if entry is None:
+            entry = values[key] = [0] * (len(buckets) + 2)
+        entry[bisect_left(buckets, value)] += 1
+        entry[-1] += value
+
+    @staticmethod
+    def record_cache(cache, hit):
+        """Count a cache lookup as a hit or a miss."""
+        MetricsService.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    @staticmethod
+    def register_collector(collector):
+        """Add a function called at scrape time returning {(name, label pairs): value}."""
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+    @staticmethod
+    def snapshot():
+        """Sum every thread's values. Returns {(name, labels): value}."""
+        totals = {}
+        with _shards_lock:
+            alive = []
+            for thread, values in _shards:
+                # dict.copy() is atomic under the GIL; histogram lists are
+                # copied by _merge, and may be a few increments behind
+                if thread.is_alive():
+                    alive.append((thread, values))
+                    _merge(totals, values.copy())
+                else:
+                    _merge(_retired, values.copy())
+            _shards[:] = alive
+            _merge(totals, _retired)
+
+        for collector in _collectors:
+            try:
+                for (name, labels), value in collector().items():
+                    totals[name, tuple(sorted(labels))] = value
+            except Exception as e:
+                current_app.logger.error(f'Metrics collector failed: {e}')
+
+        hits, lookups = {}, {}
+        for (name, labels), value in totals.items():
+            if name == 'cache_requests_total':
+                cache = dict(labels)['cache']
+                lookups[cache] = lookups.get(cache, 0) + value
+                if dict(labels)['result'] == 'hit':
+                    hits[cache] = hits.get(cache, 0) + value
+        for cache, count in lookups.items():
+            totals['cache_hit_ratio', (('cache', cache),)] = hits.get(cache, 0) / count if count else 0.0
+        return totals
+
+    @staticmethod
+    def render():
+        """Get all metrics in the Prometheus text exposition format."""
+        samples = {}
+        for (name, labels), value in MetricsService.snapshot().items():
+            samples.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(samples.get(name, []), key=lambda sample: sample[0]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels(labels, [("le", _number(float(bound)))])} {cumulative}')
+                cumulative += value[len(buckets)]
+                lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(float(value[-1]))}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
@@ -1,21 +1,53 @@
 """Notification service for creating and managing notifications."""
+import time
 from datetime import datetime, timedelta
-from app import db
+from functools import wraps
+from flask import current_app
+from app.database import stream
 from app.models import Notification, Subscription, User, PaymentMethod
 from app.services.email_service import EmailService
+from app.services.metrics_service import MetricsService
+from app.services.write_queue_service import WriteQueueService
+
+
+def _queue_notification(**fields):
+    """Add a notification through the write queue (committed in batches if enabled)."""
+    WriteQueueService.submit(Notification.add_notification, **fields)
+
+
+def _metered(check):
+    """Record a check's run time and its scanned/created counts as metrics."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            counts = f(*args, **kwargs)
+            MetricsService.observe('notification_check_duration_seconds', time.perf_counter() - started, check=check)
+            for kind, count in counts.items():
+                MetricsService.inc('notification_check_items_total', count, check=check, kind=kind)
+            return counts
+        return wrapper
+    return decorator
 
 
 class NotificationService:
-    """Service for managing notifications."""
+    """Service for managing notifications.
+
+    The scheduled checks scan with database.stream (a server-side cursor on
+    PostgreSQL) and add their notifications through WriteQueueService;
+    run_all_checks waits for them to be committed. Each check returns
+    {'scanned': rows examined, 'created': notifications added}.
+    """
 
     @staticmethod
+    @_metered('upcoming_renewals')
     def check_upcoming_renewals():
         """Check for subscriptions due for renewal and create notifications."""
         # Get all active subscriptions due within reminder days
         today = datetime.utcnow().date()
-        users = User.query.all()
+        scanned = created = 0
 
-        for user in users:
+        for user in stream(User.query.order_by(User.id), current_app.config['SCHEDULER_SCAN_BATCH_SIZE']):
             active_subs = Subscription.query.filter_by(
                 user_id=user.id,
                 status='active'
@@ -24,6 +56,7 @@ class NotificationService:
             ).all()
 
             for sub in active_subs:
+                scanned += 1
                 reminder_date = sub.next_renewal_date - timedelta(days=sub.reminder_days)
 
                 if today >= reminder_date and sub.next_renewal_date >= today:
@@ -39,35 +72,41 @@ class NotificationService:
                         days_until = (sub.next_renewal_date - today).days
                         message = f'{sub.name} is due for renewal in {days_until} days ({sub.currency} {sub.amount})'
 
-                        notification = Notification.create_notification(
-                            user_id=user.id,
-                            notification_type=Notification.TYPE_RENEWAL_REMINDER,
-                            message=message,
-                            subscription_id=sub.id
-                        )
-
                         # Send email if enabled
+                        email_sent = False
                         if user.email_alerts_enabled:
                             try:
-                                if EmailService.send_renewal_reminder(user, sub):
-                                    notification.email_sent = True
-                                    db.session.commit()
+                                email_sent = bool(EmailService.send_renewal_reminder(user, sub))
                             except Exception:
                                 pass  # Email sending is optional
 
+                        _queue_notification(
+                            user_id=user.id,
+                            notification_type=Notification.TYPE_RENEWAL_REMINDER,
+                            message=message,
+                            subscription_id=sub.id,
+                            email_sent=email_sent
+                        )
+                        created += 1
+
+        return {'scanned': scanned, 'created': created}
+
     @staticmethod
+    @_metered('trial_expirations')
     def check_trial_expirations():
         """Check for trials ending soon and create notifications."""
         today = datetime.utcnow().date()
         trial_warning_days = 7
+        scanned = created = 0
 
         trial_subs = Subscription.query.filter(
             Subscription.is_trial == True,
             Subscription.trial_end_date.isnot(None),
             Subscription.status == 'active'
-        ).all()
+        )
 
-        for sub in trial_subs:
+        for sub in stream(trial_subs, current_app.config['SCHEDULER_SCAN_BATCH_SIZE']):
+            scanned += 1
             days_until_trial_end = (sub.trial_end_date - today).days
 
             if 0 <= days_until_trial_end <= trial_warning_days:
@@ -82,14 +121,18 @@ class NotificationService:
                 if not existing:
                     message = f'Trial for {sub.name} ends in {days_until_trial_end} days'
 
-                    Notification.create_notification(
+                    _queue_notification(
                         user_id=sub.user_id,
                         notification_type=Notification.TYPE_TRIAL_ENDING,
                         message=message,
                         subscription_id=sub.id
                     )
+                    created += 1
+
+        return {'scanned': scanned, 'created': created}
 
     @staticmethod
+    @_metered('expired_subscriptions')
     def check_expired_subscriptions():
         """Check for expired subscriptions and create notifications."""
         today = datetime.utcnow().date()
@@ -98,9 +141,11 @@ class NotificationService:
             Subscription.next_renewal_date < today,
             Subscription.status == 'active',
             Subscription.auto_renew == False
-        ).all()
+        )
+        scanned = created = 0
 
-        for sub in expired_subs:
+        for sub in stream(expired_subs, current_app.config['SCHEDULER_SCAN_BATCH_SIZE']):
+            scanned += 1
             # Check if notification already exists
             existing = Notification.query.filter(
                 Notification.user_id == sub.user_id,
@@ -112,14 +157,18 @@ class NotificationService:
             if not existing:
                 message = f'{sub.name} has expired and needs attention'
 
-                Notification.create_notification(
+                _queue_notification(
                     user_id=sub.user_id,
                     notification_type=Notification.TYPE_EXPIRED,
                     message=message,
                     subscription_id=sub.id
                 )
+                created += 1
+
+        return {'scanned': scanned, 'created': created}
 
     @staticmethod
+    @_metered('payment_methods')
     def check_payment_methods():
         """Check for expiring payment methods."""
         today = datetime.utcnow().date()
@@ -127,9 +176,11 @@ class NotificationService:
 
         payment_methods = PaymentMethod.query.filter(
             PaymentMethod.expiry_date.isnot(None)
-        ).all()
+        )
+        scanned = created = 0
 
-        for pm in payment_methods:
+        for pm in stream(payment_methods, current_app.config['SCHEDULER_SCAN_BATCH_SIZE']):
+            scanned += 1
             days_until_expiry = (pm.expiry_date - today).days
 
             if 0 <= days_until_expiry <= warning_days:
@@ -144,11 +195,14 @@ class NotificationService:
                 if not existing:
                     message = f'Payment method {pm.get_display_name()} expires in {days_until_expiry} days'
 
-                    Notification.create_notification(
+                    _queue_notification(
                         user_id=pm.user_id,
                         notification_type=Notification.TYPE_CARD_EXPIRING,
                         message=message
                     )
+                    created += 1
+
+        return {'scanned': scanned, 'created': created}
 
     @staticmethod
     def run_all_checks():
@@ -157,6 +211,7 @@ class NotificationService:
         NotificationService.check_trial_expirations()
         NotificationService.check_expired_subscriptions()
         NotificationService.check_payment_methods()
+        WriteQueueService.flush()
 
     @staticmethod
     def create_price_change_notification(subscription, old_amount, new_amount):
@@ -0,0 +1,152 @@
+"""Portfolio service for lean, cached read-only views of a user's subscriptions."""
+import bisect
+import threading
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.database import reads_from_replica, replica_data_version
+from app.models.currency import CurrencyRate
+from app.models.subscription import Subscription
+
+# The only subscription columns read paths need: no credentials, notes or relationships
+PORTFOLIO_COLUMNS = (
+    'id', 'name', 'amount', 'currency', 'billing_cycle', 'status', 'is_trial', 'auto_renew',
+    'start_date', 'next_renewal_date', 'trial_end_date',
+    'category_id', 'provider_id', 'payment_method_id', 'group_id',
+)
+
+_cache = OrderedDict()  # user_id -> (data_version, Portfolio), least recently used first
+_cache_lock = threading.Lock()
+
+
+class PortfolioEntry:
+    """One subscription's amounts, dates and foreign keys.
+
+    Has the Subscription methods that reports and budget pages use, so
+    templates take either.
+    """
+
+    __slots__ = PORTFOLIO_COLUMNS
+
+    def __init__(self, row):
+        for name, value in zip(PORTFOLIO_COLUMNS, row):
+            setattr(self, name, value)
+
+    def get_amount_in_currency(self, target_currency):
+        """Convert amount to target currency."""
+        if self.currency == target_currency:
+            return self.amount
+        return round(self.amount * CurrencyRate.get_cached_rate(self.currency, target_currency), 2)
+
+    get_monthly_amount = Subscription.get_monthly_amount
+    get_yearly_amount = Subscription.get_yearly_amount
+    days_until_renewal = Subscription.days_until_renewal
+    is_due_soon = Subscription.is_due_soon
+    is_overdue = Subscription.is_overdue
+    is_trial_ending_soon = Subscription.is_trial_ending_soon
+
+    def __repr__(self):
+        return f'<PortfolioEntry {self.id} {self.name}>'
+
+
+class Portfolio:
+    """Read-only snapshot of a user's subscriptions as PortfolioEntry records, ordered by ID.
+
+    Totals convert each currency once per request instead of once per
+    subscription. Active renewals are indexed by date for range lookups.
+    """
+
+    def __init__(self, entries):
+        self.entries = tuple(entries)
+        renewals = sorted(
+            (entry for entry in self.entries if entry.status == 'active' and entry.next_renewal_date is not None),
+            key=lambda entry: (entry.next_renewal_date, entry.id)
+        )
+        self._renewals = tuple(renewals)
+        self._renewal_dates = tuple(entry.next_renewal_date for entry in renewals)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def filter(self, **criteria):
+        """Entries whose attributes equal all the given values, e.g. filter(status='active')."""
+        return [entry for entry in self.entries
+                if all(getattr(entry, name) == value for name, value in criteria.items())]
+
+    def group_by(self, attribute, **criteria):
+        """Get {value: [entries]} of the entries matching criteria, in order of first appearance."""
+        groups = {}
+        for entry in self.filter(**criteria):
+            groups.setdefault(getattr(entry, attribute), []).append(entry)
+        return groups
+
+    def renewals_between(self, first_day, last_day):
+        """Active entries renewing from first_day to last_day inclusive, by renewal date."""
+        start = bisect.bisect_left(self._renewal_dates, first_day)
+        end = bisect.bisect_right(self._renewal_dates, last_day)
+        return list(self._renewals[start:end])
+
+    @staticmethod
+    def monthly_total(entries, currency):
+        """Sum of the entries' monthly amounts in currency."""
+        return sum(entry.get_monthly_amount(currency) for entry in entries)
+
+    @staticmethod
+    def amount_total(entries, currency):
+        """Sum of the entries' amounts in currency."""
+        return sum(entry.get_amount_in_currency(currency) for entry in entries)
+
+
+class PortfolioService:
+    """Service for the read-only portfolio of a user.
+
+    Portfolios are built from one column-only query and kept in memory
+    for the PORTFOLIO_CACHE_SIZE most recently used users, keyed by the
+    user's data_version, so any change to the user's subscriptions makes
+    the next read rebuild it. A portfolio built from the replica is cached
+    only if the replica had the user's version before it was read. Rates
+    are not part of a portfolio; amounts are converted with the current
+    rates when read.
+    """
+
+    @staticmethod
+    def get(user):
+        """Get the Portfolio of a User."""
+        size = current_app.config['PORTFOLIO_CACHE_SIZE']
+        version = user.data_version
+        with _cache_lock:
+            cached = _cache.get(user.id)
+            if cached is not None and cached[0] == version:
+                _cache.move_to_end(user.id)
+                return cached[1]
+
+        # A lagging replica could hold older subscriptions than the version says
+        current = not reads_from_replica() or replica_data_version(user.id) == version
+        portfolio = PortfolioService.build(user.id)
+        if size and current:
+            with _cache_lock:
+                _cache[user.id] = (version, portfolio)
+                _cache.move_to_end(user.id)
+                while len(_cache) > size:
+                    _cache.popitem(last=False)
+        return portfolio
+
+    @staticmethod
+    def build(user_id):
+        """Load a user's Portfolio from the database."""
+        table = Subscription.__table__
+        rows = db.session.execute(
+            select(*(table.c[column] for column in PORTFOLIO_COLUMNS))
+            .where(table.c.user_id == user_id).order_by(table.c.id)
+        )
+        return Portfolio(PortfolioEntry(row) for row in rows)
+
+    @staticmethod
+    def clear():
+        """Drop every cached portfolio."""
+        with _cache_lock:
+            _cache.clear()
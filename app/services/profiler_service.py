@@ -0,0 +1,290 @@
+"""Profiler service for sampling profiles of requests and scheduler jobs."""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from flask import current_app, g, request
+from flask_login import current_user
+
+PROFILE_NAME = re.compile(r'^[\w.-]+$')
+
+# Thread ident -> Profile being recorded. One sampler thread serves them all.
+_profiles = {}
+_profiles_lock = threading.Lock()
+_active = threading.Event()
+_sampler = None
+_labels = {}  # code object -> frame label
+
+# Frames show paths relative to the project or site-packages, e.g. app/routes/dashboard.py
+_roots = sorted(
+    [os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))] +
+    [path for path in sys.path if path.endswith('-packages')],
+    key=len, reverse=True
+)
+
+
+def short_path(filename):
+    """A source path relative to the project or site-packages (else its base name)."""
+    for root in _roots:
+        if filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return os.path.basename(filename)
+
+
+def _frame_label(code):
+    label = _labels.get(code)
+    if label is None:
+        label = _labels[code] = f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})'
+    return label
+
+
+def _sample(interval):
+    while True:
+        _active.wait()
+        time.sleep(interval)
+        frames = sys._current_frames()
+        with _profiles_lock:
+            for ident, profile in _profiles.items():
+                frame = frames.get(ident)
+                if frame is not None:
+                    profile.add(frame)
+        del frames
+
+
+class Profile:
+    """Collapsed stacks ("outer;...;inner": samples) of one thread."""
+
+    def __init__(self, label, interval):
+        self.label = label
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self.duration = None
+
+    def add(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        key = ';'.join(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+        self.samples += 1
+
+
+def init_profiler(app):
+    """Profile requests asked for by admins, and a PROFILE_SAMPLE_RATE share of the rest."""
+
+    @app.before_request
+    def start_request_profile():
+        wanted = request.args.get('_profile') or request.headers.get('X-Profile')
+        if wanted:
+            if not (current_user.is_authenticated and current_user.is_admin):
+                return
+            g.profile_forced = True
+        elif not (app.config['PROFILE_SAMPLE_RATE'] and request.endpoint not in (None, 'static', 'metrics.metrics')
+                  and random.random() * 100 < app.config['PROFILE_SAMPLE_RATE']):
+            return
+        g.profile = ProfilerService.start(f'{request.method} {request.endpoint or request.path}')
+
+    @app.after_request
+    def record_profile_status(response):
+        if g.get('profile') is not None:
+            g.profile_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def finish_request_profile(error):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        ProfilerService.stop(profile)
+        if not g.get('profile_forced') and profile.duration * 1000 < app.config['PROFILE_SAMPLE_MIN_MS']:
+            return
+
+        try:
+            ProfilerService.save(
+                profile, origin='request' if g.get('profile_forced') else 'sampled',
+                path=request.full_path.rstrip('?'), status=g.get('profile_status', 500),
+                user_id=current_user.get_id()
+            )
+        except OSError as e:
+            app.logger.error(f'Could not save profile: {e}')
+
+
+class ProfilerService:
+    """Service for recording and reading sampling profiles.
+
+    A single background thread wakes every PROFILE_INTERVAL_MS while any
+    profile is recording and copies the stacks of the profiled threads, so
+    the profiled code runs unmodified. Profiles are saved to PROFILE_FOLDER
+    as collapsed stacks (name.folded, readable by flamegraph.pl and
+    speedscope) with a name.json metadata file.
+    """
+
+    @staticmethod
+    def start(label):
+        """Start sampling the current thread. Returns the Profile."""
+        global _sampler
+        interval = current_app.config['PROFILE_INTERVAL_MS'] / 1000
+        profile = Profile(label, interval)
+        with _profiles_lock:
+            if _sampler is None:
+                _sampler = threading.Thread(target=_sample, args=(interval,), name='profiler', daemon=True)
+                _sampler.start()
+            _profiles[threading.get_ident()] = profile
+            _active.set()
+        return profile
+
+    @staticmethod
+    def stop(profile):
+        """Stop sampling the profile's thread."""
+        with _profiles_lock:
+            for ident, recording in list(_profiles.items()):
+                if recording is profile:
+                    del _profiles[ident]
+            if not _profiles:
+                _active.clear()
+        profile.duration = time.perf_counter() - profile._started
+        return profile
+
+    @staticmethod
+    @contextmanager
+    def profile(label, **metadata):
+        """Profile the block and save it (needs an app context).
+
+        with ProfilerService.profile('job notification_checks'):
+            NotificationService.run_all_checks()
+        """
+        profile = ProfilerService.start(label)
+        try:
+            yield profile
+        finally:
+            ProfilerService.stop(profile)
+            ProfilerService.save(profile, **metadata)
+
+    @staticmethod
+    def save(profile, origin='manual', **metadata):
+        """Write a stopped profile to PROFILE_FOLDER. Returns its name."""
+        folder = current_app.config['PROFILE_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        slug = re.sub(r'[^\w.-]+', '-', profile.label).strip('-')[:60]
+        name = f'{profile.started_at.strftime("%Y%m%dT%H%M%S%f")}-{slug}'
+
+        with open(os.path.join(folder, f'{name}.folded'), 'w', encoding='utf-8') as out:
+            for stack, count in sorted(profile.stacks.items()):
+                out.write(f'{stack} {count}\n')
+        with open(os.path.join(folder, f'{name}.json'), 'w', encoding='utf-8') as out:
+            json.dump(dict(
+                metadata, name=name, label=profile.label, origin=origin,
+                started_at=profile.started_at.isoformat(), duration_ms=round(profile.duration * 1000, 1),
+                samples=profile.samples, interval_ms=profile.interval * 1000
+            ), out)
+
+        ProfilerService._prune(folder)
+        return name
+
+    @staticmethod
+    def _prune(folder):
+        names = sorted(file[:-len('.json')] for file in os.listdir(folder) if file.endswith('.json'))
+        for name in names[:-current_app.config['PROFILE_MAX_FILES']]:
+            ProfilerService.delete(name)
+
+    @staticmethod
+    def _path(name, extension):
+        if not PROFILE_NAME.match(name):
+            raise ValueError(f'Invalid profile name: {name}')
+        return os.path.join(current_app.config['PROFILE_FOLDER'], f'{name}.{extension}')
+
+    @staticmethod
+    def list_profiles():
+        """Get the metadata of saved profiles, newest first."""
+        folder = current_app.config['PROFILE_FOLDER']
+        if not os.path.isdir(folder):
+            return []
+        profiles = []
+        for file in sorted(os.listdir(folder), reverse=True):
+            if file.endswith('.json'):
+                try:
+                    with open(os.path.join(folder, file), encoding='utf-8') as metadata:
+                        profiles.append(json.load(metadata))
+                except (OSError, ValueError):
+                    continue
+        return profiles
+
+    @staticmethod
+    def get(name):
+        """Get (metadata, {stack: samples}) of a saved profile, or None."""
+        try:
+            with open(ProfilerService._path(name, 'json'), encoding='utf-8') as metadata:
+                info = json.load(metadata)
+            stacks = {}
+            with open(ProfilerService._path(name, 'folded'), encoding='utf-8') as lines:
+                for line in lines:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack:
+                        stacks[stack] = stacks.get(stack, 0) + int(count)
+        except (OSError, ValueError):
+            return None
+        return info, stacks
+
+    @staticmethod
+    def folded_path(name):
+        """Path of a profile's collapsed-stack file, or None if there is none."""
+        path = ProfilerService._path(name, 'folded')
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def delete(name):
+        """Remove a saved profile."""
+        for extension in ('folded', 'json'):
+            path = ProfilerService._path(name, extension)
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def flamegraph(stacks, min_share=0.005):
+        """Build the call tree of collapsed stacks for rendering.
+
+        Returns the root node: {'name', 'value', 'children': [...]}, children
+        sorted by name as in a flame graph. Frames under min_share of all
+        samples are left out.
+        """
+        root = {'name': 'all', 'value': 0, 'children': {}}
+        for stack, count in stacks.items():
+            root['value'] += count
+            node = root
+            for frame in stack.split(';'):
+                child = node['children'].get(frame)
+                if child is None:
+                    child = node['children'][frame] = {'name': frame, 'value': 0, 'children': {}}
+                child['value'] += count
+                node = child
+
+        minimum = root['value'] * min_share
+
+        def finish(node):
+            node['children'] = [
+                finish(child) for name, child in sorted(node['children'].items())
+                if child['value'] >= minimum
+            ]
+            return node
+        return finish(root)
+
+    @staticmethod
+    def hottest(stacks, limit=20):
+        """Get (frame, self samples, total samples) of the frames most often on top of the stack."""
+        own, total = {}, {}
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            for frame in set(frames):
+                total[frame] = total.get(frame, 0) + count
+        return [(frame, samples, total[frame])
+                for frame, samples in sorted(own.items(), key=lambda item: item[1], reverse=True)[:limit]]
@@ -0,0 +1,107 @@
+"""Query plan service for checking that hot queries use indexes."""
+import re
+from datetime import datetime, timedelta
+from app import db
+from app.models import (
+    Subscription, SubscriptionPriceHistory, SubscriptionAttachment, PaymentMethod, Notification
+)
+
+# Plan lines that read every row of a table, e.g. "SCAN subscriptions"
+FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)')
+
+
+def _hot_queries():
+    """Get (name, query) for the query shapes run on every page or scheduler pass.
+
+    Parameter values don't matter for the plan, only the filters used.
+    """
+    today = datetime.utcnow().date()
+    now = datetime.utcnow()
+    user_id = subscription_id = 1
+
+    subscriptions = Subscription.query.filter_by(user_id=user_id)
+    notifications = Notification.query.filter_by(user_id=user_id)
+    return [
+        ('subscriptions_by_status',
+         subscriptions.filter_by(status='active').order_by(Subscription.name)),
+        ('subscriptions_by_category',
+         subscriptions.filter_by(category_id=1, status='active')),
+        ('subscriptions_by_provider',
+         subscriptions.filter_by(provider_id=1, status='active')),
+        ('subscriptions_by_payment_method',
+         subscriptions.filter_by(payment_method_id=1, status='active')),
+        ('subscriptions_by_group',
+         Subscription.query.filter_by(group_id=1, status='active')),
+        ('upcoming_renewals',
+         subscriptions.filter(
+             Subscription.status == 'active',
+             Subscription.next_renewal_date >= today,
+             Subscription.next_renewal_date <= today + timedelta(days=15)
+         ).order_by(Subscription.next_renewal_date)),
+        ('renewal_check',
+         subscriptions.filter_by(status='active').filter(Subscription.next_renewal_date.isnot(None))),
+        ('expired_check',
+         Subscription.query.filter(
+             Subscription.next_renewal_date < today,
+             Subscription.status == 'active',
+             Subscription.auto_renew == False  # noqa: E712
+         )),
+        ('trial_check',
+         Subscription.query.filter(
+             Subscription.is_trial == True,  # noqa: E712
+             Subscription.trial_end_date.isnot(None),
+             Subscription.status == 'active'
+         )),
+        ('unread_notifications',
+         notifications.filter_by(is_read=False).order_by(Notification.created_at.desc()).limit(10)),
+        ('all_notifications',
+         notifications.order_by(Notification.created_at.desc()).limit(20)),
+        ('notification_dedupe',
+         notifications.filter(
+             Notification.subscription_id == subscription_id,
+             Notification.type == Notification.TYPE_RENEWAL_REMINDER,
+             Notification.created_at >= now - timedelta(days=15)
+         )),
+        ('price_history',
+         SubscriptionPriceHistory.query.filter_by(subscription_id=subscription_id)
+         .order_by(SubscriptionPriceHistory.changed_at.desc())),
+        ('attachments',
+         SubscriptionAttachment.query.filter_by(subscription_id=subscription_id)),
+        ('payment_methods',
+         PaymentMethod.query.filter_by(user_id=user_id)),
+    ]
+
+
+class QueryPlanService:
+    """Service for checking the SQLite query plans of hot queries.
+
+    Each query is run through EXPLAIN QUERY PLAN; a plan that scans a whole
+    table instead of searching an index means a missing or unusable index.
+    """
+
+    @staticmethod
+    def explain(query):
+        """Get the EXPLAIN QUERY PLAN detail lines for a query."""
+        compiled = query.statement.compile(dialect=db.engine.dialect)
+        parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+        rows = db.session.connection().exec_driver_sql(
+            f'EXPLAIN QUERY PLAN {compiled}', parameters
+        )
+        return [row[-1] for row in rows]
+
+    @staticmethod
+    def check_plans():
+        """Explain every hot query.
+
+        Returns a list of (name, plan lines, scanned tables).
+        Raises RuntimeError on databases other than SQLite.
+        """
+        if db.engine.dialect.name != 'sqlite':
+            raise RuntimeError('Query plan checks need a SQLite database.')
+
+        results = []
+        for name, query in _hot_queries():
+            plan = QueryPlanService.explain(query)
+            scans = [match.group(1) for match in map(FULL_SCAN.match, plan) if match]
+            results.append((name, plan, scans))
+        return results
@@ -0,0 +1,150 @@
+"""Query stats service for per-request SQL instrumentation."""
+import re
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+# Statement normalization: literals and parameter markers become ?, IN lists collapse
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER = re.compile(r'%\(\w+\)s|%s|:\w+|\$\d+')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Normalize a SQL statement so queries differing only in values compare equal."""
+    statement = _STRING.sub('?', statement)
+    statement = _PARAMETER.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _LIST.sub('(?, ...)', statement)
+    return _SPACE.sub(' ', statement).strip()
+
+
+class QueryStats:
+    """Queries run during one request (or one capture block)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints = {}  # fingerprint -> [count, total seconds]
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.total_time += duration
+        entry = self.fingerprints.setdefault(fingerprint(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += duration
+
+    def repeated(self, threshold):
+        """Get (fingerprint, count, seconds) of SELECTs run at least threshold times.
+
+        The same query shape run over and over in one request is usually an
+        N+1 pattern: a lazy load or per-row helper inside a loop.
+        """
+        return sorted(
+            ((statement, count, seconds) for statement, (count, seconds) in self.fingerprints.items()
+             if count >= threshold and statement.upper().startswith('SELECT')),
+            key=lambda item: item[1], reverse=True
+        )
+
+    def report(self, threshold=2):
+        """Multi-line summary, most repeated query shapes first."""
+        lines = [f'{self.count} queries in {self.total_time * 1000:.1f}ms']
+        for statement, (count, seconds) in sorted(
+                self.fingerprints.items(), key=lambda item: item[1][0], reverse=True):
+            marker = '  N+1?' if count >= threshold and statement.upper().startswith('SELECT') else ''
+            lines.append(f'{count:>5}x {seconds * 1000:>8.1f}ms  {statement}{marker}')
+        return '\n'.join(lines)
+
+
+# The start time is kept on the statement's execution context: after_cursor_execute
+# does not fire for statements that raise, so nothing must be left to clean up.
+# Internal statements without a context are not timed.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_stats_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_stats_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+    if has_app_context():
+        stats = g.get('query_stats')
+        if stats is not None:
+            stats.record(statement, duration)
+
+
+def init_query_stats(app, db):
+    """Instrument the app's engines and report per-request query stats."""
+    if not app.config['SQL_STATS_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats()
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        repeated = stats.repeated(current_app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+        if current_app.debug or current_app.config['SQL_STATS_HEADERS']:
+            response.headers['X-DB-Query-Count'] = str(stats.count)
+            response.headers['X-DB-Time-Ms'] = f'{stats.total_time * 1000:.1f}'
+            if repeated:
+                statement, count, _ = repeated[0]
+                response.headers['X-DB-N-Plus-One'] = f'{len(repeated)}; {count}x {statement[:200]}'
+        else:
+            current_app.logger.info(
+                f'sql {request.method} {request.endpoint} status={response.status_code} '
+                f'queries={stats.count} db_ms={stats.total_time * 1000:.1f} n_plus_one={len(repeated)}'
+            )
+
+        for statement, count, seconds in repeated:
+            current_app.logger.warning(
+                f'Possible N+1 in {request.endpoint}: {count}x ({seconds * 1000:.1f}ms) {statement[:500]}'
+            )
+        return response
+
+
+class QueryStatsService:
+    """Service for inspecting the queries a block of code runs."""
+
+    @staticmethod
+    def current():
+        """Get the QueryStats of the current request, or None."""
+        return g.get('query_stats') if has_app_context() else None
+
+    @staticmethod
+    @contextmanager
+    def capture():
+        """Collect the queries run inside the block (needs an app context).
+
+        with QueryStatsService.capture() as stats:
+            NotificationService.run_all_checks()
+        print(stats.report())
+        """
+        previous = g.get('query_stats')
+        stats = g.query_stats = QueryStats()
+        try:
+            yield stats
+        finally:
+            g.query_stats = previous
+            if previous is not None:
+                previous.count += stats.count
+                previous.total_time += stats.total_time
+                for statement, (count, seconds) in stats.fingerprints.items():
+                    entry = previous.fingerprints.setdefault(statement, [0, 0.0])
+                    entry[0] += count
+                    entry[1] += seconds
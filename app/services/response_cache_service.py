@@ -0,0 +1,140 @@
+"""Response cache service for heavy per-user GET pages."""
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from app.database import replica_data_version
+from app.services.metrics_service import MetricsService
+
+# Stands in for the CSRF token in stored pages; the reader's own token replaces it
+CSRF_PLACEHOLDER = b'\x00response-cache-csrf\x00'
+
+_entries = OrderedDict()  # key -> (body, mimetype), least recently used first
+_size = 0  # Bytes of stored bodies
+_lock = threading.Lock()
+_computing = {}  # key -> Event set when the request computing it finishes
+
+
+def _key():
+    """Cache key of the current request, or None if it must not be cached."""
+    if request.method != 'GET' or not current_user.is_authenticated or '_flashes' in session:
+        return None
+    # Pages show days until renewal and today's month, so a new day is a new page
+    return (
+        current_user.id, current_user.data_version, datetime.utcnow().date(),
+        request.endpoint,
+        tuple(sorted((request.view_args or {}).items())),
+        tuple(sorted(request.args.items(multi=True))),
+    )
+
+
+def _csrf_token():
+    return generate_csrf().encode() if 'csrf' in current_app.extensions else None
+
+
+def _store(key, entry):
+    global _size
+    limit = current_app.config['RESPONSE_CACHE_MAX_MB'] * 1024 * 1024
+    if len(entry[0]) > limit:
+        return
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _size -= len(previous[0])
+        _entries[key] = entry
+        _size += len(entry[0])
+        while _size > limit:
+            _, evicted = _entries.popitem(last=False)
+            _size -= len(evicted[0])
+
+
+def _respond(entry, result):
+    body, mimetype = entry
+    token = _csrf_token()
+    if token is not None:
+        body = body.replace(CSRF_PLACEHOLDER, token)
+    response = make_response(body)
+    response.mimetype = mimetype
+    response.headers['X-Response-Cache'] = result
+    return response
+
+
+def _compute(view, args, kwargs, key):
+    """Run the view and store its response if it is a plain page that wrote nothing.
+
+    The key holds the data_version read from the primary. A page read from
+    the replica is stored only if the replica already had that version
+    before the page was read, so a lagging replica cannot store an older page.
+    """
+    token = _csrf_token()
+    replica_version = replica_data_version(current_user.id)
+    response = make_response(view(*args, **kwargs))
+    cacheable = (
+        response.status_code == 200 and not response.direct_passthrough
+        and not g.get('db_wrote') and '_flashes' not in session
+        and (not g.get('db_read_replica') or replica_version == key[1])
+    )
+    if cacheable:
+        body = response.get_data()
+        if token is not None:
+            body = body.replace(token, CSRF_PLACEHOLDER)
+        _store(key, (body, response.mimetype))
+    response.headers['X-Response-Cache'] = 'miss'
+    return response
+
+
+def cached_response(view):
+    """Decorator caching a GET page per user until their data_version changes.
+
+    Concurrent misses for the same page wait for the first one to compute
+    it (up to RESPONSE_CACHE_WAIT seconds) instead of computing it again.
+    Goes after @login_required.
+    """
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        key = _key() if current_app.config['RESPONSE_CACHE_ENABLED'] else None
+        if key is None:
+            return view(*args, **kwargs)
+
+        while True:
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None:
+                    _entries.move_to_end(key)
+                else:
+                    event = _computing.get(key)
+                    if event is None:
+                        event = _computing[key] = threading.Event()
+                        break
+            if entry is not None:
+                MetricsService.record_cache('responses', True)
+                return _respond(entry, 'hit')
+            # Another request is computing this page; if it does not store
+            # one in time (or at all) the next pass computes it here
+            if not event.wait(current_app.config['RESPONSE_CACHE_WAIT']):
+                MetricsService.record_cache('responses', False)
+                return view(*args, **kwargs)
+
+        MetricsService.record_cache('responses', False)
+        try:
+            return _compute(view, args, kwargs, key)
+        finally:
+            with _lock:
+                del _computing[key]
+            event.set()
+    return decorated_function
+
+
+class ResponseCacheService:
+    """Service for the response cache of this process."""
+
+    @staticmethod
+    def clear():
+        """Drop every stored page."""
+        global _size
+        with _lock:
+            _entries.clear()
+            _size = 0
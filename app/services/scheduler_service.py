@@ -1,31 +1,145 @@
 """Scheduler service for automated tasks."""
+import time
+from datetime import datetime
+from functools import wraps
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from flask import g
+from app.services.memory_service import MemoryService
+from app.services.metrics_service import MetricsService
 
 scheduler = BackgroundScheduler()
 _app = None
 
 
-def run_notification_checks():
-    """Run notification checks within app context."""
+def _timed(job):
+    """Record the job's run time in the scheduler_job_duration_seconds metric, and its memory when profiling."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with MemoryService.track(f'job {job}'):
+                    return f(*args, **kwargs)
+            finally:
+                MetricsService.observe('scheduler_job_duration_seconds', time.perf_counter() - started, job=job)
+        return wrapper
+    return decorator
+
+
+@_timed('notification_checks')
+def run_notification_checks(profile=False):
+    """Run notification checks within app context, optionally under the profiler."""
     global _app
     if _app is None:
         return
 
     with _app.app_context():
+        g.job_name = 'notification_checks'
         from app.services.notification_service import NotificationService
+        from app.services.profiler_service import ProfilerService
         try:
-            NotificationService.run_all_checks()
+            if profile:
+                with ProfilerService.profile('job notification_checks', origin='job'):
+                    NotificationService.run_all_checks()
+            else:
+                NotificationService.run_all_checks()
         except Exception as e:
             _app.logger.error(f'Error running notification checks: {e}')
 
 
+@_timed('upload_cleanup')
+def run_upload_cleanup():
+    """Remove abandoned upload temp files within app context."""
+    global _app
+    if _app is None:
+        return
+
+    with _app.app_context():
+        g.job_name = 'upload_cleanup'
+        from app.services.storage_service import StorageService
+        try:
+            StorageService.cleanup_stale_uploads()
+        except Exception as e:
+            _app.logger.error(f'Error cleaning up stale uploads: {e}')
+
+
+@_timed('blob_gc')
+def run_blob_gc():
+    """Reconcile the attachment blob store within app context."""
+    global _app
+    if _app is None:
+        return
+
+    with _app.app_context():
+        g.job_name = 'blob_gc'
+        from app.services.blob_service import BlobService
+        try:
+            BlobService.collect_garbage()
+        except Exception as e:
+            _app.logger.error(f'Error collecting attachment blobs: {e}')
+
+
+@_timed('replica_sync')
+def run_replica_sync():
+    """Copy the SQLite primary into the SQLite replica file."""
+    global _app
+    if _app is None:
+        return
+
+    from app.database import sync_sqlite_replica
+    try:
+        sync_sqlite_replica(_app.config['SQLALCHEMY_DATABASE_URI'], _app.config['REPLICA_DATABASE_URL'])
+    except Exception as e:
+        _app.logger.error(f'Error syncing read replica: {e}')
+
+
+@_timed('key_rotation')
+def run_key_rotation():
+    """Re-encrypt stored credentials within app context."""
+    global _app
+    if _app is None:
+        return
+
+    with _app.app_context():
+        g.job_name = 'key_rotation'
+        from app.services.key_rotation_service import KeyRotationService
+        KeyRotationService.rotate_credentials()
+
+
+def schedule_key_rotation():
+    """Start a one-off background credential key rotation."""
+    scheduler.add_job(
+        func=run_key_rotation,
+        trigger='date',
+        run_date=None,  # Run immediately
+        id='credential_key_rotation',
+        name='Credential key rotation',
+        replace_existing=True,
+        misfire_grace_time=60
+    )
+
+
+def schedule_notification_profile():
+    """Start a one-off profiled run of the notification checks."""
+    scheduler.add_job(
+        func=run_notification_checks,
+        kwargs={'profile': True},
+        trigger='date',
+        run_date=None,  # Run immediately
+        id='profiled_notification_check',
+        name='Profiled notification check',
+        replace_existing=True,
+        misfire_grace_time=60
+    )
+
+
 def init_scheduler(app):
     """Initialize the scheduler with the Flask app."""
     global _app
     _app = app
 
-    if scheduler.running:
+    if scheduler.running or not app.config['SCHEDULER_ENABLED']:
         return
 
     # Run daily notification checks at 8 AM
@@ -37,6 +151,40 @@ def init_scheduler(app):
         replace_existing=True
     )
 
+    # Clean up abandoned uploads daily at 3 AM
+    scheduler.add_job(
+        func=run_upload_cleanup,
+        trigger=CronTrigger(hour=3, minute=0),
+        id='daily_upload_cleanup',
+        name='Daily upload cleanup',
+        replace_existing=True
+    )
+
+    # Reconcile attachment blobs daily at 3:30 AM
+    scheduler.add_job(
+        func=run_blob_gc,
+        trigger=CronTrigger(hour=3, minute=30),
+        id='daily_blob_gc',
+        name='Daily attachment blob GC',
+        replace_existing=True
+    )
+
+    # Keep a local SQLite replica file in sync with the primary
+    if app.config['REPLICA_DATABASE_URL'] and app.config['REPLICA_SYNC_INTERVAL'] and \
+            app.config['REPLICA_DATABASE_URL'].startswith('sqlite') and \
+            app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        scheduler.add_job(
+            func=run_replica_sync,
+            trigger='interval',
+            seconds=app.config['REPLICA_SYNC_INTERVAL'],
+            next_run_time=datetime.now(),
+            id='replica_sync',
+            name='SQLite replica sync',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
+
     # Also run checks on startup (after a short delay to let app fully initialize)
     scheduler.add_job(
         func=run_notification_checks,
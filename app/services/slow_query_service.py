@@ -0,0 +1,222 @@
+"""Slow query service for logging and summarizing slow SQL statements."""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import ExecuteStyle
+from app.services.query_stats_service import fingerprint
+
+# Parameters bound to columns with these names are never written to the log
+SENSITIVE_NAME = re.compile(r'password|encrypted|secret|token|credential|_key\b|^key\b', re.IGNORECASE)
+MAX_VALUE_LENGTH = 200
+
+logger = logging.getLogger('app.slow_queries')
+logger.propagate = False
+
+
+def _redact_value(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f'<{len(value)} bytes>'
+    if isinstance(value, str) and len(value) > MAX_VALUE_LENGTH:
+        return value[:MAX_VALUE_LENGTH] + '...'
+    if value is None or isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def _parameters(parameters, context, executemany):
+    """Bound parameters as {name: value} (or a list for raw SQL), credentials redacted."""
+    if getattr(context, 'execute_style', None) is ExecuteStyle.INSERTMANYVALUES:
+        # One multi-row INSERT batch: parameters are every row's values flattened
+        # into one sequence, so log its size and columns instead of values
+        columns = list(context.compiled_parameters[0]) if context.compiled_parameters else []
+        return {'rows': len(parameters) // len(columns) if columns else None, 'columns': columns}
+    if executemany:
+        rows = len(parameters)
+        parameters = parameters[0] if rows else ()
+    else:
+        rows = None
+
+    names = None
+    compiled = getattr(context, 'compiled', None)
+    if isinstance(parameters, dict):
+        names = list(parameters)
+        values = list(parameters.values())
+    else:
+        values = list(parameters or ())
+        positions = getattr(compiled, 'positiontup', None)
+        if positions and len(positions) == len(values):
+            names = list(positions)
+
+    if names is None:
+        redacted = [_redact_value(value) for value in values]
+    else:
+        redacted = {
+            name: '[REDACTED]' if SENSITIVE_NAME.search(name) else _redact_value(value)
+            for name, value in zip(names, values)
+        }
+    return {'rows': rows, 'values': redacted} if rows is not None else redacted
+
+
+def _origin():
+    """The route or scheduler job that ran the current statement."""
+    if has_request_context():
+        return f'{request.method} {request.endpoint or request.path}'
+    if has_app_context() and g.get('job_name'):
+        return f'job {g.job_name}'
+    return f'thread {threading.current_thread().name}'
+
+
+def _explain(conn, statement, parameters):
+    """Get the plan of a statement, run on the same DBAPI connection (no events)."""
+    dialect = conn.dialect.name
+    if dialect == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif dialect == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE off) '
+    else:
+        return None
+
+    # On PostgreSQL a failed EXPLAIN would abort the application's transaction;
+    # a savepoint lets it be rolled back on its own
+    savepoint = dialect == 'postgresql'
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = [str(row[-1]) if dialect == 'sqlite' else str(row[0]) for row in cursor.fetchall()]
+        except Exception:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            raise
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    except Exception as e:
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        cursor.close()
+
+
+# Started on the execution context, as in query_stats_service, so statements
+# that raise leave nothing behind on the pooled connection
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.slow_query_started = time.perf_counter()
+
+
+def _make_after_cursor_execute(threshold, explain):
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'slow_query_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        if duration < threshold:
+            return
+
+        entry = {
+            'time': datetime.utcnow().isoformat(),
+            'duration_ms': round(duration * 1000, 1),
+            'origin': _origin(),
+            'dialect': conn.dialect.name,
+            'fingerprint': fingerprint(statement),
+            'statement': statement,
+            'parameters': _parameters(parameters, context, executemany),
+            'plan': None,
+        }
+        if explain and not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            entry['plan'] = _explain(conn, statement, parameters)
+        logger.warning(json.dumps(entry, default=str))
+    return after_cursor_execute
+
+
+def init_slow_query_log(app, db):
+    """Log statements slower than SLOW_QUERY_MS to the rotating SLOW_QUERY_LOG file."""
+    threshold_ms = app.config['SLOW_QUERY_MS']
+    if not threshold_ms:
+        return
+
+    path = app.config['SLOW_QUERY_LOG']
+    if not any(getattr(handler, 'baseFilename', None) == os.path.abspath(path) for handler in logger.handlers):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+            backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'], encoding='utf-8', delay=True
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.WARNING)
+
+    after_cursor_execute = _make_after_cursor_execute(threshold_ms / 1000, app.config['SLOW_QUERY_EXPLAIN'])
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+
+class SlowQueryService:
+    """Service for reading the slow query log.
+
+    Entries are JSON lines written by the engine events set up in
+    init_slow_query_log; the file rotates at SLOW_QUERY_LOG_MAX_BYTES and
+    keeps SLOW_QUERY_LOG_BACKUPS old files.
+    """
+
+    @staticmethod
+    def _log_files():
+        path = current_app.config['SLOW_QUERY_LOG']
+        files = [f'{path}.{index}' for index in range(current_app.config['SLOW_QUERY_LOG_BACKUPS'], 0, -1)]
+        return [file for file in files + [path] if os.path.exists(file)]
+
+    @staticmethod
+    def entries():
+        """Yield logged entries, oldest first. Unreadable lines are skipped."""
+        for path in SlowQueryService._log_files():
+            with open(path, encoding='utf-8') as lines:
+                for line in lines:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    @staticmethod
+    def top_offenders(limit=50):
+        """Group entries by fingerprint, worst total time first.
+
+        Returns dicts with fingerprint, count, total_ms, max_ms, last_seen,
+        origins ({origin: count}) and the slowest entry as sample.
+        """
+        groups = {}
+        for entry in SlowQueryService.entries():
+            group = groups.get(entry['fingerprint'])
+            if group is None:
+                group = groups[entry['fingerprint']] = {
+                    'fingerprint': entry['fingerprint'], 'count': 0, 'total_ms': 0.0,
+                    'max_ms': 0.0, 'last_seen': None, 'origins': {}, 'sample': entry,
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['last_seen'] = entry['time']
+            group['origins'][entry['origin']] = group['origins'].get(entry['origin'], 0) + 1
+            if entry['duration_ms'] >= group['max_ms']:
+                group['max_ms'] = entry['duration_ms']
+                group['sample'] = entry
+
+        return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:limit]
+
+    @staticmethod
+    def clear():
+        """Delete the log and its rotated files."""
+        for path in SlowQueryService._log_files():
+            if path == current_app.config['SLOW_QUERY_LOG']:
+                open(path, 'w').close()  # The handler keeps the file open
+            else:
+                os.remove(path)
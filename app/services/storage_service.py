@@ -0,0 +1,439 @@
+"""Storage service for streaming uploads into the attachment blob store."""
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import Request, current_app
+from sqlalchemy import select
+from app import db
+from app.models.subscription import AttachmentBlob
+from app.services.thumbnail_service import ThumbnailService
+
+try:
+    import fcntl  # POSIX only: lets chunk appends lock an upload across worker processes
+except ImportError:
+    fcntl = None
+
+UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Running hashes of resumable uploads, keyed by upload id: (bytes hashed, sha256)
+_resumable_hashes = {}
+_resumable_lock = threading.Lock()
+
+# Serializes chunk appends within this process where fcntl is unavailable
+_append_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    """Raised when an upload cannot be accepted."""
+
+
+class UploadOffsetMismatch(UploadError):
+    """Raised when a chunk does not start where the stored data ends."""
+
+    def __init__(self, received):
+        super().__init__(f'Expected chunk at offset {received}')
+        self.received = received
+
+
+class HashingFile:
+    """Temp file that hashes and counts bytes as they are written.
+
+    The file lives in the upload temp folder, on the same filesystem as the
+    final location, so commit() is an atomic rename instead of a copy. Files
+    that are never committed are removed when closed.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, suffix='.part')
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self.committed = False
+
+    def write(self, data):
+        """Write a chunk, updating the hash and size."""
+        self._sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        """SHA-256 of everything written so far."""
+        return self._sha256.hexdigest()
+
+    def commit(self, destination):
+        """Move the file to its final path."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(self.path, destination)
+        self.committed = True
+
+    def close(self):
+        """Close the file, deleting it unless it was committed."""
+        if not self._file.closed:
+            self._file.close()
+        if not self.committed:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __getattr__(self, name):
+        if name == '_file':
+            raise AttributeError(name)
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request that parses multipart file parts straight into HashingFiles.
+
+    Werkzeug writes each part into the returned stream chunk by chunk, so a
+    file upload is hashed and stored on disk once, with constant memory.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return HashingFile(current_app.config['UPLOAD_TEMP_FOLDER'])
+
+
+class StorageService:
+    """Service for writing uploaded files to the content-addressed blob store.
+
+    Each distinct file is stored once under BLOB_FOLDER, named by its SHA-256
+    and fanned out over two directory levels (ab/cd/abcd...), however many
+    attachments reference it.
+    """
+
+    @staticmethod
+    def blob_path(sha256):
+        """Get the path of a blob in the store."""
+        return os.path.join(current_app.config['BLOB_FOLDER'], sha256[:2], sha256[2:4], sha256)
+
+    @staticmethod
+    def legacy_path(subscription_id, filename):
+        """Get the path of a file in the legacy per-subscription folders."""
+        return os.path.join(
+            current_app.config['UPLOAD_FOLDER'],
+            'attachments',
+            str(subscription_id),
+            filename
+        )
+
+    @staticmethod
+    def attachment_path(attachment):
+        """Get the file path of an attachment (blob store or legacy folder)."""
+        if attachment.is_blob_stored():
+            return StorageService.blob_path(attachment.sha256)
+        return StorageService.legacy_path(attachment.subscription_id, attachment.filename)
+
+    @staticmethod
+    def blob_exists(sha256):
+        """Check if a blob is in the store."""
+        return os.path.exists(StorageService.blob_path(sha256))
+
+    @staticmethod
+    def _reuse_stored(sha256):
+        """Check if a stored copy can stand in for a new upload of the same content.
+
+        Only files that still have a blob row qualify; garbage collection may
+        remove any other. The file's mtime is refreshed so the collection's
+        grace period covers it until the new attachment row is committed.
+        """
+        path = StorageService.blob_path(sha256)
+        if not os.path.exists(path):
+            return False
+        if db.session.scalar(select(AttachmentBlob.sha256).where(AttachmentBlob.sha256 == sha256)) is None:
+            return False
+        try:
+            os.utime(path)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _store_file(path, sha256):
+        """Move a fully written file into the store, dropping it if a usable copy exists."""
+        if StorageService._reuse_stored(sha256):
+            os.remove(path)
+            return
+        destination = StorageService.blob_path(sha256)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+
+    @staticmethod
+    def _store_hashing_file(target):
+        """Move a HashingFile into the store.
+
+        Returns (sha256 hex digest, size in bytes).
+        """
+        sha256 = target.hexdigest()
+        if StorageService._reuse_stored(sha256):
+            target.close()
+        else:
+            target.commit(StorageService.blob_path(sha256))
+        return sha256, target.size
+
+    @staticmethod
+    def save_upload(file):
+        """Store an uploaded FileStorage as a blob.
+
+        Returns (sha256 hex digest, size in bytes).
+        """
+        stream = file.stream
+        if isinstance(stream, HashingFile):
+            return StorageService._store_hashing_file(stream)
+
+        # Fallback for streams not created by UploadRequest
+        return StorageService.save_stream(stream)
+
+    @staticmethod
+    def save_stream(stream, max_size=None):
+        """Copy a readable stream into the store in fixed-size chunks.
+
+        Returns (sha256 hex digest, size in bytes).
+        """
+        target = StorageService._spool(stream, max_size)
+        try:
+            return StorageService._store_hashing_file(target)
+        finally:
+            target.close()
+
+    @staticmethod
+    def _spool(stream, max_size=None):
+        """Copy a readable stream into a new HashingFile in fixed-size chunks."""
+        chunk_size = current_app.config['UPLOAD_READ_SIZE']
+        target = HashingFile(current_app.config['UPLOAD_TEMP_FOLDER'])
+        try:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                target.write(chunk)
+                if max_size and target.size > max_size:
+                    raise UploadError('File is too large.')
+        except Exception:
+            target.close()
+            raise
+        return target
+
+    @staticmethod
+    def logo_path(filename):
+        """Get the path of an uploaded provider logo."""
+        return os.path.join(current_app.config['UPLOAD_FOLDER'], 'logos', filename)
+
+    @staticmethod
+    def save_logo(file, ext):
+        """Store an uploaded provider logo named by its content hash.
+
+        Returns (sha256 hex digest, filename).
+        """
+        stream = file.stream
+        target = stream if isinstance(stream, HashingFile) else StorageService._spool(stream)
+        try:
+            sha256 = target.hexdigest()
+            filename = f'{sha256}.{ext}'
+            if not os.path.exists(StorageService.logo_path(filename)):
+                target.commit(StorageService.logo_path(filename))
+            return sha256, filename
+        finally:
+            target.close()
+
+    @staticmethod
+    def remove_blob(sha256):
+        """Delete a blob file from the store, with its thumbnails."""
+        try:
+            os.remove(StorageService.blob_path(sha256))
+        except OSError:
+            pass
+        ThumbnailService.remove(sha256)
+
+    # ===== Resumable uploads =====
+    @staticmethod
+    def _upload_paths(upload_id):
+        """Return the (data, metadata) paths of a resumable upload."""
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            raise UploadError('Invalid upload id.')
+        folder = current_app.config['UPLOAD_TEMP_FOLDER']
+        return (os.path.join(folder, f'{upload_id}.part'),
+                os.path.join(folder, f'{upload_id}.json'))
+
+    @staticmethod
+    def create_upload(metadata):
+        """Start a resumable upload and return its id.
+
+        metadata must include 'size'; everything else is stored as given.
+        """
+        if metadata['size'] > current_app.config['ATTACHMENT_MAX_SIZE']:
+            raise UploadError('File is too large.')
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(current_app.config['UPLOAD_TEMP_FOLDER'], exist_ok=True)
+        data_path, meta_path = StorageService._upload_paths(upload_id)
+        open(data_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump(dict(metadata, created_at=time.time()), f)
+
+        with _resumable_lock:
+            _resumable_hashes[upload_id] = (0, hashlib.sha256())
+        return upload_id
+
+    @staticmethod
+    def get_upload(upload_id):
+        """Return upload metadata with the bytes received so far, or None."""
+        data_path, meta_path = StorageService._upload_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                metadata = json.load(f)
+            metadata['received'] = os.path.getsize(data_path)
+        except (OSError, ValueError):
+            return None
+        return metadata
+
+    @staticmethod
+    def _resume_hash(upload_id, data_path, received):
+        """Get the running hash for an upload, rebuilding it if needed.
+
+        The hash is kept in memory between chunks; if this process did not
+        see the earlier chunks (restart, other worker) it is rebuilt from disk.
+        """
+        with _resumable_lock:
+            hashed, sha256 = _resumable_hashes.pop(upload_id, (None, None))
+        if hashed == received:
+            return sha256
+
+        sha256 = hashlib.sha256()
+        chunk_size = current_app.config['UPLOAD_READ_SIZE']
+        with open(data_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+        return sha256
+
+    @staticmethod
+    @contextmanager
+    def _open_for_append(data_path):
+        """Open an upload's data file for appending, holding its lock until closed.
+
+        Two requests for the same upload (e.g. a client retrying a chunk that
+        is still streaming) would otherwise both append to the file.
+        """
+        with open(data_path, 'ab') as f:
+            if fcntl is None:
+                with _append_lock:
+                    yield f
+                return
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield f
+            finally:
+                f.flush()  # The next holder checks the size on disk
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def append_chunk(upload_id, stream, offset):
+        """Append a chunk read from stream at offset.
+
+        Returns the total bytes received. Raises UploadOffsetMismatch if
+        offset is not where the stored data ends, so the client can resume.
+        """
+        metadata = StorageService.get_upload(upload_id)
+        if metadata is None:
+            raise UploadError('Unknown upload.')
+        if offset != metadata['received']:
+            raise UploadOffsetMismatch(metadata['received'])
+
+        data_path, _ = StorageService._upload_paths(upload_id)
+        chunk_size = current_app.config['UPLOAD_READ_SIZE']
+
+        with StorageService._open_for_append(data_path) as f:
+            # Another chunk may have been appended while waiting for the lock
+            received = os.fstat(f.fileno()).st_size
+            if offset != received:
+                raise UploadOffsetMismatch(received)
+            sha256 = StorageService._resume_hash(upload_id, data_path, received)
+            try:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if received + len(chunk) > metadata['size']:
+                        raise UploadError('Chunk exceeds declared file size.')
+                    f.write(chunk)
+                    sha256.update(chunk)
+                    received += len(chunk)
+            except Exception:
+                # Drop the partial chunk so the client can retry it
+                f.truncate(offset)
+                raise
+
+            with _resumable_lock:
+                _resumable_hashes[upload_id] = (received, sha256)
+        return received
+
+    @staticmethod
+    def finish_upload(upload_id):
+        """Move a completed upload into the store.
+
+        Returns (sha256 hex digest, size in bytes).
+        """
+        metadata = StorageService.get_upload(upload_id)
+        if metadata is None or metadata['received'] != metadata['size']:
+            raise UploadError('Upload is not complete.')
+
+        data_path, meta_path = StorageService._upload_paths(upload_id)
+        sha256 = StorageService._resume_hash(upload_id, data_path, metadata['received']).hexdigest()
+
+        StorageService._store_file(data_path, sha256)
+        os.remove(meta_path)
+        return sha256, metadata['size']
+
+    @staticmethod
+    def abort_upload(upload_id):
+        """Discard a resumable upload."""
+        with _resumable_lock:
+            _resumable_hashes.pop(upload_id, None)
+        for path in StorageService._upload_paths(upload_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def cleanup_stale_uploads(max_age_hours=24):
+        """Remove temp files and resumable uploads older than max_age_hours."""
+        folder = current_app.config['UPLOAD_TEMP_FOLDER']
+        cutoff = time.time() - max_age_hours * 3600
+        removed = 0
+
+        if not os.path.isdir(folder):
+            return removed
+
+        for name in os.listdir(folder):
+            if not name.endswith('.part'):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+            # Metadata of a resumable upload, if this was one
+            try:
+                os.remove(path[:-len('.part')] + '.json')
+            except OSError:
+                pass
+
+        with _resumable_lock:
+            for upload_id in list(_resumable_hashes):
+                if not os.path.exists(os.path.join(folder, f'{upload_id}.json')):
+                    del _resumable_hashes[upload_id]
+        return removed
@@ -0,0 +1,167 @@
+"""Thumbnail service for attachment and logo previews."""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from PIL import Image, ImageOps
+from app.services.metrics_service import MetricsService
+
+try:
+    import fitz  # PyMuPDF, optional: enables PDF first-page previews
+except ImportError:
+    fitz = None
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+# Pool and in-flight jobs (keyed by content hash) for this process
+_executor = None
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def _open_source(source, kind, max_size):
+    """Open an image or the first page of a PDF as a Pillow image."""
+    if kind == 'pdf':
+        with fitz.open(source, filetype='pdf') as document:
+            page = document[0]
+            zoom = max_size / max(page.rect.width, page.rect.height, 1)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    image = Image.open(source)
+    # Let the JPEG decoder downscale while decoding
+    image.draft('RGB', (max_size, max_size))
+    return ImageOps.exif_transpose(image)
+
+
+def _render(source, kind, targets, image_format):
+    """Render every (size, destination) derivative of a source file.
+
+    Runs in a worker process. The source is decoded once and resized from
+    the largest size down. Returns False if the file cannot be decoded.
+    """
+    try:
+        image = _open_source(source, kind, max(size for size, _ in targets))
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha and image_format == 'WEBP' else 'RGB')
+
+        for size, destination in sorted(targets, reverse=True):
+            image.thumbnail((size, size), Image.LANCZOS)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            temp = f'{destination}.{os.getpid()}.tmp'
+            if image_format == 'JPEG':
+                image.save(temp, 'JPEG', quality=80, optimize=True, progressive=True)
+            else:
+                image.save(temp, 'WEBP', quality=80, method=4)
+            os.replace(temp, destination)
+    except Exception:
+        return False
+    return True
+
+
+class ThumbnailService:
+    """Service for generating fixed-size previews in a background process pool.
+
+    Derivatives are keyed by the content hash of their source and the size,
+    so identical files share thumbnails and a cached file never goes stale.
+    """
+
+    @staticmethod
+    def source_kind(filename):
+        """Return 'image' or 'pdf' if a preview can be made for filename, else None."""
+        ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if ext in IMAGE_EXTENSIONS:
+            return 'image'
+        if ext == 'pdf' and fitz is not None:
+            return 'pdf'
+        return None
+
+    @staticmethod
+    def thumbnail_path(key, size):
+        """Get the path of a derivative."""
+        image_format = current_app.config['THUMBNAIL_FORMAT']
+        return os.path.join(
+            current_app.config['THUMBNAIL_FOLDER'],
+            key[:2],
+            f'{key}-{size}.{FORMAT_EXTENSIONS[image_format]}'
+        )
+
+    @staticmethod
+    def get_thumbnail(key, size):
+        """Return the path of a derivative if it has been generated, else None."""
+        path = ThumbnailService.thumbnail_path(key, size)
+        exists = os.path.exists(path)
+        MetricsService.record_cache('thumbnails', exists)
+        return path if exists else None
+
+    @staticmethod
+    def pending_count():
+        """Number of sources with thumbnails being generated."""
+        with _pending_lock:
+            return len(_pending)
+
+    @staticmethod
+    def _get_executor():
+        """Get or create this process's worker pool."""
+        global _executor
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=current_app.config['THUMBNAIL_WORKERS'])
+        return _executor
+
+    @staticmethod
+    def queue(source, key, kind):
+        """Generate all configured sizes for a source file off the request path.
+
+        Does nothing if the derivatives exist or are already being made.
+        With THUMBNAIL_WORKERS = 0 they are rendered inline instead.
+        """
+        sizes = current_app.config['THUMBNAIL_SIZES']
+        targets = [
+            (size, ThumbnailService.thumbnail_path(key, size)) for size in sizes
+            if not os.path.exists(ThumbnailService.thumbnail_path(key, size))
+        ]
+        if not targets or kind is None:
+            return
+
+        image_format = current_app.config['THUMBNAIL_FORMAT']
+        if not current_app.config['THUMBNAIL_WORKERS']:
+            _render(source, kind, targets, image_format)
+            return
+
+        logger = current_app.logger
+        with _pending_lock:
+            if key in _pending:
+                return
+            future = ThumbnailService._get_executor().submit(
+                _render, source, kind, targets, image_format
+            )
+            _pending[key] = future
+
+        def done(finished):
+            with _pending_lock:
+                _pending.pop(key, None)
+            if finished.exception() is not None or not finished.result():
+                logger.warning(f'Could not generate thumbnails for {key}')
+
+        future.add_done_callback(done)
+
+    @staticmethod
+    def queue_attachment(attachment):
+        """Queue previews for a blob-stored attachment."""
+        kind = ThumbnailService.source_kind(attachment.original_filename)
+        if kind is None or not attachment.is_blob_stored():
+            return
+        from app.services.storage_service import StorageService
+        ThumbnailService.queue(StorageService.blob_path(attachment.sha256), attachment.sha256, kind)
+
+    @staticmethod
+    def remove(key):
+        """Delete all derivatives of a source."""
+        for size in current_app.config['THUMBNAIL_SIZES']:
+            try:
+                os.remove(ThumbnailService.thumbnail_path(key, size))
+            except OSError:
+                pass
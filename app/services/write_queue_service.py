@@ -0,0 +1,179 @@
+"""Write queue service for batching small commits from background jobs."""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from flask import current_app
+from app import db
+
+logger = logging.getLogger(__name__)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Single writer thread that runs queued writes in batched transactions.
+
+    Submitted calls are collected for up to max_delay seconds (or max_batch
+    calls) and run in one transaction opened with transaction(), a context
+    manager that commits on success and rolls back on error. If the batch
+    fails, its calls are retried one transaction each so a bad write only
+    fails its own future.
+    """
+
+    def __init__(self, transaction, max_batch=200, max_delay=0.05):
+        self._transaction = transaction
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs); returns a Future set after its commit."""
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def depth(self):
+        """Approximate number of calls waiting for the writer thread."""
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        """Wait until everything submitted so far is committed."""
+        self.submit(lambda: None).result(timeout)
+
+    def stop(self, timeout=None):
+        """Commit what is queued and end the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            deadline = time.monotonic() + self._max_delay
+            stopping = False
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                return
+
+    def _write(self, batch):
+        try:
+            with self._transaction():
+                results = [fn(*args, **kwargs) for fn, args, kwargs, _ in batch]
+        except Exception:
+            for fn, args, kwargs, future in batch:
+                try:
+                    with self._transaction():
+                        result = fn(*args, **kwargs)
+                except Exception as e:
+                    logger.exception('Queued write failed')
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            return
+
+        for (_, _, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+
+class _SessionTransaction:
+    """Run queued writes in an app context and commit them with db.session."""
+
+    def __init__(self, app):
+        self._app = app
+        self._context = None
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        self._context = self._app.app_context()
+        self._context.push()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                db.session.commit()
+            else:
+                db.session.rollback()
+        finally:
+            self._context.pop()
+
+
+class WriteQueueService:
+    """Service for routing background writes through the write queue.
+
+    With WRITE_QUEUE_ENABLED, writes from any thread go to one writer thread
+    and are committed in batches, so background jobs no longer compete for
+    SQLite's write lock one small commit at a time. Otherwise each write is
+    run and committed inline. Either way a Future is returned; queued
+    functions should add to db.session and not commit. Queued functions
+    run in the writer's own session, so ORM objects they return are
+    detached by the time the Future is set.
+    """
+
+    @staticmethod
+    def _get_queue():
+        global _queue
+        with _queue_lock:
+            if _queue is None:
+                app = current_app._get_current_object()
+                _queue = WriteQueue(
+                    _SessionTransaction(app),
+                    max_batch=app.config['WRITE_QUEUE_MAX_BATCH'],
+                    max_delay=app.config['WRITE_QUEUE_MAX_DELAY']
+                )
+                atexit.register(_queue.stop, 5)
+            return _queue
+
+    @staticmethod
+    def submit(fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) and commit, through the queue if enabled."""
+        if current_app.config['WRITE_QUEUE_ENABLED']:
+            return WriteQueueService._get_queue().submit(fn, *args, **kwargs)
+
+        future = Future()
+        try:
+            result = fn(*args, **kwargs)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Write failed')
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        return future
+
+    @staticmethod
+    def depth():
+        """Number of writes waiting in the queue (0 when disabled or idle)."""
+        return _queue.depth() if _queue is not None else 0
+
+    @staticmethod
+    def flush(timeout=None):
+        """Wait for queued writes to be committed (no-op when disabled)."""
+        if current_app.config['WRITE_QUEUE_ENABLED'] and _queue is not None:
+            _queue.flush(timeout)
@@ -0,0 +1,200 @@
+"""Seeded synthetic data for benchmarks and load tests.
+
+generate() bulk-inserts users with subscriptions, payment methods, price
+history and notifications. The same seed and starting point always give
+the same data, so runs on different commits can be compared.
+"""
+import math
+import random
+from datetime import date, datetime, timedelta
+from sqlalchemy import func, text
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import (
+    User, Subscription, SubscriptionPriceHistory, PaymentMethod, Notification, Provider, Category,
+    UserPortfolioSummary
+)
+
+EMAIL_DOMAIN = 'synthetic.example'
+PASSWORD = 'synthetic-password'
+
+# Weighted choices: (value, weight)
+HOME_CURRENCIES = [('USD', 50), ('EUR', 15), ('GBP', 10), ('INR', 12), ('CAD', 5), ('AUD', 5), ('JPY', 3)]
+CURRENCY_SCALE = {'INR': 80, 'JPY': 150}  # Typical prices are this many times the USD price
+BILLING_CYCLES = [('monthly', 70), ('yearly', 25), ('one_time', 5)]
+TYPICAL_PRICE = {'monthly': 12.0, 'yearly': 100.0, 'one_time': 50.0}
+STATUSES = [('active', 80), ('inactive', 8), ('cancelled', 12)]
+NOTIFICATION_TYPES = [
+    (Notification.TYPE_RENEWAL_REMINDER, 50), (Notification.TYPE_PRICE_CHANGE, 15),
+    (Notification.TYPE_TRIAL_ENDING, 10), (Notification.TYPE_EXPIRED, 10),
+    (Notification.TYPE_CARD_EXPIRING, 10), (Notification.TYPE_PAYMENT_DUE, 5),
+]
+CARD_NAMES = ['Visa Credit Card', 'Mastercard Debit', 'Amex Gold', 'Travel Card', 'Business Card']
+BANK_NAMES = ['Checking Account', 'Savings Account']
+
+
+def synthetic_email(user_id):
+    """Email address of a generated user."""
+    return f'user{user_id}@{EMAIL_DOMAIN}'
+
+
+def _weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _insert(model, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(model.__table__.insert(), rows[start:start + batch_size])
+
+
+def _reset_sequences(models):
+    """Move PostgreSQL id sequences past the explicitly inserted ids."""
+    if db.session.connection().dialect.name != 'postgresql':
+        return
+    for model in models:
+        table = model.__tablename__
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT coalesce(max(id), 1) FROM {table}))"
+        ))
+
+
+def _price(rng, billing_cycle, currency):
+    price = rng.lognormvariate(math.log(TYPICAL_PRICE[billing_cycle]), 0.6)
+    price *= CURRENCY_SCALE.get(currency, 1)
+    return max(round(price) - 0.01, 0.99)
+
+
+def generate(users=100, subscriptions_per_user=10, seed=0, batch_size=5000, credentials=True):
+    """Add users with subscriptions and related rows, and commit.
+
+    Subscription counts per user vary around subscriptions_per_user (a
+    few heavy users, many light ones). Needs the default categories,
+    providers and rates, which are seeded if missing. Returns the
+    inserted row counts by table and the first and last user id; every
+    user's password is PASSWORD.
+    """
+    from app.routes.auth import seed_default_data
+    from app.services.encryption_service import encrypt_credential
+    seed_default_data()
+
+    providers = [(provider.id, provider.name, provider.category_id) for provider in Provider.query.order_by(Provider.id)]
+    categories = [category.id for category in Category.query.order_by(Category.id)]
+    # Popular providers dominate, as in real data (Zipf-like weights)
+    provider_weights = [1 / (rank + 1) for rank in range(len(providers))]
+
+    first_user_id = _next_id(User)
+    rng = random.Random(f'{seed}-{first_user_id}')
+    today = date.today()
+    now = datetime.utcnow()
+    password_hash = generate_password_hash(PASSWORD)
+
+    user_rows, method_rows, subscription_rows, history_rows, notification_rows = [], [], [], [], []
+    method_id, subscription_id = _next_id(PaymentMethod), _next_id(Subscription)
+
+    for user_id in range(first_user_id, first_user_id + users):
+        home_currency = _weighted(rng, HOME_CURRENCIES)
+        created_at = now - timedelta(days=rng.randint(0, 4 * 365))
+        user_rows.append({
+            'id': user_id, 'email': synthetic_email(user_id), 'password_hash': password_hash,
+            'full_name': f'Synthetic User {user_id}', 'default_currency': home_currency,
+            'email_alerts_enabled': rng.random() < 0.6, 'is_admin': False, 'dark_mode': rng.random() < 0.3,
+            'created_at': created_at, 'last_login': now - timedelta(hours=rng.randint(0, 24 * 60)),
+        })
+
+        methods = []
+        for index in range(rng.choice((1, 1, 2, 2, 3))):
+            is_card = rng.random() < 0.8
+            method_rows.append({
+                'id': method_id, 'user_id': user_id, 'type': 'card' if is_card else 'bank',
+                'name': rng.choice(CARD_NAMES if is_card else BANK_NAMES),
+                'last_four_digits': f'{rng.randint(0, 9999):04d}',
+                'expiry_date': today + timedelta(days=rng.randint(-30, 4 * 365)) if is_card else None,
+                'is_default': index == 0, 'created_at': created_at,
+            })
+            methods.append(method_id)
+            method_id += 1
+
+        user_subscriptions = []
+        count = max(1, min(int(rng.expovariate(1 / subscriptions_per_user)) + 1, subscriptions_per_user * 8))
+        for _ in range(count):
+            billing_cycle = _weighted(rng, BILLING_CYCLES)
+            currency = home_currency if rng.random() < 0.85 else _weighted(rng, HOME_CURRENCIES)
+            status = _weighted(rng, STATUSES)
+            if rng.random() < 0.85:
+                provider_id, name, category_id = rng.choices(providers, provider_weights)[0]
+                category_id = category_id or rng.choice(categories)
+            else:
+                provider_id, name, category_id = None, f'Custom Service {rng.randint(1, 500)}', rng.choice(categories)
+
+            start_date = today - timedelta(days=rng.randint(0, 4 * 365))
+            if billing_cycle == 'monthly':
+                next_renewal_date = today + timedelta(days=rng.randint(-10, 30))
+            elif billing_cycle == 'yearly':
+                next_renewal_date = today + timedelta(days=rng.randint(-10, 365))
+            else:
+                next_renewal_date = None
+            is_trial = status == 'active' and rng.random() < 0.06
+
+            amount = _price(rng, billing_cycle, currency)
+            row = {
+                'id': subscription_id, 'user_id': user_id, 'name': name, 'provider_id': provider_id,
+                'category_id': category_id, 'subscription_type_id': None,
+                'payment_method_id': rng.choice(methods) if rng.random() < 0.9 else None, 'group_id': None,
+                'amount': amount, 'currency': currency, 'billing_cycle': billing_cycle,
+                'start_date': start_date, 'next_renewal_date': next_renewal_date,
+                'reminder_days': rng.choice((3, 7, 7, 15, 15, 30)), 'status': status,
+                'auto_renew': rng.random() < 0.85, 'is_trial': is_trial,
+                'trial_end_date': today + timedelta(days=rng.randint(-3, 30)) if is_trial else None,
+                'account_email_encrypted': None, 'account_username_encrypted': None,
+                'notes': None, 'created_at': now, 'updated_at': now,
+            }
+            if credentials and rng.random() < 0.2:
+                row['account_email_encrypted'] = encrypt_credential(synthetic_email(user_id))
+            subscription_rows.append(row)
+            user_subscriptions.append(subscription_id)
+
+            # Price rises, oldest first, ending at the current amount
+            if rng.random() < 0.25:
+                changes = rng.randint(1, 3)
+                new_amount = amount
+                for step in range(changes):
+                    old_amount = round(new_amount / (1 + rng.uniform(0.05, 0.25)), 2)
+                    history_rows.append({
+                        'subscription_id': subscription_id, 'old_amount': old_amount, 'new_amount': new_amount,
+                        'currency': currency, 'reason': 'Price increase',
+                        'changed_at': now - timedelta(days=(step + 1) * rng.randint(60, 240)),
+                    })
+                    new_amount = old_amount
+            subscription_id += 1
+
+        for _ in range(rng.randint(0, 10)):
+            notification_type = _weighted(rng, NOTIFICATION_TYPES)
+            is_read = rng.random() < 0.7
+            created = now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+            notification_rows.append({
+                'user_id': user_id, 'subscription_id': rng.choice(user_subscriptions),
+                'type': notification_type, 'message': f'Synthetic {notification_type.replace("_", " ")} notification',
+                'is_read': is_read, 'email_sent': False, 'created_at': created,
+                'read_at': created + timedelta(hours=rng.randint(1, 72)) if is_read else None,
+            })
+
+    _insert(User, user_rows, batch_size)
+    _insert(PaymentMethod, method_rows, batch_size)
+    _insert(Subscription, subscription_rows, batch_size)
+    _insert(SubscriptionPriceHistory, history_rows, batch_size)
+    _insert(Notification, notification_rows, batch_size)
+    _reset_sequences((User, PaymentMethod, Subscription))
+    UserPortfolioSummary.rebuild(range(first_user_id, first_user_id + users))
+    db.session.commit()
+
+    return {
+        'users': len(user_rows), 'payment_methods': len(method_rows),
+        'subscriptions': len(subscription_rows), 'price_history': len(history_rows),
+        'notifications': len(notification_rows),
+        'first_user_id': first_user_id, 'last_user_id': first_user_id + users - 1,
+    }
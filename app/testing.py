@@ -0,0 +1,33 @@
+"""Pytest helpers. Enable with `pytest_plugins = ['app.testing']` in conftest.py."""
+import pytest
+from flask import g, request_finished
+
+
+@pytest.fixture
+def query_budget():
+    """Request a URL and fail if it runs more than a given number of queries.
+
+    def test_reports_page(client, query_budget):
+        query_budget(client, '/reports/by-category', max_queries=15)
+
+    Extra keyword arguments go to client.open (method, data, ...). The
+    failure message lists every query shape with its count, marking likely
+    N+1 patterns. Returns the response.
+    """
+    def check(client, path, max_queries, **kwargs):
+        captured = []
+
+        def record(sender, response, **extra):
+            captured.append(g.get('query_stats'))
+
+        with request_finished.connected_to(record, client.application):
+            response = client.open(path, **kwargs)
+
+        if not captured or captured[-1] is None:
+            pytest.fail('No query stats recorded; is SQL_STATS_ENABLED set?')
+        stats = captured[-1]
+        if stats.count > max_queries:
+            pytest.fail(f'{path} ran {stats.count} queries, budget is {max_queries}:\n{stats.report()}')
+        return response
+
+    return check
@@ -0,0 +1,71 @@
+"""Composite indexes for hot query shapes
+
+Covers the per-user subscription list, filter and renewal queries, the
+scheduler's cross-user renewal checks, the unread notification queries and
+the per-subscription child tables. Checked by `flask schema check-plans`.
+
+Revision ID: 0002_composite_indexes
+Revises: 0001_baseline
+Create Date: 2026-10-19 06:45:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_composite_indexes'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.create_index('ix_subscriptions_user_status_renewal', ['user_id', 'status', 'next_renewal_date'], unique=False)
+        batch_op.create_index('ix_subscriptions_user_category_status', ['user_id', 'category_id', 'status'], unique=False)
+        batch_op.create_index('ix_subscriptions_user_provider_status', ['user_id', 'provider_id', 'status'], unique=False)
+        batch_op.create_index('ix_subscriptions_user_payment_method_status', ['user_id', 'payment_method_id', 'status'], unique=False)
+        batch_op.create_index('ix_subscriptions_status_renewal', ['status', 'next_renewal_date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_subscriptions_group_id'), ['group_id'], unique=False)
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_user_read_created', ['user_id', 'is_read', 'created_at'], unique=False)
+        batch_op.create_index('ix_notifications_subscription_type_created', ['subscription_id', 'type', 'created_at'], unique=False)
+
+    with op.batch_alter_table('subscription_price_history', schema=None) as batch_op:
+        batch_op.create_index('ix_subscription_price_history_subscription_changed', ['subscription_id', 'changed_at'], unique=False)
+
+    with op.batch_alter_table('subscription_attachments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_subscription_attachments_subscription_id'), ['subscription_id'], unique=False)
+
+    with op.batch_alter_table('payment_methods', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payment_methods_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('subscription_groups', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_subscription_groups_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('subscription_groups', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscription_groups_user_id'))
+
+    with op.batch_alter_table('payment_methods', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payment_methods_user_id'))
+
+    with op.batch_alter_table('subscription_attachments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscription_attachments_subscription_id'))
+
+    with op.batch_alter_table('subscription_price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_subscription_price_history_subscription_changed')
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_subscription_type_created')
+        batch_op.drop_index('ix_notifications_user_read_created')
+
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscriptions_group_id'))
+        batch_op.drop_index('ix_subscriptions_status_renewal')
+        batch_op.drop_index('ix_subscriptions_user_payment_method_status')
+        batch_op.drop_index('ix_subscriptions_user_provider_status')
+        batch_op.drop_index('ix_subscriptions_user_category_status')
+        batch_op.drop_index('ix_subscriptions_user_status_renewal')
@@ -0,0 +1,49 @@
+"""Partial indexes for scheduler scans
+
+Index only the rows the notification checks can match: active trials,
+active subscriptions that don't auto-renew, and payment methods with an
+expiry date. Both PostgreSQL and SQLite support partial indexes.
+
+Revision ID: 0003_partial_indexes
+Revises: 0002_composite_indexes
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_partial_indexes'
+down_revision = '0002_composite_indexes'
+branch_labels = None
+depends_on = None
+
+
+def _where(bind, postgresql, sqlite):
+    return sa.text(postgresql if bind.dialect.name == 'postgresql' else sqlite)
+
+
+def upgrade():
+    bind = op.get_bind()
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        where = _where(bind, "is_trial = true AND status = 'active'", "is_trial = 1 AND status = 'active'")
+        batch_op.create_index('ix_subscriptions_active_trials', ['trial_end_date'], unique=False,
+                              postgresql_where=where, sqlite_where=where)
+        where = _where(bind, "auto_renew = false AND status = 'active'", "auto_renew = 0 AND status = 'active'")
+        batch_op.create_index('ix_subscriptions_active_expiring', ['next_renewal_date'], unique=False,
+                              postgresql_where=where, sqlite_where=where)
+
+    with op.batch_alter_table('payment_methods', schema=None) as batch_op:
+        where = sa.text('expiry_date IS NOT NULL')
+        batch_op.create_index('ix_payment_methods_expiry', ['expiry_date'], unique=False,
+                              postgresql_where=where, sqlite_where=where)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_methods', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_methods_expiry')
+
+    with op.batch_alter_table('subscriptions', schema=None) as batch_op:
+        batch_op.drop_index('ix_subscriptions_active_expiring')
+        batch_op.drop_index('ix_subscriptions_active_trials')
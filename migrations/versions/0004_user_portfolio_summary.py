@@ -0,0 +1,40 @@
+"""Per-user portfolio summary table
+
+One row per user with subscription counts and spend, maintained with
+every subscription change and read by the dashboard. Existing users are
+filled in by `flask portfolio rebuild`; until then their summaries are
+computed on each read.
+
+Revision ID: 0004_user_portfolio_summary
+Revises: 0003_partial_indexes
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_user_portfolio_summary'
+down_revision = '0003_partial_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user_portfolio_summary',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('active_count', sa.Integer(), nullable=False),
+    sa.Column('inactive_count', sa.Integer(), nullable=False),
+    sa.Column('cancelled_count', sa.Integer(), nullable=False),
+    sa.Column('trial_count', sa.Integer(), nullable=False),
+    sa.Column('spend', sa.JSON(), nullable=False),
+    sa.Column('category_spend', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('user_portfolio_summary')
@@ -0,0 +1,29 @@
+"""Per-user data version
+
+A counter on users, bumped with every change to their subscriptions, that
+in-memory caches of derived data are keyed on.
+
+Revision ID: 0005_user_data_version
+Revises: 0004_user_portfolio_summary
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_user_data_version'
+down_revision = '0004_user_portfolio_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
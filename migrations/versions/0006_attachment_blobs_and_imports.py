@@ -0,0 +1,80 @@
+"""Attachment blob store and CSV import tables
+
+Adds the tables and the subscription_attachments.sha256 column that came
+after the baseline schema. Databases that already have them (created by an
+earlier version of the baseline migration, or by db.create_all() before
+being stamped) are left as they are.
+
+Revision ID: 0006_attachment_blobs_and_imports
+Revises: 0005_user_data_version
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_attachment_blobs_and_imports'
+down_revision = '0005_user_data_version'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    existing = set(inspector.get_table_names())
+
+    if 'attachment_blobs' not in existing:
+        op.create_table('attachment_blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+        )
+
+    attachment_columns = {column['name'] for column in inspector.get_columns('subscription_attachments')}
+    if 'sha256' not in attachment_columns:
+        with op.batch_alter_table('subscription_attachments', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+            batch_op.create_foreign_key('fk_subscription_attachments_sha256', 'attachment_blobs',
+                                        ['sha256'], ['sha256'])
+            batch_op.create_index(batch_op.f('ix_subscription_attachments_sha256'), ['sha256'], unique=False)
+
+    if 'subscription_imports' not in existing:
+        op.create_table('subscription_imports',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=True),
+        sa.Column('imported_count', sa.Integer(), nullable=True),
+        sa.Column('duplicate_count', sa.Integer(), nullable=True),
+        sa.Column('error_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('reverted_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('subscription_imports', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_subscription_imports_user_id'), ['user_id'], unique=False)
+
+    if 'subscription_import_items' not in existing:
+        op.create_table('subscription_import_items',
+        sa.Column('import_id', sa.Integer(), nullable=False),
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['import_id'], ['subscription_imports.id'], ),
+        sa.ForeignKeyConstraint(['subscription_id'], ['subscriptions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('import_id', 'subscription_id')
+        )
+
+
+def downgrade():
+    op.drop_table('subscription_import_items')
+    op.drop_table('subscription_imports')
+
+    # Dropping the column drops its foreign key, whatever it was named
+    with op.batch_alter_table('subscription_attachments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_subscription_attachments_sha256'))
+        batch_op.drop_column('sha256')
+
+    op.drop_table('attachment_blobs')
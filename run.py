@@ -1,5 +1,6 @@
 """Application entry point."""
 from app import create_app, db
+from app.database import upgrade_database
 from app.models import User, Subscription, Category, Provider, SubscriptionType, PaymentMethod, Notification
 
 app = create_app()
@@ -22,5 +23,5 @@ def make_shell_context():
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        upgrade_database()
     app.run(debug=True, port=5000)